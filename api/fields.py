@@ -0,0 +1,228 @@
+"""
+The page types exposed by the API, and the fields each can return.
+
+Each field declares the columns and relations it reads, so a listing asking
+for a few fields loads only those (see api.views), and the images whose
+renditions it shows, so they're loaded for a whole page of results at once.
+"""
+from django.utils import translation
+
+from wagtail.images import get_image_model
+from wagtail.images.models import Filter
+from wagtail.rich_text import expand_db_html
+
+from blog.blocks import ImageBlock
+from blog.models import BlogIndexPage, BlogPage, ImageGalleryPage
+from custom_media.renditions import iter_block_image_ids
+from home.models import HomePage
+
+
+class ApiField:
+    def __init__(
+        self,
+        get_value,
+        only=(),
+        select_related=(),
+        prefetch_related=(),
+        prefetch=None,
+        create_renditions=True,
+    ):
+        self.get_value = get_value
+        self.only = only
+        self.select_related = select_related
+        self.prefetch_related = prefetch_related
+        # Loads what the values of a list of pages need, and returns the
+        # (image, filter spec) pairs of the renditions they show
+        self.prefetch = prefetch
+        # With False, only the renditions that exist are shown, and the others
+        # are generated in the background
+        self.create_renditions = create_renditions
+
+
+class PageType:
+    def __init__(self, model, fields, listing_fields, ordering=("id",)):
+        self.model = model
+        self.name = model._meta.label
+        self.fields = {**COMMON_FIELDS, **fields}
+        self.listing_fields = listing_fields
+        # A unique ordering, for the cursors (see api.views)
+        self.ordering = ordering
+
+
+def image_json(image, filter_spec, request, alt=None, create=True):
+    if image is None:
+        return None
+    alt = image.default_alt_text if alt is None else alt
+    if not create and not get_existing_filter_specs(image, [filter_spec]):
+        # Generated in the background (see api.views.serialize_pages)
+        return {"id": image.pk, "url": None, "width": None, "height": None, "alt": alt}
+    # Found in the prefetched renditions
+    rendition = image.get_rendition(filter_spec)
+    return {
+        "id": image.pk,
+        "url": request.build_absolute_uri(rendition.url),
+        "width": rendition.width,
+        "height": rendition.height,
+        "alt": alt,
+    }
+
+
+def get_url(page, request):
+    with translation.override(page.locale.language_code):
+        return page.get_full_url(request)
+
+
+def prefetch_body_images(pages):
+    # The bodies' images, for all the pages at once, rather than a query per
+    # body as iterating over each StreamValue would make
+    image_ids = set()
+    for page in pages:
+        image_ids.update(
+            iter_block_image_ids(page.body.stream_block, page.body.raw_data)
+        )
+    images = get_image_model().objects.in_bulk(image_ids)
+    for page in pages:
+        page.body_images = images
+    return [(image, ImageBlock.filter_spec) for image in images.values()]
+
+
+def get_body(page, request):
+    # From the raw data, with the images loaded by prefetch_body_images
+    stream_block = page.body.stream_block
+    body = []
+    for child in page.body.raw_data:
+        block_type, value = child["type"], child["value"]
+        if block_type == "image":
+            image = page.body_images.get(value["image"])
+            alt = "" if value.get("decorative") else value.get("alt_text") or None
+            value = image_json(
+                image, ImageBlock.filter_spec, request, alt, create=False
+            )
+        elif block_type == "paragraph":
+            value = expand_db_html(value)
+        else:
+            block = stream_block.child_blocks[block_type]
+            value = block.get_api_representation(
+                block.to_python(value), context={"request": request}
+            )
+        body.append({"type": block_type, "id": child.get("id"), "value": value})
+    return body
+
+
+def get_existing_filter_specs(image, filter_specs):
+    # Of the prefetched renditions (see api.views.serialize_pages)
+    existing = {
+        (rendition.filter_spec, rendition.focal_point_key)
+        for rendition in image.prefetched_renditions
+    }
+    return [
+        filter_spec
+        for filter_spec in filter_specs
+        if (filter_spec, Filter(spec=filter_spec).get_cache_key(image)) in existing
+    ]
+
+
+def get_gallery_images(page, request):
+    images = []
+    for gallery_image in page.gallery_images.all():
+        filter_specs = get_existing_filter_specs(
+            gallery_image.image, ImageGalleryPage.gallery_filter_specs
+        )
+        if filter_specs:
+            images.append(gallery_image.as_json(filter_specs, html=False))
+        else:
+            images.append(
+                {"alt": gallery_image.alt, "width": None, "height": None, "sources": {}}
+            )
+    return images
+
+
+def prefetch_gallery_renditions(pages):
+    return [
+        (gallery_image.image, filter_spec)
+        for page in pages
+        for gallery_image in page.gallery_images.all()
+        for filter_spec in ImageGalleryPage.gallery_filter_specs
+    ]
+
+
+COMMON_FIELDS = {
+    "title": ApiField(lambda page, request: page.title, only=["title"]),
+    "slug": ApiField(lambda page, request: page.slug, only=["slug"]),
+    "url": ApiField(get_url, only=["url_path"]),
+    "first_published_at": ApiField(
+        lambda page, request: page.first_published_at,
+        only=["first_published_at"],
+    ),
+    "last_published_at": ApiField(
+        lambda page, request: page.last_published_at,
+        only=["last_published_at"],
+    ),
+}
+
+PAGE_TYPES = {
+    page_type.name.lower(): page_type
+    for page_type in [
+        PageType(
+            HomePage,
+            fields={
+                "summary": ApiField(
+                    lambda page, request: expand_db_html(page.summary),
+                    only=["summary"],
+                ),
+                "main_image": ApiField(
+                    lambda page, request: image_json(
+                        page.main_image, HomePage.main_image_filter_spec, request
+                    ),
+                    select_related=["main_image"],
+                    prefetch=lambda pages: [
+                        (page.main_image, HomePage.main_image_filter_spec)
+                        for page in pages
+                    ],
+                ),
+            },
+            listing_fields=["title", "url"],
+        ),
+        PageType(
+            BlogIndexPage,
+            fields={
+                "intro": ApiField(
+                    lambda page, request: expand_db_html(page.intro), only=["intro"]
+                ),
+            },
+            listing_fields=["title", "url"],
+        ),
+        PageType(
+            BlogPage,
+            fields={
+                "date": ApiField(lambda page, request: page.date, only=["date"]),
+                "intro": ApiField(lambda page, request: page.intro, only=["intro"]),
+                "body": ApiField(
+                    get_body,
+                    only=["body"],
+                    prefetch=prefetch_body_images,
+                    # Up to a page of posts, each with any number of images
+                    create_renditions=False,
+                ),
+            },
+            listing_fields=["title", "url", "date", "intro"],
+            ordering=("-date", "-id"),
+        ),
+        PageType(
+            ImageGalleryPage,
+            fields={
+                "intro": ApiField(
+                    lambda page, request: expand_db_html(page.intro), only=["intro"]
+                ),
+                "images": ApiField(
+                    get_gallery_images,
+                    prefetch_related=["gallery_images__image"],
+                    prefetch=prefetch_gallery_renditions,
+                    # 9 renditions of each of the gallery's images
+                    create_renditions=False,
+                ),
+            },
+            listing_fields=["title", "url"],
+        ),
+    ]
+}
@@ -0,0 +1,239 @@
+import datetime
+import shutil
+import tempfile
+
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+
+from wagtail.images.tests.utils import get_test_image_file
+from wagtail.models import Locale, Site
+
+from blog.models import (
+    BlogIndexPage,
+    BlogPage,
+    ImageGalleryImageImage,
+    ImageGalleryPage,
+)
+from custom_media.models import CustomImage, CustomRendition
+from home.models import HomePage
+
+
+class PageApiTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        cache.clear()
+        # Renditions of images of other tests with the same ids
+        caches["renditions"].clear()
+
+        self.image = CustomImage.objects.create(
+            title="Image", file=get_test_image_file(), default_alt_text="Default alt"
+        )
+        self.root = Site.objects.get(is_default_site=True).root_page
+        self.index = BlogIndexPage(title="Blog", slug="blog", intro="<p>Welcome</p>")
+        self.root.add_child(instance=self.index)
+
+    def add_post(self, title, date, parent=None):
+        post = BlogPage(
+            title=title,
+            date=date,
+            intro="Intro of %s" % title,
+            body=[
+                ("heading", {"size": "h2", "text": "Heading"}),
+                ("paragraph", "<p>Paragraph</p>"),
+                ("image", {"image": self.image, "alt_text": "Alt", "decorative": False}),
+            ],
+        )
+        (parent or self.index).add_child(instance=post)
+        return post
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def test_listing_fields(self):
+        post = self.add_post("Post", datetime.date(2024, 1, 1))
+        data = self.get("/en/api/v1/pages/", type="blog.BlogPage").json()
+        self.assertEqual(
+            data["items"],
+            [
+                {
+                    "id": post.pk,
+                    "type": "blog.BlogPage",
+                    "locale": "en",
+                    "title": "Post",
+                    "url": post.full_url,
+                    "date": "2024-01-01",
+                    "intro": "Intro of Post",
+                }
+            ],
+        )
+        self.assertIsNone(data["meta"]["next"])
+
+        data = self.get("/en/api/v1/pages/", type="blog.blogpage", fields="title").json()
+        self.assertEqual(
+            data["items"],
+            [{"id": post.pk, "type": "blog.BlogPage", "locale": "en", "title": "Post"}],
+        )
+
+    def test_cursor_pagination(self):
+        for i in range(5):
+            # Posts on the same day are ordered by id
+            self.add_post("Post %d" % i, datetime.date(2024, 1, 1 + i // 2))
+
+        titles = []
+        url, params = "/en/api/v1/pages/", {"type": "blog.BlogPage", "limit": 2}
+        while url:
+            data = self.get(url, **params).json()
+            self.assertLessEqual(len(data["items"]), 2)
+            titles.extend(item["title"] for item in data["items"])
+            url, params = data["meta"]["next"], {}
+        self.assertEqual(titles, ["Post 4", "Post 3", "Post 2", "Post 1", "Post 0"])
+
+    def test_listing_queries_do_not_grow_with_pages(self):
+        for i in range(2):
+            self.add_post("Post %d" % i, datetime.date(2024, 1, 1))
+        params = {"type": "blog.BlogPage", "fields": "title,url,body"}
+        with override_settings(RENDITION_WARMUP_WORKERS=0):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.get("/en/api/v1/pages/", **params)  # renditions
+        cache.clear()
+        with self.assertNumQueries(5):
+            self.get("/en/api/v1/pages/", **params)
+
+        for i in range(5):
+            self.add_post("Other post %d" % i, datetime.date(2024, 1, 1))
+        cache.clear()
+        with self.assertNumQueries(5):
+            data = self.get("/en/api/v1/pages/", **params).json()
+        self.assertEqual(len(data["items"]), 7)
+
+    @override_settings(WAGTAIL_I18N_ENABLED=True)
+    def test_filters(self):
+        french = Locale.objects.create(language_code="fr")
+        post = self.add_post("Post", datetime.date(2024, 1, 1))
+        french_post = post.copy_for_translation(french, copy_parents=True)
+        french_post.save_revision().publish()
+        other_index = self.root.add_child(
+            instance=BlogIndexPage(title="Other", slug="other")
+        )
+        other_post = self.add_post("Other", datetime.date(2024, 1, 1), other_index)
+
+        data = self.get("/en/api/v1/pages/", type="blog.BlogPage", locale="fr").json()
+        self.assertEqual([item["id"] for item in data["items"]], [french_post.pk])
+        self.assertEqual(data["items"][0]["url"], "http://localhost/fr/blog/post/")
+
+        data = self.get(
+            "/en/api/v1/pages/", type="blog.BlogPage", child_of=other_index.pk
+        ).json()
+        self.assertEqual([item["id"] for item in data["items"]], [other_post.pk])
+
+    def test_rendition_urls(self):
+        post = self.add_post("Post", datetime.date(2024, 1, 1))
+        home = self.root.add_child(
+            instance=HomePage(title="Home", slug="home", main_image=self.image)
+        )
+        gallery = self.root.add_child(
+            instance=ImageGalleryPage(title="Gallery", slug="gallery")
+        )
+        ImageGalleryImageImage.objects.create(page=gallery, image=self.image)
+
+        # The body's renditions are generated in the background
+        with override_settings(RENDITION_WARMUP_WORKERS=0):
+            with self.captureOnCommitCallbacks() as callbacks:
+                body = self.get("/en/api/v1/pages/%d/" % post.pk).json()["body"]
+            self.assertEqual(
+                body[2]["value"],
+                {
+                    "id": self.image.pk,
+                    "url": None,
+                    "width": None,
+                    "height": None,
+                    "alt": "Alt",
+                },
+            )
+            for callback in callbacks:
+                callback()
+
+        body = self.get("/en/api/v1/pages/%d/" % post.pk).json()["body"]
+        self.assertEqual(
+            [block["type"] for block in body], ["heading", "paragraph", "image"]
+        )
+        self.assertEqual(body[1]["value"], "<p>Paragraph</p>")
+        image = body[2]["value"]
+        self.assertEqual(image["alt"], "Alt")
+        self.assertRegex(
+            image["url"], r"^http://testserver/media/images/.*\.max-800x600\.png$"
+        )
+
+        main_image = self.get("/en/api/v1/pages/%d/" % home.pk).json()["main_image"]
+        self.assertIn(".max-500x500.", main_image["url"])
+        self.assertEqual(main_image["alt"], "Default alt")
+
+        # The gallery's renditions are generated in the background
+        with override_settings(RENDITION_WARMUP_WORKERS=0):
+            with self.captureOnCommitCallbacks() as callbacks:
+                images = self.get("/en/api/v1/pages/%d/" % gallery.pk).json()["images"]
+            self.assertEqual(
+                images,
+                [{"alt": "Default alt", "width": None, "height": None, "sources": {}}],
+            )
+            self.assertFalse(
+                CustomRendition.objects.filter(filter_spec__contains="avif").exists()
+            )
+            for callback in callbacks:
+                callback()
+
+        images = self.get("/en/api/v1/pages/%d/" % gallery.pk).json()["images"]
+        self.assertEqual(set(images[0]["sources"]), {"avif", "webp", "jpeg"})
+        self.assertNotIn("html", images[0])
+
+    def test_detail_only_shows_live_pages(self):
+        post = self.add_post("Post", datetime.date(2024, 1, 1))
+        self.assertEqual(
+            self.get("/en/api/v1/pages/%d/" % post.pk, fields="title").json(),
+            {"id": post.pk, "type": "blog.BlogPage", "locale": "en", "title": "Post"},
+        )
+        post.unpublish()
+        cache.clear()
+        for page in [post, self.root]:
+            response = self.client.get("/en/api/v1/pages/%d/" % page.pk)
+            self.assertEqual(response.status_code, 404)
+
+    def test_revalidation(self):
+        self.add_post("Post", datetime.date(2024, 1, 1))
+        response = self.get("/en/api/v1/pages/", type="blog.BlogPage")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                "/en/api/v1/pages/",
+                {"type": "blog.BlogPage"},
+                HTTP_IF_NONE_MATCH=response["ETag"],
+            )
+        self.assertEqual(response.status_code, 304)
+
+        etag = response["ETag"]
+        self.add_post("Other", datetime.date(2024, 1, 2)).save_revision().publish()
+        response = self.client.get(
+            "/en/api/v1/pages/", {"type": "blog.BlogPage"}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["items"]), 2)
+
+    def test_invalid_parameters(self):
+        for params in [
+            {},
+            {"type": "wagtailcore.Page"},
+            {"type": "blog.BlogPage", "fields": "title,password"},
+            {"type": "blog.BlogPage", "cursor": "not a cursor"},
+            {"type": "blog.BlogPage", "limit": "1000"},
+            {"type": "blog.BlogPage", "locale": "xx"},
+        ]:
+            with self.subTest(params=params):
+                response = self.client.get("/en/api/v1/pages/", params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("message", response.json())
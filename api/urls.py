@@ -0,0 +1,8 @@
+from django.urls import path
+
+from api import views
+
+urlpatterns = [
+    path("pages/", views.page_listing, name="api_pages"),
+    path("pages/<int:page_id>/", views.page_detail, name="api_page"),
+]
@@ -0,0 +1,248 @@
+"""
+A read-only JSON API for the blog's pages.
+
+    /en/api/v1/pages/?type=blog.BlogPage&fields=title,intro,date&locale=fr
+    /en/api/v1/pages/<id>/?fields=title,body
+
+The language prefix, as for every public URL, doesn't filter the pages: the
+locale parameter does.
+
+Listings are ordered by a unique key (e.g. date and id for posts) and
+paginated with an opaque cursor naming the last item of the previous page,
+so each page is a single indexed range query however deep it is.
+
+Responses carry an ETag and Last-Modified from the time any content last
+changed (see pagecache.conditional), so revalidating them needs no queries.
+"""
+import base64
+import hashlib
+import json
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_safe
+
+from wagtail.models import Page
+
+from custom_media.renditions import prefetch_renditions, schedule_warmup
+from pagecache.conditional import get_content_changed
+
+from api.fields import PAGE_TYPES
+
+API_VERSION = 1
+
+
+class ApiError(Exception):
+    pass
+
+
+def api_etag(request, *args, **kwargs):
+    version = "%s:%s:%s" % (
+        API_VERSION,
+        get_content_changed(),
+        request.get_full_path(),
+    )
+    return '"%s"' % hashlib.md5(version.encode()).hexdigest()
+
+
+def api_last_modified(request, *args, **kwargs):
+    return datetime.fromtimestamp(int(get_content_changed()), timezone.utc)
+
+
+def get_page_type(request):
+    name = request.GET.get("type", "")
+    try:
+        return PAGE_TYPES[name.lower()]
+    except KeyError:
+        raise ApiError(
+            "type must be one of: %s"
+            % ", ".join(page_type.name for page_type in PAGE_TYPES.values())
+        )
+
+
+def get_fields(request, page_type, default):
+    fields = request.GET.get("fields")
+    if not fields:
+        return default
+    if fields == "*":
+        return list(page_type.fields)
+    fields = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in page_type.fields]
+    if unknown:
+        raise ApiError(
+            "Unknown fields for %s: %s" % (page_type.name, ", ".join(unknown))
+        )
+    return fields
+
+
+def get_queryset(page_type, fields):
+    """
+    Returns the live, public pages of a type, with only the columns and
+    relations the fields read.
+    """
+    only = ["locale__language_code"]
+    select_related = ["locale"]
+    prefetch_related = []
+    for name in fields:
+        field = page_type.fields[name]
+        only.extend(field.only)
+        select_related.extend(field.select_related)
+        prefetch_related.extend(field.prefetch_related)
+    only.extend(name.lstrip("-") for name in page_type.ordering)
+    return (
+        page_type.model.objects.live()
+        .public()
+        .select_related(*select_related)
+        .prefetch_related(*prefetch_related)
+        .only(*only, *select_related)
+    )
+
+
+def serialize_pages(request, page_type, pages, fields):
+    # The renditions for the whole page of results
+    renditions = {True: [], False: []}
+    for name in fields:
+        field = page_type.fields[name]
+        if field.prefetch is not None:
+            renditions[field.create_renditions].extend(field.prefetch(pages))
+    prefetch_renditions(renditions[True])
+    missing = prefetch_renditions(renditions[False], create=False)
+    if missing:
+        schedule_warmup(
+            {image.pk for image, _ in missing},
+            sorted({filter_spec for _, filter_spec in missing}),
+        )
+    return [
+        {
+            "id": page.pk,
+            "type": page_type.name,
+            "locale": page.locale.language_code,
+            **{
+                name: page_type.fields[name].get_value(page, request)
+                for name in fields
+            },
+        }
+        for page in pages
+    ]
+
+
+def encode_cursor(page, ordering):
+    values = [page.serializable_value(name.lstrip("-")) for name in ordering]
+    data = json.dumps(values, default=str).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(cursor, page_type):
+    """
+    Returns a filter for the pages after the one a cursor names.
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(data)
+        if not isinstance(values, list) or len(values) != len(page_type.ordering):
+            raise ValueError
+        names = [name.lstrip("-") for name in page_type.ordering]
+        values = [
+            page_type.model._meta.get_field(name).to_python(value)
+            for name, value in zip(names, values)
+        ]
+    except Exception:
+        raise ApiError("Invalid cursor")
+
+    # e.g. for ("-date", "-id"): date < d, or date = d and id < i
+    after = Q()
+    for i, ordering_name in enumerate(page_type.ordering):
+        lookup = "lt" if ordering_name.startswith("-") else "gt"
+        clause = Q(**{"%s__%s" % (names[i], lookup): values[i]})
+        for name, value in zip(names[:i], values):
+            clause &= Q(**{name: value})
+        after |= clause
+    return after
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get("limit", settings.API_PAGE_SIZE))
+    except ValueError:
+        raise ApiError("limit must be a number")
+    if not 1 <= limit <= settings.API_MAX_PAGE_SIZE:
+        raise ApiError("limit must be between 1 and %d" % settings.API_MAX_PAGE_SIZE)
+    return limit
+
+
+def error_response(error):
+    return JsonResponse({"message": str(error)}, status=400)
+
+
+@require_safe
+@cache_control(no_cache=True)
+@condition(etag_func=api_etag, last_modified_func=api_last_modified)
+def page_listing(request):
+    try:
+        page_type = get_page_type(request)
+        fields = get_fields(request, page_type, page_type.listing_fields)
+        limit = get_limit(request)
+        pages = get_queryset(page_type, fields).order_by(*page_type.ordering)
+
+        locale = request.GET.get("locale")
+        if locale:
+            if locale not in dict(settings.WAGTAIL_CONTENT_LANGUAGES):
+                raise ApiError("Unknown locale: %s" % locale)
+            pages = pages.filter(locale__language_code=locale)
+        child_of = request.GET.get("child_of")
+        if child_of:
+            try:
+                pages = pages.child_of(Page.objects.get(pk=int(child_of)))
+            except (ValueError, Page.DoesNotExist):
+                raise ApiError("child_of must be the id of a page")
+        cursor = request.GET.get("cursor")
+        if cursor:
+            pages = pages.filter(decode_cursor(cursor, page_type))
+    except ApiError as e:
+        return error_response(e)
+
+    # One more than the limit tells whether there's a next page
+    pages = list(pages[: limit + 1])
+    next_url = None
+    if len(pages) > limit:
+        pages = pages[:limit]
+        params = request.GET.copy()
+        params["cursor"] = encode_cursor(pages[-1], page_type.ordering)
+        next_url = request.build_absolute_uri("?" + params.urlencode())
+
+    return JsonResponse(
+        {
+            "meta": {"next": next_url},
+            "items": serialize_pages(request, page_type, pages, fields),
+        }
+    )
+
+
+@require_safe
+@cache_control(no_cache=True)
+@condition(etag_func=api_etag, last_modified_func=api_last_modified)
+def page_detail(request, page_id):
+    content_type_id = (
+        Page.objects.filter(pk=page_id).values_list("content_type", flat=True).first()
+    )
+    if content_type_id is None:
+        raise Http404
+    model = ContentType.objects.get_for_id(content_type_id).model_class()
+    page_type = PAGE_TYPES.get(model._meta.label_lower)
+    if page_type is None:
+        raise Http404
+
+    try:
+        fields = get_fields(request, page_type, list(page_type.fields))
+    except ApiError as e:
+        return error_response(e)
+    try:
+        # Only live and public pages
+        page = get_queryset(page_type, fields).get(pk=page_id)
+    except page_type.model.DoesNotExist:
+        raise Http404
+    return JsonResponse(serialize_pages(request, page_type, [page], fields)[0])
@@ -1,4 +1,4 @@
-import re
+from html.parser import HTMLParser
 
 from django.core.exceptions import ValidationError
 from django.utils.safestring import mark_safe
@@ -17,6 +17,8 @@ from wagtail.blocks import (
 from wagtail.embeds.blocks import EmbedBlock
 from wagtail.images.blocks import ImageChooserBlock
 
+from custom_media.renditions import register_filter_spec
+
 
 class HeadingBlock(StructBlock):
     size = ChoiceBlock(
@@ -66,6 +68,9 @@ class ImageBlock(StructBlock):
         help_text="If this image does not contain meaningful content or is described in nearby text, check this box to not output its alt text.",
     )
 
+    # the rendition blocks/image_block.html displays
+    filter_spec = "max-800x600"
+
     def clean(self, value):
         result = super().clean(value)
 
@@ -103,6 +108,25 @@ class ImageBlock(StructBlock):
         value_class = ImageStructValue
 
 
+register_filter_spec(ImageBlock.filter_spec)
+
+
+class HeadingLevelParser(HTMLParser):
+    """
+    Collects the levels of the H2-H6 tags in a fragment of HTML, in order.
+    """
+
+    heading_tags = {"h2", "h3", "h4", "h5", "h6"}
+
+    def __init__(self):
+        super().__init__()
+        self.levels = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.heading_tags:
+            self.levels.append(int(tag[1]))
+
+
 class BaseStreamBlock(StreamBlock):
     heading = HeadingBlock()
     paragraph = RichTextBlock()
@@ -112,38 +136,34 @@ class BaseStreamBlock(StreamBlock):
     def clean(self, value):
         result = super().clean(value)
 
-        headings = [
-            # tuples of block index and heading level
-            (0, 1)  # mock H1 block at index 0
-        ]
         errors = {}
-
-        # first iterate through all blocks in the StreamBlock
-        for i in range(0, len(result)):
-            # if a block is of type "heading?
-            if result[i].block_type == "heading":
-                # convert size string to integer
-                level = int(result[i].value.get("size")[-1:])
-                # append tuple of block index and heading level to list
-                headings.append((i, level))
-            elif result[i].block_type == "paragraph":
-                # look for headings within the RichTextBlock and add those to the list
-                for match in re.findall(r"\<h[2-6]", result[i].render()):
-                    level = int(match[-1:])
-                    headings.append((i, level))
-
-        # now iterate through list of headings,
-        # starting with second heading to skip over the mock H1 heading block
-        for i in range(1, len(headings)):
-            # compare its level to the previous heading's level
-            if int(headings[i][1]) - int(headings[i - 1][1]) > 1:
-                # if the difference is more than 1,
-                # add an error to the array with its original index
-                errors[headings[i][0]] = ValidationError(
-                    "Incorrect heading hierarchy. Avoid skipping levels."
-                )
+        # the page title is the H1, so the first heading should be an H2
+        previous_level = 1
+
+        for i, child in enumerate(result):
+            for level in self.get_heading_levels(child):
+                # flag any heading more than one level below the previous heading,
+                # keyed by the index of the block it belongs to
+                if level - previous_level > 1:
+                    errors[i] = ValidationError(
+                        "Incorrect heading hierarchy. Avoid skipping levels."
+                    )
+                previous_level = level
 
         if errors:
             raise StreamBlockValidationError(block_errors=errors)
 
         return result
+
+    def get_heading_levels(self, child):
+        if child.block_type == "heading":
+            # convert size string to integer
+            return [int(child.value.get("size")[-1:])]
+        elif child.block_type == "paragraph":
+            # read headings from the stored rich text rather than rendering it,
+            # which would rewrite every link and embed in the paragraph
+            parser = HeadingLevelParser()
+            parser.feed(child.value.source)
+            parser.close()
+            return parser.levels
+        return []
@@ -0,0 +1,114 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import translation
+from django.utils.safestring import mark_safe
+
+from wagtail.images import get_image_model
+
+from custom_media.renditions import iter_block_image_ids
+from pagecache.dependencies import add_object_dependency
+
+
+class CacheStats:
+    """Hit and miss counters for a cache, kept per process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def as_dict(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+body_cache_stats = CacheStats()
+
+
+def get_body_cache():
+    return caches[settings.BLOG_BODY_CACHE]
+
+
+def body_cache_key(page_id, revision_id, language_code):
+    return "blog:body:%s:%s:%s" % (page_id, revision_id, language_code)
+
+
+def render_body(page):
+    # Cache hits don't load the images, so record them for the page cache here
+    for image_id in iter_block_image_ids(page.body.stream_block, page.body.raw_data):
+        add_object_dependency(get_image_model(), image_id)
+
+    # Rich text links are rewritten for the active language, so it's part of
+    # the key along with the revision the body was rendered from.
+    key = body_cache_key(page.pk, page.latest_revision_id, translation.get_language())
+    cache = get_body_cache()
+
+    html = cache.get(key)
+    body_cache_stats.record(html is not None)
+    if html is None:
+        page.prefetch_renditions()
+        html = page.body.render_as_block()
+        cache.set(key, str(html), settings.BLOG_BODY_CACHE_TIMEOUT)
+
+    return mark_safe(html)
+
+
+def render_bodies(pages):
+    """
+    Returns the rendered bodies of several posts, by page id, with one cache
+    lookup. The posts may be loaded without their body, which is only loaded
+    (with one query) for those that aren't cached.
+    """
+    language_code = translation.get_language()
+    keys = {
+        body_cache_key(page.pk, page.latest_revision_id, language_code): page
+        for page in pages
+    }
+    cache = get_body_cache()
+    cached = cache.get_many(keys)
+
+    bodies = {}
+    missing = {}
+    for key, page in keys.items():
+        body_cache_stats.record(key in cached)
+        if key in cached:
+            bodies[page.pk] = mark_safe(cached[key])
+        else:
+            missing[page.pk] = key
+
+    if missing:
+        rendered = {}
+        for page in type(pages[0]).objects.filter(pk__in=missing).only("body"):
+            page.prefetch_renditions()
+            html = str(page.body.render_as_block())
+            rendered[missing[page.pk]] = html
+            bodies[page.pk] = mark_safe(html)
+        cache.set_many(rendered, settings.BLOG_BODY_CACHE_TIMEOUT)
+
+    return bodies
+
+
+def invalidate_body(page, revision_ids):
+    languages = {code for code, name in settings.LANGUAGES}
+    languages.add(settings.LANGUAGE_CODE)
+    get_body_cache().delete_many(
+        [
+            body_cache_key(page.pk, revision_id, language_code)
+            for revision_id in revision_ids
+            if revision_id is not None
+            for language_code in languages
+        ]
+    )
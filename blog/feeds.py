@@ -0,0 +1,131 @@
+"""
+RSS, Atom and JSON feeds of a blog index's posts, written a post at a time.
+
+The feed classes are Django's syndication feed generators, but they take
+their items from a generator and yield the feed in chunks, so a
+StreamingHttpResponse can send an archive of any size without it ever being
+held in memory whole.
+"""
+import json
+from io import StringIO
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed, SyndicationFeed
+from django.utils.xmlutils import SimplerXMLGenerator
+
+
+def drain(buffer):
+    chunk = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return chunk
+
+
+class StreamingFeedMixin:
+    def __init__(self, *args, updated, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.updated = updated
+
+    def latest_post_date(self):
+        # The items aren't known when the feed's own elements are written
+        return self.updated
+
+    def stream(self, items):
+        """
+        Yields the feed, with an item for each dict of add_item() arguments
+        in items.
+        """
+        buffer = StringIO()
+        handler = SimplerXMLGenerator(buffer, "utf-8", short_empty_elements=True)
+        handler.startDocument()
+        self.start_feed(handler)
+        self.add_root_elements(handler)
+        yield drain(buffer)
+
+        for item in items:
+            self.items = []
+            self.add_item(**item)
+            self.write_items(handler)
+            yield drain(buffer)
+
+        self.end_feed(handler)
+        yield drain(buffer)
+
+
+class StreamingRssFeed(StreamingFeedMixin, Rss201rev2Feed):
+    def rss_attributes(self):
+        return {
+            **super().rss_attributes(),
+            "xmlns:content": "http://purl.org/rss/1.0/modules/content/",
+        }
+
+    def start_feed(self, handler):
+        handler.startElement("rss", self.rss_attributes())
+        handler.startElement("channel", self.root_attributes())
+
+    def end_feed(self, handler):
+        self.endChannelElement(handler)
+        handler.endElement("rss")
+
+    def add_item_elements(self, handler, item):
+        super().add_item_elements(handler, item)
+        if item.get("content") is not None:
+            handler.addQuickElement("content:encoded", item["content"])
+
+
+class StreamingAtomFeed(StreamingFeedMixin, Atom1Feed):
+    def start_feed(self, handler):
+        handler.startElement("feed", self.root_attributes())
+
+    def end_feed(self, handler):
+        handler.endElement("feed")
+
+    def add_item_elements(self, handler, item):
+        super().add_item_elements(handler, item)
+        if item.get("content") is not None:
+            handler.addQuickElement("content", item["content"], {"type": "html"})
+
+
+class StreamingJsonFeed(StreamingFeedMixin, SyndicationFeed):
+    # https://www.jsonfeed.org/version/1.1/
+    content_type = "application/feed+json; charset=utf-8"
+
+    def stream(self, items):
+        feed = {
+            "version": "https://jsonfeed.org/version/1.1",
+            "title": self.feed["title"],
+            "home_page_url": self.feed["link"],
+            "feed_url": self.feed["feed_url"],
+            "description": self.feed["description"],
+            "language": self.feed["language"],
+        }
+        # The items are written between the other members and the closing brace
+        yield json.dumps(feed, cls=DjangoJSONEncoder)[:-1] + ', "items": ['
+
+        separator = ""
+        for item in items:
+            self.items = []
+            self.add_item(**item)
+            yield separator + json.dumps(self.item_json(self.items[0]), cls=DjangoJSONEncoder)
+            separator = ", "
+
+        yield "]}"
+
+    def item_json(self, item):
+        data = {
+            "id": item["unique_id"] or item["link"],
+            "url": item["link"],
+            "title": item["title"],
+            "summary": item["description"],
+            "content_html": item.get("content"),
+            "date_published": item["pubdate"],
+            "date_modified": item["updateddate"],
+        }
+        return {key: value for key, value in data.items() if value is not None}
+
+
+FEED_CLASSES = {
+    "rss": StreamingRssFeed,
+    "atom": StreamingAtomFeed,
+    "json": StreamingJsonFeed,
+}
@@ -0,0 +1,84 @@
+import re
+import timeit
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+
+from wagtail.blocks import StreamBlock, StreamBlockValidationError
+
+from blog.blocks import BaseStreamBlock
+
+PARAGRAPH = (
+    '<p data-block-key="a1">Lorem ipsum dolor sit amet, '
+    '<a href="https://example.com/">consectetur</a> adipiscing elit.</p>'
+    '<h3 data-block-key="a2">RichTextBlock level 3 heading</h3>'
+    '<p data-block-key="a3">Sed do eiusmod tempor incididunt ut labore.</p>'
+)
+
+
+def legacy_clean(block, value):
+    # The render-based validation BaseStreamBlock.clean used to do
+    result = StreamBlock.clean(block, value)
+
+    headings = [(0, 1)]
+    errors = {}
+    for i in range(0, len(result)):
+        if result[i].block_type == "heading":
+            headings.append((i, int(result[i].value.get("size")[-1:])))
+        elif result[i].block_type == "paragraph":
+            for match in re.findall(r"\<h[2-6]", result[i].render()):
+                headings.append((i, int(match[-1:])))
+
+    for i in range(1, len(headings)):
+        if int(headings[i][1]) - int(headings[i - 1][1]) > 1:
+            errors[headings[i][0]] = ValidationError(
+                "Incorrect heading hierarchy. Avoid skipping levels."
+            )
+
+    if errors:
+        raise StreamBlockValidationError(block_errors=errors)
+
+    return result
+
+
+class Command(BaseCommand):
+    help = "Compare render-based and tokenizer-based heading validation of post bodies"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="10,100,1000",
+            help="Comma-separated numbers of blocks per body (default: 10,100,1000)",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Timing runs per size (default: 5)"
+        )
+
+    def handle(self, *args, **options):
+        block = BaseStreamBlock()
+
+        self.stdout.write("%8s %14s %14s %9s" % ("blocks", "render (ms)", "tokenize (ms)", "speedup"))
+        for size in [int(size) for size in options["sizes"].split(",")]:
+            value = block.to_python(self.make_body(size))
+
+            legacy = self.time(lambda: legacy_clean(block, value), options["repeat"])
+            current = self.time(lambda: block.clean(value), options["repeat"])
+
+            self.stdout.write(
+                "%8d %14.2f %14.2f %8.1fx"
+                % (size, legacy * 1000, current * 1000, legacy / current)
+            )
+
+    def make_body(self, size):
+        # alternate H2 heading blocks with paragraphs containing an H3,
+        # so the body is valid and every block is inspected
+        body = []
+        for i in range(size):
+            if i % 2:
+                body.append({"type": "paragraph", "value": PARAGRAPH})
+            else:
+                body.append({"type": "heading", "value": {"size": "h2", "text": "Heading"}})
+        return body
+
+    def time(self, func, repeat):
+        return min(timeit.repeat(func, number=1, repeat=repeat))
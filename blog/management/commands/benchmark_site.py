@@ -0,0 +1,295 @@
+import io
+import json
+import math
+import os
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.template import Context, Template
+from django.test import Client, RequestFactory, override_settings
+from django.test.utils import (
+    CaptureQueriesContext,
+    setup_databases,
+    teardown_databases,
+)
+from django.urls import reverse
+from django.utils import translation
+
+from wagtail.images import get_image_model
+from wagtail.models import Site
+
+from blog.models import BlogIndexPage, BlogPage, ImageGalleryPage
+from navigation.models import MainNavigation
+from search.analytics import query_hits
+
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, "benchmarks", "baseline.json")
+
+NAVIGATION_TEMPLATE = Template("{% load navigation_tags %}{% get_main_navigation %}")
+SWITCHER_TEMPLATE = Template('{% include "navigation/switcher.html" %}')
+
+
+def percentile(latencies, fraction):
+    # Nearest rank, of sorted latencies
+    return latencies[max(0, math.ceil(fraction * len(latencies)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the throughput and latency of page views over a seeded site, "
+        "in a test database, and compare them with a baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--posts", type=int, default=200, help="Posts per locale (default: 200)"
+        )
+        parser.add_argument(
+            "--images", type=int, default=12, help="Images (default: 12)"
+        )
+        parser.add_argument(
+            "--seed", type=int, default=1, help="Random seed of the data (default: 1)"
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Timed requests per scenario (default: 200)",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=20,
+            help="Untimed requests per scenario first, e.g. to fill caches "
+            "(default: 20)",
+        )
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            dest="scenarios",
+            help="Scenario to run, can be repeated (default: all)",
+        )
+        parser.add_argument(
+            "--baseline",
+            default=DEFAULT_BASELINE,
+            help="JSON results to compare with (default: benchmarks/baseline.json)",
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Write the results to the baseline file instead of comparing",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.25,
+            help="Fraction by which p95 latency may grow before it's reported "
+            "as a regression (default: 0.25)",
+        )
+
+    def handle(self, *args, **options):
+        dataset = {key: options[key] for key in ["posts", "images", "seed"]}
+        with ExitStack() as stack:
+            media_root = stack.enter_context(tempfile.TemporaryDirectory())
+            # Measure rendering, rather than the page caches or instrumentation
+            stack.enter_context(
+                override_settings(
+                    MEDIA_ROOT=media_root,
+                    PAGE_CACHE=None,
+                    PRERENDER_SERVE=False,
+                    INSTRUMENTATION_SAMPLE_RATE=0,
+                    SEARCH_INDEX_WORKER=None,
+                    SEARCH_QUERY_LOG_FLUSH_INTERVAL=None,
+                )
+            )
+            old_config = setup_databases(
+                verbosity=0, interactive=False, aliases=set(connections)
+            )
+            stack.callback(teardown_databases, old_config, verbosity=0)
+            # Saves the searches' query hits before the database is gone
+            stack.callback(query_hits.flush)
+
+            scenarios = self.build_site(dataset)
+            names = options["scenarios"] or list(scenarios)
+            unknown = set(names) - set(scenarios)
+            if unknown:
+                raise CommandError("Unknown scenarios: %s" % ", ".join(sorted(unknown)))
+
+            results = {}
+            for name in names:
+                results[name] = self.measure(
+                    scenarios[name], options["requests"], options["warmup"]
+                )
+
+        if options["save_baseline"]:
+            os.makedirs(os.path.dirname(options["baseline"]), exist_ok=True)
+            with open(options["baseline"], "w") as f:
+                json.dump({"dataset": dataset, "results": results}, f, indent=2)
+                f.write("\n")
+            self.report(results, {})
+            self.stdout.write("Saved the baseline to %s" % options["baseline"])
+            return
+
+        baseline = self.read_baseline(options["baseline"], dataset)
+        regressions = self.report(results, baseline, options["threshold"])
+        if regressions:
+            raise CommandError("Regressions: %s" % ", ".join(regressions))
+
+    def build_site(self, dataset):
+        """
+        Seeds the test database, and returns the scenarios: functions making
+        one request or render each.
+        """
+        call_command(
+            "seed_data",
+            posts=dataset["posts"],
+            images=dataset["images"],
+            seed=dataset["seed"],
+            locales="en,fr",
+            stdout=io.StringIO(),
+        )
+        site = Site.objects.get(is_default_site=True)
+        home = site.root_page.specific
+        index = BlogIndexPage.objects.get(locale__language_code="en")
+        post = BlogPage.objects.filter(locale__language_code="en").first()
+        MainNavigation.objects.create(name="Blog", menu_page=index)
+
+        gallery = ImageGalleryPage(title="Gallery", slug="gallery")
+        for image in get_image_model().objects.all():
+            gallery.gallery_images.create(image=image)
+        home.add_child(instance=gallery)
+        call_command("update_index", stdout=io.StringIO())
+
+        client = Client(HTTP_HOST=site.hostname)
+        request = RequestFactory(HTTP_HOST=site.hostname).get("/en/")
+
+        def get(url):
+            def view():
+                response = client.get(url)
+                if response.status_code != 200:
+                    raise CommandError("%s returned %d" % (url, response.status_code))
+
+            return view
+
+        def render(template, **context):
+            def view():
+                with translation.override("en"):
+                    template.render(Context({"request": request, **context}))
+
+            return view
+
+        with translation.override("en"):
+            return {
+                "home": get(home.url),
+                "blog_index": get(index.url),
+                "blog_post": get(post.url),
+                "gallery": get(gallery.url),
+                "search": get(reverse("search") + "?query=lorem+ipsum"),
+                "navigation": render(NAVIGATION_TEMPLATE),
+                "switcher": render(SWITCHER_TEMPLATE, page=post),
+            }
+
+    def measure(self, view, requests, warmup):
+        for i in range(warmup):
+            view()
+
+        with ExitStack() as stack:
+            captured = [
+                stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in connections
+            ]
+            view()
+        queries = sum(len(queries) for queries in captured)
+
+        tracemalloc.start()
+        view()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        latencies = []
+        started = time.perf_counter()
+        for i in range(requests):
+            start = time.perf_counter()
+            view()
+            latencies.append(time.perf_counter() - start)
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+
+        return {
+            "requests_per_second": round(requests / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+            "queries": queries,
+            "peak_memory_kb": round(peak_memory / 1024, 1),
+        }
+
+    def read_baseline(self, path, dataset):
+        if not os.path.exists(path):
+            self.stdout.write("No baseline at %s" % path)
+            return {}
+        with open(path) as f:
+            baseline = json.load(f)
+        if baseline["dataset"] != dataset:
+            self.stdout.write(
+                self.style.WARNING(
+                    "The baseline was measured over another dataset: %s"
+                    % baseline["dataset"]
+                )
+            )
+        return baseline["results"]
+
+    def report(self, results, baseline, threshold=None):
+        """
+        Writes the results, compared with the baseline's, and returns the
+        scenarios that regressed.
+        """
+        self.stdout.write(
+            "%-12s %9s %9s %9s %9s %8s %10s"
+            % ("scenario", "req/s", "p50 ms", "p95 ms", "p99 ms", "queries", "peak KiB")
+        )
+        regressions = []
+        for name, result in results.items():
+            self.stdout.write(
+                "%-12s %9.1f %9.2f %9.2f %9.2f %8d %10.1f"
+                % (
+                    name,
+                    result["requests_per_second"],
+                    result["p50_ms"],
+                    result["p95_ms"],
+                    result["p99_ms"],
+                    result["queries"],
+                    result["peak_memory_kb"],
+                )
+            )
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            self.stdout.write(
+                "%-12s %+8.0f%% %+8.0f%% %+8.0f%% %+8.0f%% %+8d %+9.0f%%"
+                % (
+                    "",
+                    self.change(result, previous, "requests_per_second"),
+                    self.change(result, previous, "p50_ms"),
+                    self.change(result, previous, "p95_ms"),
+                    self.change(result, previous, "p99_ms"),
+                    result["queries"] - previous["queries"],
+                    self.change(result, previous, "peak_memory_kb"),
+                )
+            )
+            if (
+                result["queries"] > previous["queries"]
+                or result["p95_ms"] > previous["p95_ms"] * (1 + threshold)
+            ):
+                regressions.append(name)
+        return regressions
+
+    def change(self, result, previous, key):
+        if not previous[key]:
+            return 0
+        return (result[key] - previous[key]) / previous[key] * 100
@@ -1,35 +1,328 @@
+import datetime
+import io
+import random
+import uuid
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
 
-from wagtail.models import Page
+from PIL import Image as PILImage
+from wagtail.images import get_image_model
+from wagtail.models import Locale, Page, Revision, Site
 
 from blog.models import BlogIndexPage, BlogPage
 
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud "
+    "exercitation ullamco laboris nisi aliquip ex ea commodo consequat duis aute irure "
+    "in reprehenderit voluptate velit esse cillum fugiat nulla pariatur excepteur sint "
+    "occaecat cupidatat non proident sunt culpa qui officia deserunt mollit anim id est"
+).split()
+
 
 class Command(BaseCommand):
-    help = "Create initial blog data"
+    help = "Create blog data, optionally in bulk for load testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--posts", type=int, default=1, help="Number of blog posts to create (default: 1)"
+        )
+        parser.add_argument(
+            "--locales",
+            help="Comma-separated language codes to create each post in "
+            "(default: the language of the site's home page)",
+        )
+        parser.add_argument(
+            "--images",
+            type=int,
+            default=0,
+            help="Number of images to create and use in post bodies (default: 0)",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=None, help="Random seed, for reproducible data"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of rows written per insert (default: 1000)",
+        )
 
     def handle(self, *args, **options):
-        # Create a blog index page instance
-        blog_index = BlogIndexPage(
-            title="Demo Blog Index",
-            slug="demo-blog-index",
-            intro="Welcome to my blog!",
-            live=True,
-        )
-        # Add it as a child of the homepage
-        home = Page.objects.get(pk=3)
-        home.add_child(instance=blog_index)
-
-        # Create blog page instances
-        blog_page = BlogPage(
-            title="Hello, world!",
-            slug="hello-world",
-            date="2024-01-01",
-            intro="This is my first blog post.",
-            body='[{"type": "heading", "value": {"size": "h3", "text": "HeadingBlock level 3 heading"}, "id": "87964bfb-bf30-4bc8-b569-7acd3a14bf9b"}, {"type": "paragraph", "value": "<p data-block-key=\\"79s93\\">Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat. Duis aute irure dolor in reprehenderit in voluptate velit esse cillum dolore eu fugiat nulla pariatur. Excepteur sint occaecat cupidatat non proident, sunt in culpa qui officia deserunt mollit anim id est laborum.</p>", "id": "b819273e-8f80-46e1-a31a-405fbf5035f4"}, {"type": "heading", "value": {"size": "h2", "text": "HeadingBlock level 2 heading"}, "id": "ed20da3e-e3c6-499b-99af-2da4c8fb4e2c"}, {"type": "paragraph", "value": "<p data-block-key=\\"300ti\\">Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat. Duis aute irure dolor in reprehenderit in voluptate velit esse cillum dolore eu fugiat nulla pariatur. Excepteur sint occaecat cupidatat non proident, sunt in culpa qui officia deserunt mollit anim id est laborum.</p><h4 data-block-key=\\"4dqak\\">RichTextBlock level 4 heading</h4><p data-block-key=\\"a7smt\\">Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat. Duis aute irure dolor in reprehenderit in voluptate velit esse cillum dolore eu fugiat nulla pariatur. Excepteur sint occaecat cupidatat non proident, sunt in culpa qui officia deserunt mollit anim id est laborum.</p>", "id": "6e0c36f6-3f0c-450d-80f7-7d31dee49e06"}]',
-            live=True,
-        )
-        # Add it as a child of the blog index
-        blog_index.add_child(instance=blog_page)
-
-        print("✅ Blog data seeding complete!")
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.now = timezone.now()
+        # The slugs of each index's children, as posts are added
+        self.slugs = {}
+
+        home = Site.objects.get(is_default_site=True).root_page.specific
+        if options["locales"]:
+            locales = [
+                Locale.objects.get_or_create(language_code=code.strip())[0]
+                for code in options["locales"].split(",")
+            ]
+        else:
+            locales = [home.locale]
+
+        images = self.create_images(options["images"])
+
+        # The index pages are created the usual way, one per locale, as
+        # translations of each other
+        indexes = self.get_blog_indexes(home, locales)
+
+        created = 0
+        while created < options["posts"]:
+            count = min(self.batch_size, options["posts"] - created)
+            bodies = [self.make_body(images) for i in range(count)]
+            translation_keys = [self.make_uuid() for i in range(count)]
+            with transaction.atomic():
+                for index in indexes:
+                    self.create_posts(index, bodies, translation_keys)
+            created += count
+            self.stdout.write("Created %d of %d posts" % (created, options["posts"]))
+
+        self.stdout.write(
+            "Run ./manage.py update_index to add the new posts to the search index"
+        )
+        self.stdout.write(self.style.SUCCESS("✅ Blog data seeding complete!"))
+
+    def get_blog_indexes(self, home, locales):
+        indexes = []
+        for locale in locales:
+            locale_home = home.get_translation_or_none(locale)
+            if locale_home is None:
+                locale_home = home.copy_for_translation(locale)
+                locale_home.save_revision().publish()
+
+            index = (
+                BlogIndexPage.objects.child_of(locale_home)
+                .filter(slug="demo-blog-index")
+                .first()
+            )
+            if index is None and indexes:
+                index = indexes[0].copy_for_translation(locale)
+                index.save_revision().publish()
+            elif index is None:
+                # Create a blog index page instance
+                index = BlogIndexPage(
+                    title="Demo Blog Index",
+                    slug="demo-blog-index",
+                    intro="Welcome to my blog!",
+                    live=True,
+                )
+                # Add it as a child of the homepage
+                locale_home.add_child(instance=index)
+            indexes.append(index)
+        return indexes
+
+    def create_posts(self, index, bodies, translation_keys):
+        # Page.add_child() looks up the last sibling and rewrites the parent for
+        # every post, so instead give each post the next materialised path after
+        # the index's last child and insert them all at once. The paths of
+        # deleted children leave gaps, so numchild can't be used.
+        index.refresh_from_db(fields=["numchild"])
+        last_child = index.get_last_child()
+        last_position = 0 if last_child is None else last_child._get_lastpos_in_path()
+        if index.pk not in self.slugs:
+            self.slugs[index.pk] = set(
+                Page.objects.child_of(index).values_list("slug", flat=True)
+            )
+        slugs = self.slugs[index.pk]
+        content_type = ContentType.objects.get_for_model(BlogPage)
+        base_content_type = ContentType.objects.get_for_model(Page)
+
+        posts = []
+        for i, (body, translation_key) in enumerate(zip(bodies, translation_keys)):
+            position = last_position + i + 1
+            slug = base_slug = "post-%d" % position
+            suffix = 1
+            while slug in slugs:
+                suffix += 1
+                slug = "%s-%d" % (base_slug, suffix)
+            slugs.add(slug)
+            title = self.make_sentence(3, 8).rstrip(".")
+            posts.append(
+                BlogPage(
+                    title=title,
+                    draft_title=title,
+                    slug=slug,
+                    content_type=content_type,
+                    locale_id=index.locale_id,
+                    translation_key=translation_key,
+                    path=Page._get_path(index.path, index.depth + 1, position),
+                    depth=index.depth + 1,
+                    numchild=0,
+                    url_path="%s%s/" % (index.url_path, slug),
+                    live=True,
+                    has_unpublished_changes=False,
+                    first_published_at=self.now,
+                    last_published_at=self.now,
+                    latest_revision_created_at=self.now,
+                    date=self.random_date(),
+                    intro=self.make_sentence(8, 20),
+                    body=body,
+                )
+            )
+
+        # Serialise the revision content while the posts have no primary key, so
+        # that modelcluster doesn't query for each post's (empty) child relations
+        contents = [post.serializable_data() for post in posts]
+
+        # Django can't bulk create multi-table inherited models, so insert the
+        # wagtailcore_page rows first and then the blog_blogpage rows for them
+        base_fields = [field.attname for field in Page._meta.concrete_fields]
+        Page.objects.bulk_create(
+            [
+                Page(**{name: getattr(post, name) for name in base_fields})
+                for post in posts
+            ]
+        )
+        ids = dict(
+            Page.objects.filter(path__in=[post.path for post in posts]).values_list(
+                "path", "pk"
+            )
+        )
+        for post, content in zip(posts, contents):
+            post.id = post.page_ptr_id = content["pk"] = ids[post.path]
+
+        local_fields = [
+            field
+            for field in BlogPage._meta.local_concrete_fields
+            if field.attname != "page_ptr_id"
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO %s (%s) VALUES (%s)"
+                % (
+                    connection.ops.quote_name(BlogPage._meta.db_table),
+                    ", ".join(
+                        connection.ops.quote_name(column)
+                        for column in ["page_ptr_id"]
+                        + [field.column for field in local_fields]
+                    ),
+                    ", ".join(["%s"] * (len(local_fields) + 1)),
+                ),
+                [
+                    [post.pk]
+                    + [
+                        field.get_db_prep_save(getattr(post, field.attname), connection)
+                        for field in local_fields
+                    ]
+                    for post in posts
+                ],
+            )
+
+        revisions = Revision.objects.bulk_create(
+            [
+                Revision(
+                    content_type=content_type,
+                    base_content_type=base_content_type,
+                    object_id=str(post.pk),
+                    created_at=self.now,
+                    content=content,
+                    object_str=post.title,
+                )
+                for post, content in zip(posts, contents)
+            ]
+        )
+        if revisions and revisions[0].pk is None:
+            revision_ids = dict(
+                Revision.objects.filter(
+                    base_content_type=base_content_type,
+                    object_id__in=[str(post.pk) for post in posts],
+                ).values_list("object_id", "pk")
+            )
+        else:
+            revision_ids = {revision.object_id: revision.pk for revision in revisions}
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                "UPDATE %s SET %s = %%s, %s = %%s WHERE %s = %%s"
+                % tuple(
+                    connection.ops.quote_name(name)
+                    for name in [
+                        Page._meta.db_table,
+                        "latest_revision_id",
+                        "live_revision_id",
+                        "id",
+                    ]
+                ),
+                [
+                    [revision_ids[str(post.pk)], revision_ids[str(post.pk)], post.pk]
+                    for post in posts
+                ],
+            )
+
+        Page.objects.filter(pk=index.pk).update(numchild=F("numchild") + len(posts))
+
+    def create_images(self, count):
+        if not count:
+            return []
+
+        Image = get_image_model()
+        storage = Image._meta.get_field("file").storage
+        images = []
+        for i in range(count):
+            width, height = self.random.choice([(1600, 1200), (1200, 1600), (1920, 1080)])
+            color = tuple(self.random.randrange(256) for channel in range(3))
+            data = io.BytesIO()
+            PILImage.new("RGB", (width, height), color).save(data, "PNG")
+            images.append(
+                Image(
+                    title="Seed image %d" % i,
+                    file=storage.save(
+                        "original_images/seed-%d.png" % i, ContentFile(data.getvalue())
+                    ),
+                    width=width,
+                    height=height,
+                    file_size=data.tell(),
+                    default_alt_text="A block of solid colour",
+                )
+            )
+
+        Image.objects.bulk_create(images, batch_size=self.batch_size)
+        self.stdout.write("Created %d images" % count)
+        return list(
+            Image.objects.filter(file__in=[image.file.name for image in images])
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+
+    def make_body(self, images):
+        # A random but valid BaseStreamBlock body: headings never skip a level
+        body = []
+        level = 1
+        block_types = ["heading", "paragraph", "paragraph"] + (["image"] if images else [])
+        for i in range(self.random.randint(3, 12)):
+            block_type = self.random.choice(block_types)
+            if block_type == "heading":
+                level = self.random.randint(2, min(level + 1, 4))
+                value = {"size": "h%d" % level, "text": self.make_sentence(2, 6)}
+            elif block_type == "paragraph":
+                value = "".join(
+                    '<p data-block-key="%s">%s</p>'
+                    % (self.make_uuid()[:5], self.make_sentence(20, 80))
+                    for paragraph in range(self.random.randint(1, 3))
+                )
+            else:
+                value = {
+                    "image": self.random.choice(images),
+                    "alt_text": self.make_sentence(4, 10),
+                    "decorative": False,
+                }
+            body.append({"type": block_type, "value": value, "id": self.make_uuid()})
+        return body
+
+    def make_sentence(self, min_words, max_words):
+        words = self.random.choices(WORDS, k=self.random.randint(min_words, max_words))
+        return " ".join(words).capitalize() + "."
+
+    def make_uuid(self):
+        return str(uuid.UUID(int=self.random.getrandbits(128), version=4))
+
+    def random_date(self):
+        return self.now.date() - datetime.timedelta(days=self.random.randrange(3650))
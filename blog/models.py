@@ -1,16 +1,32 @@
+import itertools
+
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 from django.db import models
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils import timezone, translation
+from django.utils.html import strip_tags
 
+from wagtail.contrib.routable_page.models import RoutablePageMixin, path
+from wagtail.images import get_image_model
+from wagtail.images.models import Filter, Picture
 from wagtail.models import Page, Orderable
 from wagtail.fields import RichTextField, StreamField
+from wagtail.rich_text import RichText
 from wagtail.admin.panels import FieldPanel, HelpPanel, InlinePanel
 from wagtail.search import index
 
 from modelcluster.fields import ParentalKey
 
-from blog.blocks import BaseStreamBlock
+from blog.blocks import BaseStreamBlock, ImageBlock
+from blog.cache import render_bodies
+from blog.feeds import FEED_CLASSES
+from custom_media.renditions import prefetch_renditions
+from pagecache.dependencies import add_children_dependency, add_model_dependency
+from search.indexing import iter_block_text
 
 
-class BlogIndexPage(Page):
+class BlogIndexPage(RoutablePageMixin, Page):
     intro = RichTextField(blank=True)
 
     content_panels = Page.content_panels + [
@@ -19,6 +35,109 @@ class BlogIndexPage(Page):
 
     subpage_types = ['blog.BlogPage']
 
+    # Number of posts listed per page of the index, and how many leading
+    # paragraph blocks of each post to show as an excerpt (0 disables excerpts).
+    posts_per_page = 10
+    excerpt_paragraphs = 0
+
+    def get_posts(self):
+        # A single query for the concrete BlogPage rows, so listing posts doesn't
+        # cost an extra query per post. The body is only loaded when excerpts
+        # are enabled, as it's by far the largest column.
+        add_children_dependency(self)
+        posts = BlogPage.objects.child_of(self).live().order_by("-date", "-pk")
+        if not self.excerpt_paragraphs:
+            posts = posts.defer("body")
+        return posts
+
+    def get_context(self, request, *args, **kwargs):
+        context = super().get_context(request, *args, **kwargs)
+
+        paginator = Paginator(self.get_posts(), self.posts_per_page)
+        posts = paginator.get_page(request.GET.get("page"))
+
+        if self.excerpt_paragraphs:
+            for post in posts:
+                post.excerpt = post.get_excerpt(self.excerpt_paragraphs)
+
+        context["posts"] = posts
+        return context
+
+    # Posts are read from the database, and their bodies from the body cache,
+    # this many at a time while a feed is streamed
+    feed_chunk_size = 100
+
+    def get_feed_posts(self):
+        # Every post, but without the bodies, which come from render_bodies()
+        return (
+            BlogPage.objects.child_of(self)
+            .live()
+            .public()
+            .order_by("-date", "-pk")
+            .only(
+                "title",
+                "url_path",
+                "locale",
+                "latest_revision_id",
+                "first_published_at",
+                "last_published_at",
+                "date",
+                "intro",
+            )
+        )
+
+    def iter_feed_items(self, request, language_code):
+        # Runs while the response is streamed, after the view has returned
+        with translation.override(language_code):
+            posts = self.get_feed_posts().iterator(chunk_size=self.feed_chunk_size)
+            while chunk := list(itertools.islice(posts, self.feed_chunk_size)):
+                bodies = render_bodies(chunk)
+                for post in chunk:
+                    url = post.get_full_url(request)
+                    yield {
+                        "title": post.title,
+                        "link": url,
+                        "unique_id": url,
+                        "unique_id_is_permalink": True,
+                        "description": post.intro,
+                        "content": bodies[post.pk],
+                        "pubdate": post.first_published_at,
+                        "updateddate": post.last_published_at,
+                    }
+
+    @path("feed/<str:feed_format>/", name="feed")
+    def feed(self, request, feed_format):
+        """
+        The posts as an RSS, Atom or JSON feed, streamed. Revalidation requests
+        are answered before this is called (see pagecache.wagtail_hooks).
+        """
+        feed_class = FEED_CLASSES.get(feed_format)
+        if feed_class is None:
+            raise Http404
+        # The posts, and the images in their bodies, are read after this
+        # returns, while the response is streamed
+        add_children_dependency(self)
+        add_model_dependency(get_image_model())
+        updated = (
+            self.get_feed_posts()
+            .order_by("-last_published_at")
+            .values_list("last_published_at", flat=True)
+            .first()
+        )
+        language_code = translation.get_language()
+        feed = feed_class(
+            title=self.title,
+            link=self.get_full_url(request),
+            description=self.search_description or strip_tags(self.intro),
+            language=language_code,
+            feed_url=request.build_absolute_uri(),
+            updated=updated or self.last_published_at or timezone.now(),
+        )
+        return StreamingHttpResponse(
+            feed.stream(self.iter_feed_items(request, language_code)),
+            content_type=feed.content_type,
+        )
+
 
 class BlogPage(Page):
     date = models.DateField("Post date")
@@ -27,9 +146,13 @@ class BlogPage(Page):
 
     search_fields = Page.search_fields + [
         index.SearchField('intro'),
-        index.SearchField('body'),
+        index.SearchField('body_text'),
     ]
 
+    # Publishing or unpublishing a post queues it for indexing (see
+    # search.signals) rather than indexing it during the request
+    search_auto_update = False
+
     content_panels = Page.content_panels + [
         FieldPanel('date'),
         FieldPanel('intro'),
@@ -38,8 +161,31 @@ class BlogPage(Page):
 
     parent_page_types = ['blog.BlogIndexPage']
 
+    def prefetch_renditions(self):
+        # Load the renditions for all the image blocks in the body at once,
+        # rather than one query per {% image %} tag
+        prefetch_renditions(
+            (child.value["image"], ImageBlock.filter_spec)
+            for child in self.body
+            if child.block_type == "image"
+        )
+
+    def body_text(self):
+        return "\n".join(iter_block_text(self.body.stream_block, self.body.raw_data))
 
-class ImageGalleryPage(Page):
+    def get_excerpt(self, paragraphs):
+        # Read the stored rich text of the first paragraph blocks directly,
+        # rather than building (and rendering) every block of the body.
+        sources = []
+        for block in self.body.raw_data:
+            if block["type"] == "paragraph":
+                sources.append(block["value"])
+                if len(sources) == paragraphs:
+                    break
+        return RichText("".join(sources))
+
+
+class ImageGalleryPage(RoutablePageMixin, Page):
     intro = RichTextField(blank=True)
 
     content_panels = Page.content_panels + [
@@ -58,6 +204,64 @@ class ImageGalleryPage(Page):
         InlinePanel("gallery_images", label="Images"),
     ]
 
+    images_per_page = 24
+
+    # The renditions blog/includes/gallery_image.html displays for each image
+    # (see blog_tags.gallery_picture)
+    gallery_picture_spec = "format-{avif,webp,jpeg} width-{400,800,1200}"
+    gallery_filter_specs = Filter.expand_spec(gallery_picture_spec)
+
+    def get_gallery_paginator(self):
+        return Paginator(
+            self.gallery_images.select_related("image"), self.images_per_page
+        )
+
+    def prefetch_gallery_renditions(self, gallery_images):
+        prefetch_renditions(
+            (gallery_image.image, filter_spec)
+            for gallery_image in gallery_images
+            for filter_spec in self.gallery_filter_specs
+        )
+        return gallery_images
+
+    def get_gallery_images(self, page_number=None):
+        return self.prefetch_gallery_renditions(
+            self.get_gallery_paginator().get_page(page_number)
+        )
+
+    def get_context(self, request, *args, **kwargs):
+        context = super().get_context(request, *args, **kwargs)
+        context["gallery_images"] = self.get_gallery_images(request.GET.get("page"))
+        return context
+
+    @path("images/", name="images")
+    def images_json(self, request):
+        # The thumbnails for a page of the gallery, for the "More images" button
+        # to add without reloading the page
+        try:
+            gallery_images = self.get_gallery_paginator().page(
+                request.GET.get("page", 1)
+            )
+        except PageNotAnInteger:
+            raise Http404
+        except EmptyPage:
+            # Past the last page, so clients stop asking for more
+            return JsonResponse({"images": [], "next_page": None})
+        self.prefetch_gallery_renditions(gallery_images)
+        return JsonResponse(
+            {
+                "images": [
+                    gallery_image.as_json(self.gallery_filter_specs)
+                    for gallery_image in gallery_images
+                ],
+                "next_page": (
+                    gallery_images.next_page_number()
+                    if gallery_images.has_next()
+                    else None
+                ),
+            }
+        )
+
 
 class ImageGalleryImageImage(Orderable):
     page = ParentalKey(
@@ -72,3 +276,25 @@ class ImageGalleryImageImage(Orderable):
         FieldPanel("image"),
         FieldPanel("alt_text"),
     ]
+
+    @property
+    def alt(self):
+        return self.alt_text or self.image.default_alt_text
+
+    def as_json(self, filter_specs, html=True):
+        picture = Picture(self.image.get_renditions(*filter_specs))
+        fallback = picture.formats[picture.get_fallback_format()]
+        data = {
+            "alt": self.alt,
+            "width": fallback[0].width,
+            "height": fallback[0].height,
+            "sources": {
+                format: picture.get_width_srcset(renditions)
+                for format, renditions in picture.formats.items()
+            },
+        }
+        if html:
+            data["html"] = render_to_string(
+                "blog/includes/gallery_image.html", {"gallery_image": self}
+            )
+        return data
@@ -0,0 +1,29 @@
+from django.dispatch import receiver
+
+from wagtail.signals import page_published, page_unpublished
+
+from blog.cache import invalidate_body
+from blog.models import BlogPage, ImageGalleryPage
+from custom_media.renditions import schedule_warmup
+
+
+@receiver(page_published, sender=BlogPage)
+def invalidate_published_body(sender, instance, revision, **kwargs):
+    # The live body may have been rendered under the latest (draft) revision id
+    # before that revision was published, so drop both.
+    invalidate_body(instance, {revision.pk, instance.latest_revision_id})
+
+
+@receiver(page_unpublished, sender=BlogPage)
+def invalidate_unpublished_body(sender, instance, **kwargs):
+    invalidate_body(instance, {instance.latest_revision_id})
+
+
+@receiver(page_published, sender=ImageGalleryPage)
+def warm_gallery_renditions(sender, instance, **kwargs):
+    # Only gallery images are shown with the gallery's renditions, so they
+    # aren't registered for every image (see custom_media.signals)
+    schedule_warmup(
+        [gallery_image.image_id for gallery_image in instance.gallery_images.all()],
+        ImageGalleryPage.gallery_filter_specs,
+    )
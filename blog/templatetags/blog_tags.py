@@ -0,0 +1,32 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from wagtail.images.models import Picture
+from wagtail.images.shortcuts import get_renditions_or_not_found
+
+from blog.cache import render_body
+from blog.models import ImageGalleryPage
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def cached_body(context, page):
+    request = context.get("request")
+    # Previews render unsaved content, which mustn't be served from (or stored
+    # in) the cache for the page's latest revision.
+    if page.pk is None or getattr(request, "is_preview", False):
+        page.prefetch_renditions()
+        return page.body.render_as_block()
+    return render_body(page)
+
+
+@register.simple_tag
+def gallery_picture(gallery_image, **attrs):
+    # {% picture %} only takes literal filter specs, so the gallery's are
+    # passed here rather than repeated in the template
+    renditions = get_renditions_or_not_found(
+        gallery_image.image, ImageGalleryPage.gallery_filter_specs
+    )
+    picture = Picture(renditions, {**attrs, "alt": gallery_image.alt})
+    return mark_safe(picture.__html__())
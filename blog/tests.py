@@ -1,3 +1,499 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import shutil
+import tempfile
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import translation
+
+from wagtail.blocks import StreamBlockValidationError
+from wagtail.images.tests.utils import get_test_image_file
+from wagtail.models import Locale, Page, Revision, Site
+
+from blog.blocks import BaseStreamBlock
+from blog.cache import body_cache_stats, get_body_cache
+from blog.models import (
+    BlogIndexPage,
+    BlogPage,
+    ImageGalleryImageImage,
+    ImageGalleryPage,
+)
+from custom_media.models import CustomImage
+from home.models import HomePage
+from myblog.testing import RenderBudgetTestCase
+from navigation.models import MainNavigation
+
+
+class BlogIndexPageTests(TestCase):
+    def setUp(self):
+        self.index = BlogIndexPage(title="Blog", slug="blog", intro="<p>Welcome</p>")
+        Site.objects.get(is_default_site=True).root_page.add_child(instance=self.index)
+        with translation.override("en"):
+            self.index_url = self.index.url
+
+    def add_posts(self, count):
+        for i in range(count):
+            self.index.add_child(
+                instance=BlogPage(
+                    title="Post %d" % i,
+                    date=datetime.date(2024, 1, 1) + datetime.timedelta(days=i),
+                    intro="Intro %d" % i,
+                    body=[
+                        ("heading", {"size": "h2", "text": "Heading"}),
+                        ("paragraph", "<p>First paragraph</p>"),
+                        ("paragraph", "<p>Second paragraph</p>"),
+                    ],
+                )
+            )
+
+    def get_index(self, **params):
+        # Measure with cold caches, so runs are comparable
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.index_url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_lists_newest_posts_first(self):
+        self.add_posts(3)
+        response, _ = self.get_index()
+        self.assertEqual(
+            [post.title for post in response.context["posts"]],
+            ["Post 2", "Post 1", "Post 0"],
+        )
+        self.assertContains(response, "Intro 0")
+        self.assertNotContains(response, "First paragraph")
+
+    def test_paginates_posts(self):
+        self.add_posts(BlogIndexPage.posts_per_page + 2)
+        response, _ = self.get_index(page=2)
+        self.assertEqual(len(response.context["posts"]), 2)
+        self.assertContains(response, "Newer posts")
+
+    def test_excerpt(self):
+        self.add_posts(1)
+        BlogIndexPage.excerpt_paragraphs = 1
+        self.addCleanup(setattr, BlogIndexPage, "excerpt_paragraphs", 0)
+        response, _ = self.get_index()
+        self.assertContains(response, "First paragraph")
+        self.assertNotContains(response, "Second paragraph")
+
+    def test_query_count_does_not_grow_with_posts(self):
+        self.add_posts(2)
+        _, few_posts_queries = self.get_index()
+        self.add_posts(BlogIndexPage.posts_per_page * 3)
+        _, many_posts_queries = self.get_index()
+        self.assertEqual(few_posts_queries, many_posts_queries)
+
+
+class BlogPageBodyCacheTests(TestCase):
+    def setUp(self):
+        index = BlogIndexPage(title="Blog", slug="blog")
+        Site.objects.get(is_default_site=True).root_page.add_child(instance=index)
+        self.post = BlogPage(
+            title="Post",
+            date=datetime.date(2024, 1, 1),
+            intro="Intro",
+            body=[("paragraph", "<p>Original body</p>")],
+        )
+        index.add_child(instance=self.post)
+        self.post.save_revision().publish()
+        with translation.override("en"):
+            self.post_url = self.post.url
+
+        get_body_cache().clear()
+        body_cache_stats.reset()
+
+    def test_body_is_rendered_once_per_revision(self):
+        self.assertContains(self.client.get(self.post_url), "Original body")
+        self.assertContains(self.client.get(self.post_url), "Original body")
+        self.assertEqual(body_cache_stats.as_dict(), {"hits": 1, "misses": 1})
+
+    def test_publishing_invalidates_body(self):
+        self.client.get(self.post_url)
+
+        self.post.body = [("paragraph", "<p>Updated body</p>")]
+        self.post.save_revision().publish()
+
+        response = self.client.get(self.post_url)
+        self.assertContains(response, "Updated body")
+        self.assertNotContains(response, "Original body")
+        self.assertEqual(body_cache_stats.misses, 2)
+
+    def test_publishing_draft_revision_invalidates_body(self):
+        self.post.body = [("paragraph", "<p>Draft body</p>")]
+        revision = self.post.save_revision()
+        # The live page is rendered while the draft is the latest revision
+        self.assertContains(self.client.get(self.post_url), "Original body")
+
+        revision.publish()
+        self.assertContains(self.client.get(self.post_url), "Draft body")
+
+
+class BlogFeedTests(TestCase):
+    def setUp(self):
+        self.index = BlogIndexPage(title="Blog", slug="blog", intro="<p>Welcome</p>")
+        Site.objects.get(is_default_site=True).root_page.add_child(instance=self.index)
+        with translation.override("en"):
+            self.feed_url = self.index.url + "feed/%s/"
+        get_body_cache().clear()
+        body_cache_stats.reset()
+
+    def add_posts(self, count):
+        for i in range(count):
+            post = BlogPage(
+                title="Post %d" % i,
+                date=datetime.date(2024, 1, 1) + datetime.timedelta(days=i),
+                intro="Intro %d" % i,
+                body=[("paragraph", "<p>Body %d</p>" % i)],
+            )
+            self.index.add_child(instance=post)
+            post.save_revision().publish()
+
+    def get_feed(self, feed_format, **headers):
+        response = self.client.get(self.feed_url % feed_format, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content)
+
+    def test_rss(self):
+        self.add_posts(2)
+        response, content = self.get_feed("rss")
+        self.assertEqual(response["Content-Type"], "application/rss+xml; charset=utf-8")
+        items = ElementTree.fromstring(content).findall("channel/item")
+        self.assertEqual([item.findtext("title") for item in items], ["Post 1", "Post 0"])
+        self.assertEqual(items[0].findtext("link"), "http://localhost/en/blog/post-1/")
+        self.assertEqual(
+            items[0].findtext("{http://purl.org/rss/1.0/modules/content/}encoded"),
+            '<div class="block-paragraph"><p>Body 1</p></div>',
+        )
+
+    def test_atom(self):
+        self.add_posts(2)
+        _, content = self.get_feed("atom")
+        atom = "{http://www.w3.org/2005/Atom}"
+        entries = ElementTree.fromstring(content).findall(atom + "entry")
+        self.assertEqual(
+            [entry.findtext(atom + "title") for entry in entries], ["Post 1", "Post 0"]
+        )
+        self.assertIn("<p>Body 0</p>", entries[1].findtext(atom + "content"))
+
+    def test_json_feed(self):
+        self.add_posts(2)
+        _, content = self.get_feed("json")
+        feed = json.loads(content)
+        self.assertEqual(feed["title"], "Blog")
+        self.assertEqual([item["title"] for item in feed["items"]], ["Post 1", "Post 0"])
+        self.assertIn("<p>Body 1</p>", feed["items"][0]["content_html"])
+
+        self.index.get_children().delete()
+        self.index.save_revision().publish()
+        _, content = self.get_feed("json")
+        self.assertEqual(json.loads(content)["items"], [])
+
+    def test_index_links_to_feeds(self):
+        with translation.override("en"):
+            response = self.client.get(self.index.url)
+        for feed_format in ["rss", "atom", "json"]:
+            self.assertContains(response, 'href="%s"' % (self.feed_url % feed_format))
+
+    def test_unknown_format(self):
+        response = self.client.get(self.feed_url % "xml")
+        self.assertEqual(response.status_code, 404)
+
+    def test_bodies_are_cached_and_queries_do_not_grow_with_posts(self):
+        BlogIndexPage.feed_chunk_size = 2
+        self.addCleanup(setattr, BlogIndexPage, "feed_chunk_size", 100)
+        self.add_posts(2)
+        self.get_feed("rss")
+        self.assertEqual(body_cache_stats.as_dict(), {"hits": 0, "misses": 2})
+        with CaptureQueriesContext(connection) as few_posts_queries:
+            self.get_feed("rss")
+        self.assertEqual(body_cache_stats.as_dict(), {"hits": 2, "misses": 2})
+
+        # The last chunk comes back empty
+        self.add_posts(1)
+        self.get_feed("rss")
+        with CaptureQueriesContext(connection) as many_posts_queries:
+            self.get_feed("rss")
+        self.assertEqual(len(few_posts_queries), len(many_posts_queries))
+
+    def test_revalidation(self):
+        self.add_posts(1)
+        response, _ = self.get_feed("atom")
+        # Answered from the validators, without reading the posts
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                self.feed_url % "atom", HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(
+            any("blog_blogpage" in query["sql"] for query in queries.captured_queries)
+        )
+
+
+class ImageGalleryPageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        cache.clear()
+
+        ImageGalleryPage.images_per_page = 2
+        self.addCleanup(setattr, ImageGalleryPage, "images_per_page", 24)
+
+        self.gallery = ImageGalleryPage(title="Gallery", slug="gallery")
+        for i in range(3):
+            self.gallery.gallery_images.create(
+                image=CustomImage.objects.create(
+                    title="Image %d" % i,
+                    file=get_test_image_file(),
+                    default_alt_text="Default alt %d" % i,
+                ),
+                alt_text="Alt %d" % i if i else "",
+            )
+        Site.objects.get(is_default_site=True).root_page.add_child(
+            instance=self.gallery
+        )
+        with translation.override("en"):
+            self.gallery_url = self.gallery.url
+
+    def test_lazy_responsive_images(self):
+        response = self.client.get(self.gallery_url)
+        self.assertContains(response, "<picture>", count=2)
+        self.assertContains(response, 'type="image/avif"', count=2)
+        self.assertContains(response, 'type="image/webp"', count=2)
+        self.assertContains(response, 'loading="lazy"', count=2)
+        self.assertContains(response, 'alt="Default alt 0"')
+        self.assertContains(response, 'alt="Alt 1"')
+        self.assertContains(response, 'data-next-page="2"')
+
+    def test_paginates_images(self):
+        response = self.client.get(self.gallery_url, {"page": 2})
+        self.assertContains(response, "<picture>", count=1)
+        self.assertContains(response, 'alt="Alt 2"')
+        self.assertNotContains(response, "More images")
+
+    def test_images_json(self):
+        response = self.client.get(self.gallery_url + "images/", {"page": 1})
+        data = response.json()
+        self.assertEqual(data["next_page"], 2)
+        self.assertEqual(
+            [image["alt"] for image in data["images"]], ["Default alt 0", "Alt 1"]
+        )
+        self.assertEqual(set(data["images"][0]["sources"]), {"avif", "webp", "jpeg"})
+        self.assertIn("<picture>", data["images"][0]["html"])
+
+        response = self.client.get(self.gallery_url + "images/", {"page": 2})
+        self.assertIsNone(response.json()["next_page"])
+
+    def test_images_json_past_the_last_page(self):
+        response = self.client.get(self.gallery_url + "images/", {"page": 3})
+        self.assertEqual(response.json(), {"images": [], "next_page": None})
+
+        response = self.client.get(self.gallery_url + "images/", {"page": "x"})
+        self.assertEqual(response.status_code, 404)
+
+
+class BaseStreamBlockTests(SimpleTestCase):
+    def clean(self, body):
+        block = BaseStreamBlock()
+        return block.clean(block.to_python(body))
+
+    def test_valid_heading_hierarchy(self):
+        self.clean(
+            [
+                {"type": "heading", "value": {"size": "h2", "text": "Heading"}},
+                {"type": "paragraph", "value": "<h3>Sub</h3><p>Text</p><h4>Sub sub</h4>"},
+                {"type": "heading", "value": {"size": "h2", "text": "Heading"}},
+            ]
+        )
+
+    def test_skipped_heading_levels(self):
+        with self.assertRaises(StreamBlockValidationError) as cm:
+            self.clean(
+                [
+                    {"type": "heading", "value": {"size": "h3", "text": "Too deep"}},
+                    {"type": "paragraph", "value": "<p>Text</p>"},
+                    {"type": "heading", "value": {"size": "h2", "text": "Heading"}},
+                    {"type": "paragraph", "value": "<p>Text</p><h4>Too deep</h4>"},
+                ]
+            )
+        self.assertEqual(sorted(cm.exception.block_errors), [0, 3])
+
+
+class SeedDataTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+    def seed(self, **options):
+        call_command("seed_data", stdout=io.StringIO(), **options)
+
+    def test_bulk_posts_in_several_locales(self):
+        self.seed(posts=30, locales="en,fr", images=3, seed=42, batch_size=7)
+
+        self.assertEqual(BlogIndexPage.objects.count(), 2)
+        self.assertEqual(BlogPage.objects.count(), 60)
+        self.assertEqual(BlogPage.objects.filter(locale__language_code="fr").count(), 30)
+        # Every translation of a post shares its translation key
+        self.assertEqual(
+            BlogPage.objects.values("translation_key").distinct().count(), 30
+        )
+        # The precomputed paths leave a consistent tree
+        self.assertEqual(Page.find_problems(), ([], [], [], [], []))
+
+        for post in BlogPage.objects.all():
+            self.assertEqual(post.live_revision_id, post.latest_revision_id)
+            self.assertEqual(post.live_revision.as_object().title, post.title)
+            post.body.stream_block.clean(post.body)
+
+    def test_seed_is_reproducible(self):
+        self.seed(posts=5, seed=1)
+        first = list(BlogPage.objects.order_by("path").values_list("title", "intro"))
+        Revision.objects.all().delete()
+        BlogIndexPage.objects.get().delete()
+
+        self.seed(posts=5, seed=1)
+        self.assertEqual(
+            list(BlogPage.objects.order_by("path").values_list("title", "intro")),
+            first,
+        )
+
+    def test_adds_to_existing_index(self):
+        self.seed(posts=3)
+        self.seed(posts=2)
+        index = BlogIndexPage.objects.get()
+        self.assertEqual(index.get_children().count(), 5)
+        self.assertEqual(index.numchild, 5)
+
+    def test_adds_after_deleted_posts(self):
+        self.seed(posts=3)
+        index = BlogIndexPage.objects.get()
+        BlogPage.objects.get(slug="post-2").delete()
+        index.refresh_from_db()
+        index.add_child(
+            instance=BlogPage(
+                title="Post", slug="post-5", date=datetime.date.today(), intro="Intro"
+            )
+        )
+
+        self.seed(posts=2)
+        self.assertEqual(
+            sorted(index.get_children().values_list("slug", flat=True)),
+            ["post-1", "post-3", "post-5", "post-5-2", "post-6"],
+        )
+        self.assertEqual(Page.find_problems(), ([], [], [], [], []))
+
+
+class RenderBudgetTests(RenderBudgetTestCase):
+    sizes = [BlogIndexPage.posts_per_page, BlogIndexPage.posts_per_page * 5]
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+        self.add_posts(1, images=2)
+        self.index = BlogIndexPage.objects.get(locale__language_code="en")
+        self.post = BlogPage.objects.get(locale__language_code="en")
+        MainNavigation.objects.create(
+            name="Blog", menu_page=self.index, locale=Locale.get_default()
+        )
+
+    def add_posts(self, count, images=0):
+        # Up to count posts in each locale
+        posts = BlogPage.objects.filter(locale__language_code="en").count()
+        if count > posts:
+            call_command(
+                "seed_data",
+                posts=count - posts,
+                images=images,
+                locales="en,fr",
+                seed=count,
+                stdout=io.StringIO(),
+            )
+
+    def get_url(self, page):
+        with translation.override("en"):
+            return page.url
+
+    def test_home_page(self):
+        home = Site.objects.get(is_default_site=True).root_page.add_child(
+            instance=HomePage(
+                title="Home",
+                slug="new-home",
+                summary="<p>Summary</p>",
+                main_image=CustomImage.objects.first(),
+            )
+        )
+        self.assertRenderBudget(
+            self.get_url(home),
+            grow=self.add_posts,
+            sizes=self.sizes,
+            queries=11,
+            memory_kb=200,
+        )
+
+    def test_blog_index_page(self):
+        self.assertRenderBudget(
+            self.get_url(self.index),
+            grow=self.add_posts,
+            sizes=self.sizes,
+            queries=11,
+            memory_kb=300,
+        )
+
+    def test_blog_index_page_later_page(self):
+        self.assertRenderBudget(
+            self.get_url(self.index),
+            grow=self.add_posts,
+            sizes=[size * 2 for size in self.sizes],
+            queries=11,
+            memory_kb=300,
+            data={"page": 2},
+        )
+
+    def test_blog_page(self):
+        self.assertRenderBudget(
+            self.get_url(self.post),
+            grow=self.add_posts,
+            sizes=self.sizes,
+            queries=13,
+            memory_kb=300,
+        )
+
+    def test_image_gallery_page(self):
+        gallery = ImageGalleryPage(title="Gallery", slug="gallery")
+        Site.objects.get(is_default_site=True).root_page.add_child(instance=gallery)
+
+        def add_images(count):
+            for i in range(gallery.gallery_images.count(), count):
+                ImageGalleryImageImage.objects.create(
+                    page=gallery,
+                    image=CustomImage.objects.create(
+                        title="Image %d" % i, file=get_test_image_file()
+                    ),
+                    alt_text="Alt %d" % i,
+                )
+
+        self.assertRenderBudget(
+            self.get_url(gallery),
+            grow=add_images,
+            sizes=[ImageGalleryPage.images_per_page, ImageGalleryPage.images_per_page * 3],
+            queries=12,
+            memory_kb=1200,
+        )
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CustomMediaConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "custom_media"
+
+    def ready(self):
+        from custom_media import signals  # noqa: F401
@@ -0,0 +1,103 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from wagtail.images import get_image_model
+
+from custom_media.renditions import get_filter_specs, warm_renditions
+
+
+class Command(BaseCommand):
+    help = "Generate the renditions used by the site's templates for existing images"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--filter-spec",
+            action="append",
+            dest="filter_specs",
+            help="Filter spec to generate, can be repeated "
+            "(default: the filter specs registered by the project)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.RENDITION_WARMUP_WORKERS,
+            help="Number of images processed at once",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of images loaded at once (default: 100)",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="File recording the last image processed. If it exists, "
+            "images up to and including that one are skipped",
+        )
+
+    def handle(self, *args, **options):
+        filter_specs = options["filter_specs"] or get_filter_specs()
+        checkpoint = options["checkpoint"]
+
+        last_id = self.read_checkpoint(checkpoint)
+        if last_id:
+            self.stdout.write("Resuming after image %d" % last_id)
+
+        images = get_image_model().objects.order_by("pk")
+        done = failed = 0
+        while True:
+            batch = list(images.filter(pk__gt=last_id)[: options["batch_size"]])
+            if not batch:
+                break
+
+            if options["workers"] > 1:
+                with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+                    results = list(
+                        executor.map(
+                            lambda image: self.warm_in_thread(image, filter_specs),
+                            batch,
+                        )
+                    )
+            else:
+                results = [self.warm(image, filter_specs) for image in batch]
+
+            done += results.count(True)
+            failed += results.count(False)
+            last_id = batch[-1].pk
+            self.write_checkpoint(checkpoint, last_id)
+            self.stdout.write("Processed images up to %d" % last_id)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Generated renditions for %d images (%d failed)" % (done, failed)
+            )
+        )
+
+    def warm(self, image, filter_specs):
+        try:
+            warm_renditions(image, filter_specs)
+        except Exception as e:
+            self.stderr.write("Image %d: %s" % (image.pk, e))
+            return False
+        return True
+
+    def warm_in_thread(self, image, filter_specs):
+        try:
+            return self.warm(image, filter_specs)
+        finally:
+            close_old_connections()
+
+    def read_checkpoint(self, checkpoint):
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                return int(f.read().strip() or 0)
+        return 0
+
+    def write_checkpoint(self, checkpoint, last_id):
+        if checkpoint:
+            with open(checkpoint, "w") as f:
+                f.write(str(last_id))
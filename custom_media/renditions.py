@@ -0,0 +1,226 @@
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.db import close_old_connections, models, transaction
+
+from modelcluster.models import get_all_child_relations
+from wagtail.blocks import ListBlock, StreamBlock, StructBlock
+from wagtail.fields import StreamField
+from wagtail.images import get_image_model
+from wagtail.images.blocks import ImageChooserBlock
+from wagtail.images.models import Filter
+
+logger = logging.getLogger(__name__)
+
+# Filter specs of the renditions the project's templates ask for, so they can
+# be generated before the first visitor needs them
+_filter_specs = []
+
+
+def register_filter_spec(*filter_specs):
+    for filter_spec in filter_specs:
+        if filter_spec not in _filter_specs:
+            _filter_specs.append(filter_spec)
+
+
+def get_filter_specs():
+    return list(_filter_specs)
+
+
+def warm_renditions(image, filter_specs=None):
+    """
+    Generates any of the registered renditions of an image that don't exist yet.
+    """
+    filter_specs = filter_specs or get_filter_specs()
+    if filter_specs:
+        image.get_renditions(*filter_specs)
+
+
+class RenditionWarmer:
+    """
+    Generates renditions on a bounded pool of background threads.
+
+    At most RENDITION_WARMUP_MAX_PENDING batches of images wait for a thread;
+    further ones are dropped, and their renditions are generated on demand (or
+    by the warm_renditions command) instead. With no workers configured,
+    renditions are generated in the calling thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = None
+
+    def get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.RENDITION_WARMUP_WORKERS,
+                    thread_name_prefix="rendition-warmup",
+                )
+                self._pending = threading.BoundedSemaphore(
+                    settings.RENDITION_WARMUP_MAX_PENDING
+                )
+            return self._executor
+
+    def submit(self, image_ids, filter_specs=None):
+        image_ids = list(image_ids)
+        if not image_ids:
+            return
+
+        if not settings.RENDITION_WARMUP_WORKERS:
+            self.warm(image_ids, filter_specs)
+            return
+
+        executor = self.get_executor()
+        if self._pending.acquire(blocking=False):
+            executor.submit(self.warm_in_thread, image_ids, filter_specs)
+        else:
+            logger.warning(
+                "Rendition warm-up queue is full, skipping %d images", len(image_ids)
+            )
+
+    def warm_in_thread(self, image_ids, filter_specs=None):
+        try:
+            self.warm(image_ids, filter_specs)
+        finally:
+            self._pending.release()
+            close_old_connections()
+
+    def warm(self, image_ids, filter_specs=None):
+        for image in get_image_model().objects.filter(pk__in=image_ids):
+            try:
+                warm_renditions(image, filter_specs)
+            except Exception:
+                logger.exception("Could not generate renditions of image %d", image.pk)
+
+
+warmer = RenditionWarmer()
+
+
+def schedule_warmup(image_ids, filter_specs=None):
+    """
+    Generates renditions of the given images (by default, the registered ones)
+    once the current transaction has been committed.
+    """
+    image_ids = set(image_ids)
+    if image_ids:
+        transaction.on_commit(lambda: warmer.submit(image_ids, filter_specs))
+
+
+def prefetch_renditions(images_and_filter_specs, create=True):
+    """
+    Loads the renditions for a set of (image, filter spec) pairs in one query,
+    and creates the missing ones in one batch.
+
+    The renditions are attached to the given image instances, so that image tags
+    rendering those instances find them without querying the database.
+
+    With create=False the missing renditions aren't created, and the (image,
+    filter spec) pairs missing are returned instead.
+    """
+    images = defaultdict(list)
+    filter_specs = defaultdict(dict)
+    for image, filter_spec in images_and_filter_specs:
+        if image is None:
+            continue
+        # The same image may be used through several instances
+        if not any(instance is image for instance in images[image.pk]):
+            images[image.pk].append(image)
+        filter_specs[image.pk].setdefault(filter_spec, Filter(spec=filter_spec))
+    if not images:
+        return []
+
+    Rendition = get_image_model().get_rendition_model()
+    renditions = defaultdict(list)
+    for rendition in Rendition.objects.filter(
+        image_id__in=images,
+        filter_spec__in={spec for specs in filter_specs.values() for spec in specs},
+    ):
+        # avoid fetching the image again when the rendition is rendered
+        rendition.image = images[rendition.image_id][0]
+        renditions[rendition.image_id].append(rendition)
+
+    to_create = []
+    not_created = []
+    for image_id, filters in filter_specs.items():
+        image = images[image_id][0]
+        existing = {
+            (rendition.filter_spec, rendition.focal_point_key)
+            for rendition in renditions[image_id]
+        }
+        missing = [
+            filter
+            for spec, filter in filters.items()
+            if (spec, filter.get_cache_key(image)) not in existing
+        ]
+        if missing and not create:
+            not_created.extend((image, filter.spec) for filter in missing)
+        elif missing:
+            with image.open_file() as f:
+                original = f.read()
+            for filter in missing:
+                rendition = image.generate_rendition_instance(filter, BytesIO(original))
+                renditions[image_id].append(rendition)
+                to_create.append(rendition)
+
+    if to_create:
+        Rendition.objects.bulk_create(to_create, ignore_conflicts=True)
+
+    for image_id, instances in images.items():
+        for image in instances:
+            image.prefetched_renditions = list(renditions[image_id])
+    return not_created
+
+
+def get_page_image_ids(page):
+    """
+    Returns the ids of the images a page uses, through foreign keys, StreamField
+    blocks and child objects (such as gallery images).
+    """
+    image_ids = set(_iter_object_image_ids(page))
+    for relation in get_all_child_relations(page):
+        for child in getattr(page, relation.get_accessor_name()).all():
+            image_ids.update(_iter_object_image_ids(child))
+    image_ids.discard(None)
+    return image_ids
+
+
+def _iter_object_image_ids(obj):
+    image_model = get_image_model()
+    for field in obj._meta.concrete_fields:
+        if isinstance(field, models.ForeignKey) and field.related_model is image_model:
+            yield getattr(obj, field.attname)
+        elif isinstance(field, StreamField):
+            yield from iter_block_image_ids(
+                field.stream_block, getattr(obj, field.name).raw_data
+            )
+
+
+def iter_block_image_ids(block, value):
+    """
+    Yields the ids of the images chosen in a block's raw (JSON-serialisable)
+    value, without loading the images.
+    """
+    if not value:
+        return
+    if isinstance(block, ImageChooserBlock):
+        yield value
+    elif isinstance(block, StreamBlock):
+        for child in value:
+            child_block = block.child_blocks.get(child["type"])
+            if child_block is not None:
+                yield from iter_block_image_ids(child_block, child["value"])
+    elif isinstance(block, StructBlock):
+        for name, child_block in block.child_blocks.items():
+            yield from iter_block_image_ids(child_block, value.get(name))
+    elif isinstance(block, ListBlock):
+        for item in value:
+            # list items are stored as {"type": "item", "value": ..., "id": ...}
+            if isinstance(item, dict) and item.get("type") == "item":
+                item = item.get("value")
+            yield from iter_block_image_ids(block.child_block, item)
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from wagtail.signals import page_published
+
+from custom_media.models import CustomImage
+from custom_media.renditions import get_page_image_ids, schedule_warmup
+
+
+@receiver(post_save, sender=CustomImage)
+def warm_uploaded_image(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        schedule_warmup([instance.pk])
+
+
+@receiver(page_published)
+def warm_published_page_images(sender, instance, **kwargs):
+    schedule_warmup(get_page_image_ids(instance))
@@ -1,3 +1,192 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from wagtail.images.tests.utils import get_test_image_file
+from wagtail.models import Site
+
+from blog.models import (
+    BlogIndexPage,
+    BlogPage,
+    ImageGalleryImageImage,
+    ImageGalleryPage,
+)
+from custom_media.models import CustomImage, CustomRendition
+from custom_media.renditions import get_filter_specs, get_page_image_ids
+from home.models import HomePage
+
+
+class MediaTestCase(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        # Renditions are cached by image id, which the database may reuse
+        CustomRendition.cache_backend.clear()
+
+    def create_image(self, title="Image"):
+        return CustomImage.objects.create(
+            title=title, file=get_test_image_file(), default_alt_text="An image"
+        )
+
+
+@override_settings(RENDITION_WARMUP_WORKERS=0)
+class RenditionWarmupTests(MediaTestCase):
+    def get_filter_specs(self, image):
+        return set(
+            CustomRendition.objects.filter(image=image).values_list(
+                "filter_spec", flat=True
+            )
+        )
+
+    def test_registered_filter_specs(self):
+        self.assertEqual(set(get_filter_specs()), {"max-800x600", "max-500x500"})
+
+    def test_renditions_generated_on_upload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = self.create_image()
+        self.assertEqual(self.get_filter_specs(image), set(get_filter_specs()))
+
+    def test_renditions_generated_on_publish(self):
+        image = self.create_image()
+        CustomRendition.objects.all().delete()
+
+        home = Site.objects.get(is_default_site=True).root_page
+        page = home.add_child(instance=HomePage(title="Home", slug="new-home"))
+        page.main_image = image
+        with self.captureOnCommitCallbacks(execute=True):
+            page.save_revision().publish()
+
+        self.assertEqual(self.get_filter_specs(image), set(get_filter_specs()))
+
+    def test_gallery_renditions_generated_on_publish(self):
+        images = [self.create_image("Image %d" % i) for i in range(2)]
+        CustomRendition.objects.all().delete()
+
+        gallery = ImageGalleryPage(title="Gallery", slug="gallery")
+        for image in images:
+            gallery.gallery_images.add(ImageGalleryImageImage(image=image))
+        Site.objects.get(is_default_site=True).root_page.add_child(instance=gallery)
+        with self.captureOnCommitCallbacks(execute=True):
+            gallery.save_revision().publish()
+
+        gallery_filter_specs = set(ImageGalleryPage.gallery_filter_specs)
+        for image in images:
+            self.assertTrue(gallery_filter_specs <= self.get_filter_specs(image))
+
+        # The first view renders from them
+        CustomRendition.cache_backend.clear()
+        before = CustomRendition.objects.count()
+        gallery.get_gallery_images()
+        self.assertEqual(CustomRendition.objects.count(), before)
+
+    def test_page_image_ids(self):
+        images = [self.create_image("Image %d" % i) for i in range(3)]
+        home = Site.objects.get(is_default_site=True).root_page
+        gallery = ImageGalleryPage(title="Gallery", slug="gallery")
+        gallery.gallery_images.create(image=images[0])
+        gallery.gallery_images.create(image=images[1])
+        home.add_child(instance=gallery)
+
+        self.assertEqual(get_page_image_ids(gallery), {images[0].pk, images[1].pk})
+
+
+class WarmRenditionsCommandTests(MediaTestCase):
+    def test_resumes_from_checkpoint(self):
+        images = [self.create_image("Image %d" % i) for i in range(3)]
+        CustomRendition.objects.all().delete()
+
+        checkpoint = os.path.join(tempfile.mkdtemp(), "checkpoint")
+        self.addCleanup(shutil.rmtree, os.path.dirname(checkpoint))
+        with open(checkpoint, "w") as f:
+            f.write(str(images[0].pk))
+
+        call_command(
+            "warm_renditions",
+            checkpoint=checkpoint,
+            workers=1,
+            batch_size=1,
+            stdout=io.StringIO(),
+        )
+
+        self.assertFalse(CustomRendition.objects.filter(image=images[0]).exists())
+        self.assertEqual(
+            CustomRendition.objects.filter(image__in=images[1:]).count(),
+            2 * len(get_filter_specs()),
+        )
+        with open(checkpoint) as f:
+            self.assertEqual(f.read(), str(images[2].pk))
+
+
+class PrefetchRenditionsTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.home = Site.objects.get(is_default_site=True).root_page
+
+    def count_queries(self, func):
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        return len(queries)
+
+    def create_post(self, image_count):
+        index = BlogIndexPage(title="Blog", slug="blog-%d" % image_count)
+        self.home.add_child(instance=index)
+        post = BlogPage(
+            title="Post",
+            slug="post",
+            date="2024-01-01",
+            intro="Intro",
+            body=[
+                ("image", {"image": self.create_image(), "alt_text": "", "decorative": True})
+                for i in range(image_count)
+            ],
+        )
+        index.add_child(instance=post)
+        return BlogPage.objects.get(pk=post.pk)
+
+    def render_body(self, post):
+        post.prefetch_renditions()
+        return post.body.render_as_block()
+
+    def test_blog_page_body_queries_do_not_grow_with_images(self):
+        few_images = self.create_post(2)
+        many_images = self.create_post(8)
+
+        # renditions are created on the first render
+        self.assertEqual(
+            self.count_queries(lambda: self.render_body(few_images)),
+            self.count_queries(lambda: self.render_body(many_images)),
+        )
+        self.assertEqual(CustomRendition.objects.count(), 10)
+
+        # and then found with one query for the images, and one for renditions
+        many_images = BlogPage.objects.get(pk=many_images.pk)
+        self.assertEqual(self.count_queries(lambda: self.render_body(many_images)), 2)
+
+    def test_gallery_queries_do_not_grow_with_images(self):
+        gallery = ImageGalleryPage(title="Gallery", slug="gallery")
+        for i in range(6):
+            gallery.gallery_images.create(image=self.create_image())
+        self.home.add_child(instance=gallery)
+        gallery.get_gallery_images()
+
+        template = Template(
+            "{% for gallery_image in gallery_images %}"
+            '{% include "blog/includes/gallery_image.html" %}'
+            "{% endfor %}"
+        )
+
+        def render():
+            template.render(Context({"gallery_images": gallery.get_gallery_images()}))
+
+        # one query to count the images, one for the images and one for renditions
+        self.assertEqual(self.count_queries(render), 3)
@@ -5,6 +5,8 @@ from wagtail.fields import RichTextField
 from wagtail.admin.panels import FieldPanel
 from wagtail import images
 
+from custom_media.renditions import register_filter_spec
+
 
 class HomePage(Page):
     summary = RichTextField(blank=True)
@@ -20,3 +22,9 @@ class HomePage(Page):
         FieldPanel('summary'),
         FieldPanel('main_image'),
     ]
+
+    # the rendition of the main image home/home_page.html displays
+    main_image_filter_spec = "max-500x500"
+
+
+register_filter_spec(HomePage.main_image_filter_spec)
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class InstrumentationConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "instrumentation"
+
+    def ready(self):
+        from instrumentation.timings import install
+
+        install()
@@ -0,0 +1,75 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from instrumentation.timings import (
+    RequestTimings,
+    record_timings,
+    server_timing_name,
+)
+
+logger = logging.getLogger(__name__)
+
+# Keeps the Server-Timing header to a reasonable size
+SERVER_TIMING_PARTS = 20
+
+
+class InstrumentationMiddleware:
+    """
+    Times a sample of requests (INSTRUMENTATION_SAMPLE_RATE), adding the
+    timings to the response's Server-Timing header and logging them as JSON.
+    It should be the first middleware, so the total covers the others.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.INSTRUMENTATION_SAMPLE_RATE:
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            stack.enter_context(record_timings(timings))
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(timings.time_query)
+                )
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        response["Server-Timing"] = self.server_timing(timings, total)
+        logger.info(json.dumps(self.log_record(request, response, timings, total)))
+        return response
+
+    def server_timing(self, timings, total):
+        metrics = [
+            'total;dur=%.1f' % (total * 1000),
+            'db;dur=%.1f;desc="%d queries"' % (timings.query_time * 1000, timings.queries),
+        ]
+        for name, (count, seconds) in timings.slowest_parts(SERVER_TIMING_PARTS):
+            metrics.append(
+                '%s;dur=%.1f;desc="%s (%d)"'
+                % (server_timing_name(name), seconds * 1000, name.replace('"', ""), count)
+            )
+        return ", ".join(metrics)
+
+    def log_record(self, request, response, timings, total):
+        return {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round(total * 1000, 2),
+            "queries": timings.queries,
+            "query_ms": round(timings.query_time * 1000, 2),
+            "parts": {
+                name: {"count": count, "ms": round(seconds * 1000, 2)}
+                for name, (count, seconds) in timings.parts.items()
+            },
+        }
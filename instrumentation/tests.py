@@ -0,0 +1,50 @@
+import datetime
+import json
+
+from django.test import TestCase, override_settings
+from django.utils import translation
+
+from wagtail.models import Site
+
+from blog.cache import get_body_cache
+from blog.models import BlogIndexPage, BlogPage
+
+
+class InstrumentationMiddlewareTests(TestCase):
+    def setUp(self):
+        # Bodies are cached by revision id, which the database may reuse
+        get_body_cache().clear()
+        index = BlogIndexPage(title="Blog", slug="blog")
+        Site.objects.get(is_default_site=True).root_page.add_child(instance=index)
+        post = BlogPage(
+            title="First post",
+            date=datetime.date(2024, 1, 1),
+            intro="Intro",
+            body=[("heading", {"text": "Heading", "size": "h2"})],
+        )
+        index.add_child(instance=post)
+        with translation.override("en"):
+            self.url = post.url
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=1)
+    def test_sampled_requests_are_timed(self):
+        with self.assertLogs("instrumentation", "INFO") as logs:
+            response = self.client.get(self.url)
+
+        server_timing = response["Server-Timing"]
+        self.assertIn("total;dur=", server_timing)
+        self.assertIn("db;dur=", server_timing)
+        self.assertIn('desc="template:blog/blog_page.html (1)"', server_timing)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["path"], self.url)
+        self.assertEqual(record["status"], 200)
+        self.assertGreater(record["queries"], 0)
+        self.assertIn("tag:get_main_navigation", record["parts"])
+        self.assertEqual(record["parts"]["block:heading"]["count"], 1)
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=0)
+    def test_other_requests_are_not_timed(self):
+        with self.assertNoLogs("instrumentation"):
+            response = self.client.get(self.url)
+        self.assertFalse(response.has_header("Server-Timing"))
@@ -0,0 +1,99 @@
+"""
+Timings of the parts of a request: SQL queries, templates, template tags and
+StreamField blocks.
+
+install() wraps the render methods of those parts once, at startup. The
+wrappers only time anything while a request is being recorded (see
+InstrumentationMiddleware), so unsampled requests just pay for a ContextVar
+lookup per call.
+"""
+import functools
+import re
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.template.base import Template
+from django.template.library import InclusionNode, SimpleNode
+
+from wagtail.blocks import Block
+from wagtail.images.templatetags.wagtailimages_tags import (
+    ImageNode,
+    PictureNode,
+    SrcsetImageNode,
+)
+
+_timings = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        # name: [count, seconds]
+        self.parts = defaultdict(lambda: [0, 0.0])
+
+    def add(self, name, seconds):
+        part = self.parts[name]
+        part[0] += 1
+        part[1] += seconds
+
+    def time_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_time += time.perf_counter() - start
+
+    def slowest_parts(self, limit):
+        return sorted(self.parts.items(), key=lambda part: -part[1][1])[:limit]
+
+
+@contextmanager
+def record_timings(timings):
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def server_timing_name(name):
+    return re.sub(r"[^A-Za-z0-9_-]", "_", name)
+
+
+def instrument(cls, get_name, method_name="render"):
+    """
+    Wraps a method so its calls are timed under the name get_name(self)
+    returns. Times are inclusive, e.g. a template's includes its tags'.
+    """
+    original = cls.__dict__[method_name]
+
+    @functools.wraps(original)
+    def wrapper(self, *args, **kwargs):
+        timings = _timings.get()
+        if timings is None:
+            return original(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            timings.add(get_name(self), time.perf_counter() - start)
+
+    wrapper.instrumented = True
+    setattr(cls, method_name, wrapper)
+
+
+def install():
+    if getattr(Template.render, "instrumented", False):
+        return
+    # Templates extended by another are timed as part of it
+    instrument(Template, lambda template: "template:%s" % template.name)
+    instrument(InclusionNode, lambda node: "tag:%s" % node.func.__name__)
+    instrument(SimpleNode, lambda node: "tag:%s" % node.func.__name__)
+    instrument(ImageNode, lambda node: "tag:image")
+    instrument(SrcsetImageNode, lambda node: "tag:srcset_image")
+    instrument(PictureNode, lambda node: "tag:picture")
+    instrument(Block, lambda block: "block:%s" % (block.name or type(block).__name__))
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.core import checks
+
+
+class MyblogConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "myblog"
+
+    def ready(self):
+        from myblog.database import check_databases
+
+        checks.register(check_databases, checks.Tags.database)
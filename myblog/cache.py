@@ -0,0 +1,189 @@
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_MISSING = object()
+
+
+def get_release(base_dir):
+    """
+    Names the deployed release: the RELEASE environment variable, or else the
+    commit checked out in base_dir.
+    """
+    release = os.environ.get("RELEASE")
+    if release:
+        return release
+
+    git_dir = os.path.join(base_dir, ".git")
+    try:
+        with open(os.path.join(git_dir, "HEAD")) as f:
+            head = f.read().strip()
+        if head.startswith("ref: "):
+            ref = head[len("ref: ") :]
+            try:
+                with open(os.path.join(git_dir, ref)) as f:
+                    head = f.read().strip()
+            except FileNotFoundError:
+                with open(os.path.join(git_dir, "packed-refs")) as f:
+                    head = next(
+                        line.split()[0]
+                        for line in f
+                        if line.rstrip().endswith(" " + ref)
+                    )
+    except (OSError, StopIteration):
+        return "dev"
+    return head[:12]
+
+
+class TieredCache(BaseCache):
+    """
+    A small in-process LRU cache in front of a cache shared by all processes
+    (e.g. file-based or Redis), so hot keys are read without a round trip.
+
+    Values are kept in process for at most LOCAL_TIMEOUT seconds, which is how
+    long a process may go on seeing a value another process changed or
+    deleted. Changes made by the process itself are seen at once.
+
+    OPTIONS:
+        SHARED: the alias of the shared cache
+        LOCAL_TIMEOUT: seconds values are kept in process (default: 5)
+        LOCAL_MAX_ENTRIES: values kept in process (default: 1000)
+        LOCAL_MAX_SIZE: bytes of pickled values kept in process (default: 16MB)
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self.shared_alias = options["SHARED"]
+        self.local_timeout = options.get("LOCAL_TIMEOUT", 5)
+        self.local_max_entries = options.get("LOCAL_MAX_ENTRIES", 1000)
+        self.local_max_size = options.get("LOCAL_MAX_SIZE", 16 * 1024 * 1024)
+        self._local = OrderedDict()
+        self._local_size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def _local_key(self, key, version):
+        return self.make_and_validate_key(key, version=version)
+
+    def _get_local(self, local_key):
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry is None:
+                return _MISSING
+            expires, pickled = entry
+            if expires <= time.monotonic():
+                self._delete_local(local_key)
+                return _MISSING
+            self._local.move_to_end(local_key)
+        return pickle.loads(pickled)
+
+    def _set_local(self, local_key, value, timeout=DEFAULT_TIMEOUT):
+        timeout = self.get_backend_timeout(timeout)
+        local_timeout = self.local_timeout
+        if timeout is not None:
+            local_timeout = min(local_timeout, timeout - time.time())
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+        with self._lock:
+            self._delete_local(local_key)
+            if local_timeout <= 0 or len(pickled) > self.local_max_size:
+                return
+            self._local[local_key] = (time.monotonic() + local_timeout, pickled)
+            self._local_size += len(pickled)
+            while (
+                len(self._local) > self.local_max_entries
+                or self._local_size > self.local_max_size
+            ):
+                _, (_, evicted) = self._local.popitem(last=False)
+                self._local_size -= len(evicted)
+
+    def _delete_local(self, local_key):
+        entry = self._local.pop(local_key, None)
+        if entry is not None:
+            self._local_size -= len(entry[1])
+
+    def get(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        value = self._get_local(local_key)
+        if value is not _MISSING:
+            return value
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        self._set_local(local_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        for key in keys:
+            value = self._get_local(self._local_key(key, version))
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            shared_found = self.shared.get_many(missing, version=version)
+            for key, value in shared_found.items():
+                self._set_local(self._local_key(key, version), value)
+            found.update(shared_found)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._set_local(self._local_key(key, version), value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._set_local(self._local_key(key, version), value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self._local_key(key, version)
+        with self._lock:
+            self._delete_local(local_key)
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._set_local(local_key, value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def has_key(self, key, version=None):
+        if self._get_local(self._local_key(key, version)) is not _MISSING:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        with self._lock:
+            self._delete_local(self._local_key(key, version))
+        return self.shared.incr(key, delta, version=version)
+
+    def delete(self, key, version=None):
+        with self._lock:
+            self._delete_local(self._local_key(key, version))
+        return self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        with self._lock:
+            for key in keys:
+                self._delete_local(self._local_key(key, version))
+        self.shared.delete_many(keys, version=version)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+            self._local_size = 0
+        self.shared.clear()
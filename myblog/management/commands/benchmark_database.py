@@ -0,0 +1,144 @@
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError
+from django.db.utils import ConnectionHandler
+
+CONFIGURATIONS = [
+    ("sqlite defaults", {"ENGINE": "django.db.backends.sqlite3", "OPTIONS": {}}),
+    (
+        "SQLITE_PRAGMAS",
+        {
+            "ENGINE": "myblog.backends.sqlite3",
+            "OPTIONS": {"pragmas": settings.SQLITE_PRAGMAS},
+        },
+    ),
+]
+
+BODY = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 40
+
+
+def connect(database):
+    # A connection of its own, outside the project's DATABASES
+    return ConnectionHandler({"default": database})["default"]
+
+
+def create_database(database, rows):
+    connection = connect(database)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TABLE post (id integer PRIMARY KEY, title text, body text)"
+        )
+        cursor.executemany(
+            "INSERT INTO post (id, title, body) VALUES (%s, %s, %s)",
+            [(i, "Post %d" % i, BODY) for i in range(1, rows + 1)],
+        )
+    connection.close()
+
+
+def run_worker(kind, database, rows, duration):
+    """
+    Reads pages of posts, or updates posts in small transactions, for
+    `duration` seconds. Returns the number of operations done and failed.
+    """
+    connection = connect(database)
+    done = failed = 0
+    end = time.monotonic() + duration
+    with connection.cursor() as cursor:
+        while time.monotonic() < end:
+            post_id = random.randint(1, rows - 10)
+            try:
+                if kind == "read":
+                    cursor.execute("SELECT title, body FROM post WHERE id = %s", [post_id])
+                    cursor.fetchall()
+                    cursor.execute(
+                        "SELECT id, title FROM post WHERE id BETWEEN %s AND %s",
+                        [post_id, post_id + 10],
+                    )
+                    cursor.fetchall()
+                else:
+                    cursor.execute("BEGIN")
+                    for i in range(post_id, post_id + 10):
+                        cursor.execute(
+                            "UPDATE post SET body = %s WHERE id = %s", [BODY[::-1], i]
+                        )
+                    cursor.execute("COMMIT")
+            except OperationalError:
+                # e.g. "database is locked"
+                if connection.connection.in_transaction:
+                    cursor.execute("ROLLBACK")
+                failed += 1
+            else:
+                done += 1
+    connection.close()
+    return kind, done, failed
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the throughput of concurrent SQLite readers and writers, "
+        "with SQLite's defaults and with the SQLITE_PRAGMAS setting"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--readers", type=int, default=8, help="Reading processes (default: 8)"
+        )
+        parser.add_argument(
+            "--writers", type=int, default=1, help="Writing processes (default: 1)"
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            default=5,
+            help="Seconds each configuration runs for (default: 5)",
+        )
+        parser.add_argument(
+            "--rows", type=int, default=10000, help="Posts in the table (default: 10000)"
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            "%-16s %12s %12s %10s"
+            % ("configuration", "reads/s", "writes/s", "failed")
+        )
+        for label, database in CONFIGURATIONS:
+            with tempfile.TemporaryDirectory() as directory:
+                database = {**database, "NAME": os.path.join(directory, "bench.sqlite3")}
+                create_database(database, options["rows"])
+                results = self.run(database, options)
+
+            totals = {"read": [0, 0], "write": [0, 0]}
+            for kind, done, failed in results:
+                totals[kind][0] += done
+                totals[kind][1] += failed
+            duration = options["duration"]
+            self.stdout.write(
+                "%-16s %12.0f %12.0f %10d"
+                % (
+                    label,
+                    totals["read"][0] / duration,
+                    totals["write"][0] / duration,
+                    totals["read"][1] + totals["write"][1],
+                )
+            )
+
+    def run(self, database, options):
+        kinds = ["read"] * options["readers"] + ["write"] * options["writers"]
+        executor = ProcessPoolExecutor(
+            max_workers=len(kinds), mp_context=multiprocessing.get_context("fork")
+        )
+        with executor:
+            futures = [
+                executor.submit(
+                    run_worker, kind, database, options["rows"], options["duration"]
+                )
+                for kind in kinds
+            ]
+            return [future.result() for future in futures]
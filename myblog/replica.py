@@ -0,0 +1,69 @@
+"""
+Sends the read queries of requests that don't change anything to the
+read-only "replica" database connection, when there's one.
+
+With SQLite in WAL mode, the replica reads the same file without waiting for
+the writer, and its query_only PRAGMA makes sure nothing served to visitors
+writes through it. Writes, and reads inside a transaction (which must see its
+uncommitted changes), always use the default database.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.urls import reverse
+
+REPLICA_DB_ALIAS = "replica"
+
+_use_replica = ContextVar("use_replica", default=False)
+
+
+@contextmanager
+def reads_from_replica():
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (
+            _use_replica.get()
+            and REPLICA_DB_ALIAS in connections.settings
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return REPLICA_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both connections are to the same database
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaReadsMiddleware:
+    """
+    Reads from the replica for GET and HEAD requests outside the admin.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.admin_prefixes = None
+
+    def __call__(self, request):
+        if self.admin_prefixes is None:
+            self.admin_prefixes = (reverse("wagtailadmin_home"), reverse("admin:index"))
+
+        if request.method in ("GET", "HEAD") and not request.path.startswith(
+            self.admin_prefixes
+        ):
+            with reads_from_replica():
+                return self.get_response(request)
+        return self.get_response(request)
@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 import os
 
+from myblog.cache import get_release
+
 PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 BASE_DIR = os.path.dirname(PROJECT_DIR)
 
@@ -24,12 +26,20 @@ BASE_DIR = os.path.dirname(PROJECT_DIR)
 # Application definition
 
 INSTALLED_APPS = [
+    # For its static files and templates, and the database system check
+    "myblog",
     "blog",
     "home",
     "search",
+    "navigation",
+    "pagecache",
+    "instrumentation",
+    "api",
     "custom_media",
     "wagtail.contrib.forms",
     "wagtail.contrib.redirects",
+    "wagtail.contrib.routable_page",
+    "wagtail.contrib.search_promotions",
     "wagtail.embeds",
     "wagtail.sites",
     "wagtail.users",
@@ -50,6 +60,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "instrumentation.middleware.InstrumentationMiddleware",
+    "pagecache.middleware.PrerenderedPageMiddleware",
+    "pagecache.middleware.PageCacheMiddleware",
+    "myblog.replica.ReplicaReadsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -87,13 +101,38 @@ WSGI_APPLICATION = "myblog.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Applied to each SQLite connection by myblog.backends.sqlite3
+SQLITE_PRAGMAS = {
+    # Readers see the last commit instead of waiting for the writer
+    "journal_mode": "wal",
+    # Safe in WAL mode: a power cut may only lose the last commits
+    "synchronous": "normal",
+    # Wait for the writer's lock instead of failing with "database is locked"
+    "busy_timeout": 5000,
+    # In KiB when negative
+    "cache_size": -20000,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "memory",
+}
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        "ENGINE": "myblog.backends.sqlite3",
         "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
-    }
+        "OPTIONS": {"pragmas": SQLITE_PRAGMAS},
+    },
+    # A read-only connection to the same database, for the queries of pages
+    # served to visitors (see myblog.replica)
+    "replica": {
+        "ENGINE": "myblog.backends.sqlite3",
+        "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+        "OPTIONS": {"pragmas": {**SQLITE_PRAGMAS, "query_only": 1}},
+        "TEST": {"MIRROR": "default"},
+    },
 }
 
+DATABASE_ROUTERS = ["myblog.replica.ReplicaRouter"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -143,10 +182,6 @@ STATICFILES_FINDERS = [
     "django.contrib.staticfiles.finders.AppDirectoriesFinder",
 ]
 
-STATICFILES_DIRS = [
-    os.path.join(PROJECT_DIR, "static"),
-]
-
 STATIC_ROOT = os.path.join(BASE_DIR, "static")
 STATIC_URL = "/static/"
 
@@ -185,6 +220,118 @@ WAGTAILSEARCH_BACKENDS = {
 # e.g. in notification emails. Don't include '/admin' or a trailing slash
 WAGTAILADMIN_BASE_URL = "http://example.com"
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Each cache keeps recently used values in process (see myblog.cache), in
+# front of a cache shared by all processes: in memory here, file-based or
+# Redis in production. The shared caches' keys are prefixed with the release,
+# so a new release never reads values pickled by the previous one.
+CACHE_KEY_PREFIX = get_release(BASE_DIR)
+
+CACHES = {
+    "default": {
+        "BACKEND": "myblog.cache.TieredCache",
+        "OPTIONS": {"SHARED": "shared"},
+    },
+    # Used by Wagtail for image renditions
+    "renditions": {
+        "BACKEND": "myblog.cache.TieredCache",
+        "OPTIONS": {"SHARED": "shared"},
+    },
+    # Kept apart from the default cache, so it can be cleared on its own
+    "pagecache": {
+        "BACKEND": "myblog.cache.TieredCache",
+        "OPTIONS": {"SHARED": "pagecache_shared", "LOCAL_MAX_ENTRIES": 200},
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "shared",
+        "KEY_PREFIX": CACHE_KEY_PREFIX,
+    },
+    "pagecache_shared": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "pagecache",
+        "KEY_PREFIX": CACHE_KEY_PREFIX,
+    },
+}
+
+# Rendered BlogPage bodies are cached per revision and language, and dropped
+# when the page is published or unpublished
+BLOG_BODY_CACHE = "default"
+BLOG_BODY_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Resolved main navigation links are cached per site and language, and
+# dropped when the menu changes or pages are published, unpublished or moved
+NAVIGATION_CACHE = "default"
+NAVIGATION_CACHE_TIMEOUT = 60 * 60
+
+# Renditions used by the templates are generated in the background when an
+# image is uploaded or a page using it is published (0 workers generates them
+# during the request instead)
+RENDITION_WARMUP_WORKERS = 2
+RENDITION_WARMUP_MAX_PENDING = 50
+
+# Search result ids are cached per query, locale and results page for a few
+# minutes. Results are counted up to SEARCH_RESULTS_COUNT_LIMIT, and shown as
+# "more than" that beyond it (None counts every result, with a COUNT query)
+SEARCH_CACHE = "default"
+SEARCH_CACHE_TIMEOUT = 60 * 5
+SEARCH_RESULTS_PER_PAGE = 10
+SEARCH_RESULTS_COUNT_LIMIT = 100
+
+# Search suggestions are served from an in-memory index of page titles and
+# intros, updated on publish and unpublish. Each process applies the changes
+# made by the others every SEARCH_SUGGEST_CHECK_INTERVAL seconds, and rebuilds
+# a locale it can't catch up with on a background "thread" (or "inline")
+SEARCH_SUGGEST_LIMIT = 8
+SEARCH_SUGGEST_MIN_LENGTH = 2
+SEARCH_SUGGEST_CHECK_INTERVAL = 10
+SEARCH_SUGGEST_REBUILD_WORKER = "thread"
+
+# Saved blog posts are queued for search indexing, and the queue is drained
+# after each commit by a background "thread", "inline" in the committing
+# thread, or (with None) only by the process_index_queue command
+SEARCH_INDEX_WORKER = "thread"
+SEARCH_INDEX_QUEUE_BATCH_SIZE = 100
+
+# Search query hits are counted in memory and saved every
+# SEARCH_QUERY_LOG_FLUSH_INTERVAL seconds (None for no background thread),
+# once SEARCH_QUERY_LOG_FLUSH_COUNT hits are waiting, and on exit
+SEARCH_QUERY_LOG_FLUSH_INTERVAL = 30
+SEARCH_QUERY_LOG_FLUSH_COUNT = 500
+
+# Pages served to anonymous visitors are cached whole, and purged when any
+# object they were rendered from changes (see pagecache.dependencies). Set
+# PAGE_CACHE to None to turn the page cache off.
+PAGE_CACHE = "pagecache"
+PAGE_CACHE_TIMEOUT = 60 * 10
+# The query parameters pages are rendered from: the page cache ignores others
+PAGE_CACHE_QUERY_PARAMETERS = ["page"]
+
+# The prerender_site command renders these page types to static files in
+# PRERENDER_ROOT, which are served (when PRERENDER_SERVE is on) before the
+# rest of the stack. Publishing deletes the files showing the changed pages,
+# until the next run renders them again. Only turn PRERENDER_SERVE on where the
+# command is run: it looks for a file for every request.
+PRERENDER_ROOT = os.path.join(BASE_DIR, "prerendered")
+PRERENDER_SERVE = False
+PRERENDER_PAGE_MODELS = [
+    "home.HomePage",
+    "blog.BlogIndexPage",
+    "blog.BlogPage",
+    "blog.ImageGalleryPage",
+]
+
+# A sample of requests is timed: their SQL queries, templates, template tags
+# and StreamField blocks. The timings are added to the Server-Timing header
+# and logged as JSON by the "instrumentation" logger.
+INSTRUMENTATION_SAMPLE_RATE = 0.01
+
+# The JSON API (see api.views) lists API_PAGE_SIZE pages per request by
+# default, and at most API_MAX_PAGE_SIZE
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
 # Custom models
 
 WAGTAILIMAGES_IMAGE_MODEL = 'custom_media.CustomImage'
\ No newline at end of file
@@ -13,6 +13,12 @@ CSRF_TRUSTED_ORIGINS = ['https://*.gitpod.io']
 
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
+# Always render pages while developing
+PAGE_CACHE = None
+
+# Time every request while developing
+INSTRUMENTATION_SAMPLE_RATE = 1
+
 
 try:
     from .local import *
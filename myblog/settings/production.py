@@ -1,7 +1,60 @@
 from .base import *
 
+from myblog.database import get_databases
+
 DEBUG = False
 
+# PostgreSQL when DATABASE_URL is set, SQLite as configured in base otherwise
+# (see myblog.database for the variables)
+DATABASES = get_databases(os.path.join(BASE_DIR, "db.sqlite3"), SQLITE_PRAGMAS)
+
+# Set once the prerender_site command is run (e.g. by cron)
+PRERENDER_SERVE = os.environ.get("PRERENDER_SERVE") == "1"
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "myblog": {"handlers": ["console"], "level": "INFO"},
+        "instrumentation": {"handlers": ["console"], "level": "INFO"},
+    },
+}
+
+# Share cached values (and their purges) between the worker processes: in
+# Redis when REDIS_URL is set, on disk otherwise. Cached pages stay on disk
+# (or in their own Redis database, with PAGE_CACHE_REDIS_URL), as clearing the
+# page cache clears all of its shared cache.
+if os.environ.get("REDIS_URL"):
+    CACHES["shared"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ["REDIS_URL"],
+        "KEY_PREFIX": CACHE_KEY_PREFIX,
+    }
+else:
+    CACHES["shared"] = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(BASE_DIR, "cache", "shared"),
+        "KEY_PREFIX": CACHE_KEY_PREFIX,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+
+if os.environ.get("PAGE_CACHE_REDIS_URL"):
+    CACHES["pagecache_shared"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ["PAGE_CACHE_REDIS_URL"],
+        "KEY_PREFIX": CACHE_KEY_PREFIX,
+    }
+else:
+    CACHES["pagecache_shared"] = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(BASE_DIR, "cache", "pages"),
+        "KEY_PREFIX": CACHE_KEY_PREFIX,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+
 try:
     from .local import *
 except ImportError:
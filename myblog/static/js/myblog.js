@@ -0,0 +1,27 @@
+/* Image galleries: load further pages of images in place */
+document.querySelectorAll("[data-gallery-more]").forEach((button) => {
+    const gallery = document.getElementById("gallery");
+
+    button.addEventListener("click", async (event) => {
+        event.preventDefault();
+        const url = `${button.dataset.galleryMore}?page=${button.dataset.nextPage}`;
+        const response = await fetch(url, { headers: { Accept: "application/json" } });
+        if (!response.ok) {
+            // Fall back to the server-rendered page
+            window.location = button.href;
+            return;
+        }
+
+        const data = await response.json();
+        gallery.insertAdjacentHTML(
+            "beforeend",
+            data.images.map((image) => image.html).join(""),
+        );
+        if (data.next_page) {
+            button.dataset.nextPage = data.next_page;
+            button.href = `?page=${data.next_page}`;
+        } else {
+            button.remove();
+        }
+    });
+});
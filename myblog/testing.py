@@ -0,0 +1,94 @@
+"""
+Render budgets: tests declaring the most queries a page view may make, and
+the most memory it may allocate, and checking neither grows with the data.
+
+    class BlogIndexBudgetTests(RenderBudgetTestCase):
+        def test_index(self):
+            self.assertRenderBudget(
+                url, grow=self.add_posts, sizes=[10, 50], queries=8, memory_kb=400
+            )
+"""
+import tracemalloc
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+_DEFAULT = object()
+
+
+class RenderBudgetTestCase(TestCase):
+    # The peak memory at the largest size may be this much above the peak at
+    # the smallest, for data that legitimately differs (e.g. longer titles)
+    memory_growth = 0.25
+
+    def clear_caches(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+
+    def measure(self, url, data=None):
+        """
+        Requests url with cold caches, and returns the queries made and the
+        peak memory allocated, in bytes.
+        """
+        # Once first, for rows created on first view (e.g. image renditions)
+        self.assertEqual(self.client.get(url, data).status_code, 200)
+        self.clear_caches()
+
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, data)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(response.status_code, 200)
+        return len(queries), peak
+
+    def assertRenderBudget(
+        self, url, grow, sizes, queries, memory_kb, data=None, memory_growth=_DEFAULT
+    ):
+        """
+        Calls grow(size) for each of sizes in turn, and requests url after
+        each. Fails when a request makes more than `queries` queries or
+        allocates more than memory_kb, or when the queries or memory grow
+        from the smallest size. memory_growth=None allows the memory to grow.
+        """
+        if memory_growth is _DEFAULT:
+            memory_growth = self.memory_growth
+        measured = []
+        for size in sizes:
+            grow(size)
+            size_queries, peak = self.measure(url, data)
+            self.assertLessEqual(
+                size_queries,
+                queries,
+                "%s made %d queries with %d rows, over its budget of %d"
+                % (url, size_queries, size, queries),
+            )
+            self.assertLessEqual(
+                peak / 1024,
+                memory_kb,
+                "%s allocated %d KiB with %d rows, over its budget of %d KiB"
+                % (url, peak / 1024, size, memory_kb),
+            )
+            measured.append((size, size_queries, peak))
+
+        smallest, smallest_queries, smallest_peak = measured[0]
+        for size, size_queries, peak in measured[1:]:
+            self.assertEqual(
+                size_queries,
+                smallest_queries,
+                "%s made %d queries with %d rows, but %d with %d"
+                % (url, size_queries, size, smallest_queries, smallest),
+            )
+            if memory_growth is None:
+                continue
+            self.assertLessEqual(
+                peak,
+                smallest_peak * (1 + memory_growth),
+                "%s allocated %d KiB with %d rows, but %d KiB with %d"
+                % (url, peak / 1024, size, smallest_peak / 1024, smallest),
+            )
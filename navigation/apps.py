@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class NavigationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "navigation"
+
+    def ready(self):
+        from navigation import signals  # noqa: F401
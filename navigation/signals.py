@@ -0,0 +1,46 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from wagtail.signals import (
+    page_published,
+    page_slug_changed,
+    page_unpublished,
+    post_page_move,
+)
+
+from navigation.cache import invalidate_main_navigation, invalidate_translation_links
+from navigation.models import MainNavigation
+
+
+@receiver(post_save, sender=MainNavigation)
+@receiver(post_delete, sender=MainNavigation)
+def invalidate_navigation_on_change(sender, **kwargs):
+    invalidate_main_navigation()
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+@receiver(post_page_move)
+def invalidate_navigation_on_page_change(sender, **kwargs):
+    # Menu items store the URL of (a translation of) their page, which changes
+    # when any page is published, unpublished or moved
+    invalidate_main_navigation()
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+def invalidate_translations_on_publish(sender, instance, **kwargs):
+    invalidate_translation_links([instance.translation_key])
+
+
+@receiver(post_page_move)
+@receiver(page_slug_changed)
+def invalidate_translations_on_url_change(sender, instance, **kwargs):
+    # The URLs of all the pages below this one have changed too
+    invalidate_translation_links(
+        set(
+            instance.get_descendants(inclusive=True).values_list(
+                "translation_key", flat=True
+            )
+        )
+    )
@@ -1,26 +1,23 @@
 from django import template
 
-from wagtail.models import Page, Locale
-
-from navigation.models import MainNavigation
+from navigation.cache import (
+    get_main_navigation_links,
+    get_translation_links as get_cached_translation_links,
+)
 
 register = template.Library()
 
 
 @register.inclusion_tag("navigation/main_navigation.html", takes_context=True)
 def get_main_navigation(context):
-    menu_items = []
+    return {
+        "menu_items": get_main_navigation_links(context["request"]),
+    }
 
-    try:
-        menu_items = MainNavigation.objects.filter(locale=Locale.get_active()).select_related("menu_page")
-    except MainNavigation.DoesNotExist:
-        pass
 
-    if not menu_items:
-        try:
-            menu_items = MainNavigation.objects.filter(locale=Locale.get_default()).select_related("menu_page")
-        except MainNavigation.DoesNotExist:
-            pass
-    return {
-        "menu_items": menu_items,
-    }
\ No newline at end of file
+@register.simple_tag(takes_context=True)
+def get_translation_links(context, page):
+    # Unsaved pages (e.g. previews of new pages) have no translations yet
+    if page.pk is None:
+        return []
+    return get_cached_translation_links(context["request"], page)
@@ -1,3 +1,123 @@
-from django.test import TestCase
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import translation
 
-# Create your tests here.
+from wagtail.models import Locale, Page, Site
+
+from myblog.testing import RenderBudgetTestCase
+from navigation.cache import get_navigation_cache
+from navigation.models import MainNavigation
+
+
+class MainNavigationTests(TestCase):
+    def setUp(self):
+        self.home = Site.objects.get(is_default_site=True).root_page
+        self.about = self.home.add_child(instance=Page(title="About", slug="about"))
+        self.contact = self.home.add_child(instance=Page(title="Contact", slug="contact"))
+        MainNavigation.objects.create(
+            name="About us", menu_page=self.about, locale=Locale.get_default()
+        )
+        get_navigation_cache().clear()
+
+    def get_request(self):
+        request = RequestFactory().get("/")
+        # Done by Wagtail when serving the page
+        Site.find_for_request(request)
+        return request
+
+    def render(self, request=None):
+        request = request or self.get_request()
+        template = Template("{% load navigation_tags %}{% get_main_navigation %}")
+        with translation.override("en"):
+            return template.render(Context({"request": request}))
+
+    def test_renders_menu(self):
+        html = self.render()
+        self.assertIn('<a href = "/en/about/"> About us</a>', html)
+
+    def test_warm_cache_needs_no_queries(self):
+        self.render()
+        request = self.get_request()
+        with self.assertNumQueries(0):
+            html = self.render(request)
+        self.assertIn("About us", html)
+
+    def test_saving_menu_item_invalidates_cache(self):
+        self.render()
+        MainNavigation.objects.create(
+            name="Contact us", menu_page=self.contact, locale=Locale.get_default()
+        )
+        self.assertIn("Contact us", self.render())
+
+    def test_moving_page_invalidates_cache(self):
+        self.render()
+        self.about.move(self.contact, pos="last-child")
+        self.assertIn('<a href = "/en/contact/about/"> About us</a>', self.render())
+
+
+@override_settings(WAGTAIL_I18N_ENABLED=True)
+class TranslationSwitcherTests(TestCase):
+    def setUp(self):
+        home = Site.objects.get(is_default_site=True).root_page
+        self.page = home.add_child(instance=Page(title="About", slug="about"))
+        self.french_page = self.page.copy_for_translation(
+            Locale.objects.create(language_code="fr"), copy_parents=True
+        )
+        self.french_page.save_revision().publish()
+        self.french_page.refresh_from_db()
+        get_navigation_cache().clear()
+
+    def render(self, page, request=None):
+        if request is None:
+            request = RequestFactory().get("/")
+            Site.find_for_request(request)
+        template = Template('{% include "navigation/switcher.html" %}')
+        with translation.override("en"):
+            return template.render(Context({"request": request, "page": page}))
+
+    def test_links_to_live_translations(self):
+        html = self.render(self.page)
+        self.assertIn('<a href="/fr/about/" rel="alternate" hreflang="fr">', html)
+        self.assertIn("français", html)
+        self.assertNotIn('hreflang="en"', html)
+
+        html = self.render(self.french_page)
+        self.assertIn('hreflang="en"', html)
+        self.assertNotIn('hreflang="fr"', html)
+
+    def test_warm_cache_needs_no_queries(self):
+        self.render(self.page)
+        request = RequestFactory().get("/")
+        Site.find_for_request(request)
+        with self.assertNumQueries(0):
+            self.render(self.french_page, request)
+
+    def test_unpublishing_translation_invalidates_cache(self):
+        self.render(self.page)
+        self.french_page.unpublish()
+        self.assertNotIn('hreflang="fr"', self.render(self.page))
+
+
+class NavigationRenderBudgetTests(RenderBudgetTestCase):
+    def add_menu_items(self, count):
+        home = Site.objects.get(is_default_site=True).root_page
+        for i in range(MainNavigation.objects.count(), count):
+            page = home.add_child(instance=Page(title="Page %d" % i, slug="page-%d" % i))
+            MainNavigation.objects.create(
+                name="Page %d" % i, menu_page=page, locale=Locale.get_default()
+            )
+
+    def test_menu(self):
+        # Rendered with the main navigation, by base.html
+        with translation.override("en"):
+            url = reverse("search")
+        self.assertRenderBudget(
+            url,
+            grow=self.add_menu_items,
+            sizes=[1, 10],
+            queries=4,
+            memory_kb=200,
+            # Every item is rendered
+            memory_growth=None,
+        )
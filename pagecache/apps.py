@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class PageCacheConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "pagecache"
+
+    def ready(self):
+        from pagecache import signals  # noqa: F401
@@ -0,0 +1,154 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from pagecache.conditional import (
+    LAST_TAG_CHANGE_MARGIN,
+    get_last_tag_change,
+    get_tags_changed,
+    mark_tags_changed,
+)
+from pagecache.dependencies import (
+    ALL_PAGES_TAG,
+    children_tag,
+    object_tag,
+    translations_tag,
+)
+from pagecache.prerender import remove_prerendered_pages
+
+
+def get_page_cache():
+    return caches[settings.PAGE_CACHE]
+
+
+def get_cache_url(request):
+    """
+    The URL a response is cached under. The host stands in for the site, and
+    the path starts with the language prefix added by i18n_patterns. Only the
+    query parameters pages are rendered from are kept, so e.g. tracking
+    parameters don't each add a cache entry.
+    """
+    params = sorted(
+        (name, value)
+        for name, values in request.GET.lists()
+        if name in settings.PAGE_CACHE_QUERY_PARAMETERS
+        for value in values
+    )
+    url = "%s%s" % (request.get_host(), request.path)
+    if params:
+        url += "?" + urlencode(params)
+    return url
+
+
+def response_cache_key(request):
+    url = get_cache_url(request)
+    return "pagecache:response:%s" % hashlib.md5(url.encode()).hexdigest()
+
+
+def is_fresh(tags, rendered_at, default=None):
+    """
+    Whether none of the tagged objects has changed since a response was
+    rendered (see pagecache.conditional.get_tags_changed).
+    """
+    # A single read, rather than one per tag (e.g. a file each, with a
+    # file-based cache), unless anything changed around or after rendering
+    last_change = get_last_tag_change()
+    if last_change is not None and last_change + LAST_TAG_CHANGE_MARGIN <= rendered_at:
+        return True
+    changed = get_tags_changed([ALL_PAGES_TAG, *tags], default)
+    return all(time <= rendered_at for time in changed.values())
+
+
+def is_cacheable_response(request, response):
+    """
+    Whether a response can be shared between visitors.
+    """
+    user = getattr(request, "user", None)
+    cache_control = response.get("Cache-Control", "")
+    return (
+        # only Wagtail pages (see wagtail_hooks), and not previews
+        getattr(request, "pagecache_page", None) is not None
+        and not getattr(request, "is_preview", False)
+        and not (user and user.is_authenticated)
+        and response.status_code == 200
+        and not response.streaming
+        # e.g. the CSRF cookie of a page with a form
+        and not response.cookies
+        and "private" not in cache_control
+        and "no-store" not in cache_control
+    )
+
+
+def get_cached_response(request):
+    cached = get_page_cache().get(response_cache_key(request))
+    if cached is None or not is_fresh(cached["tags"], cached["rendered_at"]):
+        return None
+
+    response = HttpResponse(cached["content"], status=cached["status"])
+    for header, value in cached["headers"]:
+        response[header] = value
+    response["X-Page-Cache"] = "hit"
+    # Revalidation requests for cached pages are answered from the stored
+    # validators (see pagecache.wagtail_hooks)
+    return get_conditional_response(
+        request,
+        etag=response.get("ETag"),
+        last_modified=parse_http_date_safe(response.get("Last-Modified", "")),
+        response=response,
+    )
+
+
+def store_response(request, response, tags, rendered_at):
+    """
+    Caches a response with the cache tags of the objects it was rendered
+    from, and the time rendering started. It's served until any of those
+    objects changes after that time.
+    """
+    # Tags with no recorded change are recorded as never changed
+    if not is_fresh(tags, rendered_at, default=0):
+        # Changed while the response was rendered
+        return
+    get_page_cache().set(
+        response_cache_key(request),
+        {
+            "content": response.content,
+            "status": response.status_code,
+            "headers": list(response.items()),
+            "tags": sorted(tags),
+            "rendered_at": rendered_at,
+        },
+        settings.PAGE_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_tags(tags):
+    """
+    Drops the cached and pre-rendered responses rendered from any of the
+    tagged objects.
+    """
+    # Marked first, so prerender_site doesn't list a page rendered before the
+    # change after its file is removed
+    mark_tags_changed(tags)
+    remove_prerendered_pages(tags)
+
+
+def invalidate_page(page):
+    """
+    Drops the cached responses that show a page: those rendered from it, those
+    listing its parent's children, and those linking to its translations.
+    """
+    tags = [object_tag(type(page), page.pk), translations_tag(page.translation_key)]
+    if not page.is_root():
+        tags.append(children_tag(page.get_parent().pk))
+    invalidate_tags(tags)
+
+
+def purge_all():
+    # Every response is tagged with it
+    mark_tags_changed([ALL_PAGES_TAG])
+    remove_prerendered_pages()
@@ -0,0 +1,156 @@
+"""
+Validators (ETag and Last-Modified) for page responses, so browsers and CDNs
+can revalidate a page instead of downloading it again.
+
+A page's response depends on more than its own revision: index pages list
+their children, and every page shows the menu and the images it uses. So the
+cache tags of the objects a URL's response was rendered from are kept (see
+pagecache.dependencies), and its validators include the last time any of
+them changed, which the signals in pagecache.signals move forward. Changes
+to other objects leave them as they are.
+"""
+import functools
+import hashlib
+import os
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template import engines
+
+from pagecache.dependencies import ALL_PAGES_TAG
+
+CONTENT_CHANGED_KEY = "pagecache:content-changed"
+# The time of the last change to any tag. Processes changing tags at the same
+# time may write it out of order, so it can go back by as much as a write
+# takes, which is far less than this many seconds.
+LAST_TAG_CHANGE_KEY = "pagecache:last-tag-change"
+LAST_TAG_CHANGE_MARGIN = 5
+
+
+def get_validator_cache():
+    # The page cache is shared between processes in production
+    return caches[settings.PAGE_CACHE or "default"]
+
+
+def get_content_changed():
+    cache = get_validator_cache()
+    changed = cache.get(CONTENT_CHANGED_KEY)
+    if changed is None:
+        # Nothing is known about earlier changes, so assume one just happened
+        changed = time.time()
+        cache.add(CONTENT_CHANGED_KEY, changed, None)
+    return changed
+
+
+def mark_content_changed():
+    get_validator_cache().set(CONTENT_CHANGED_KEY, time.time(), None)
+
+
+def tag_changed_key(tag):
+    return "pagecache:tag-changed:%s" % hashlib.md5(tag.encode()).hexdigest()
+
+
+def get_tag_cache():
+    # Read past the in-process tier (see myblog.cache), so a change made by one
+    # process is seen by the others at once
+    cache = get_validator_cache()
+    return getattr(cache, "shared", cache)
+
+
+def get_tags_changed(tags, default=None):
+    """
+    Returns the time each of the cache tags was last changed. Tags with no
+    recorded change (never changed, or evicted from the cache) are recorded
+    as changed at default, or now.
+    """
+    cache = get_tag_cache()
+    keys = {tag_changed_key(tag): tag for tag in tags}
+    found = cache.get_many(keys)
+    changed = {keys[key]: value for key, value in found.items()}
+    if default is None:
+        default = time.time()
+    for key in keys.keys() - found.keys():
+        if not cache.add(key, default, None):
+            # Added by another process meanwhile
+            changed[keys[key]] = cache.get(key, default)
+        else:
+            changed[keys[key]] = default
+    return changed
+
+
+def get_last_tag_change():
+    return get_tag_cache().get(LAST_TAG_CHANGE_KEY)
+
+
+def mark_tags_changed(tags):
+    # Each tag's time is set, not updated, so concurrent changes never lose one
+    now = time.time()
+    get_tag_cache().set_many(
+        {**{tag_changed_key(tag): now for tag in tags}, LAST_TAG_CHANGE_KEY: now},
+        None,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_template_version():
+    """
+    A hash of the project's own templates, so deploying changed templates
+    changes the ETags of the pages rendered with them.
+    """
+    template_hash = hashlib.md5()
+    for engine in engines.all():
+        for template_dir in engine.template_dirs:
+            template_dir = str(template_dir)
+            if not template_dir.startswith(str(settings.BASE_DIR)):
+                continue
+            for root, dirs, files in sorted(os.walk(template_dir)):
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    template_hash.update(os.path.relpath(path, template_dir).encode())
+                    with open(path, "rb") as f:
+                        template_hash.update(f.read())
+    return template_hash.hexdigest()
+
+
+def response_tags_key(url):
+    return "pagecache:response-tags:%s" % hashlib.md5(url.encode()).hexdigest()
+
+
+def get_response_tags(url):
+    """
+    Returns the cache tags the response for a URL was last rendered from, or
+    None if they aren't known.
+    """
+    return get_validator_cache().get(response_tags_key(url))
+
+
+def set_response_tags(url, tags):
+    get_validator_cache().set(response_tags_key(url), sorted(tags), None)
+
+
+def get_page_validators(page, request, tags):
+    """
+    Returns the ETag and Last-Modified timestamp of a page's response,
+    rendered from the tagged objects, without rendering it or querying the
+    database.
+    """
+    content_changed = max(get_tags_changed([ALL_PAGES_TAG, *tags]).values())
+    user = getattr(request, "user", None)
+    version = ":".join(
+        str(part)
+        for part in [
+            page.pk,
+            page.live_revision_id,
+            get_template_version(),
+            content_changed,
+            # Editors see the userbar
+            int(bool(user and user.is_authenticated)),
+        ]
+    )
+    etag = '"%s"' % hashlib.md5(version.encode()).hexdigest()
+
+    last_modified = int(content_changed)
+    if page.last_published_at:
+        last_modified = max(last_modified, int(page.last_published_at.timestamp()))
+    return etag, last_modified
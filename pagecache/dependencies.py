@@ -0,0 +1,84 @@
+"""
+Records the objects a response was rendered from, as cache tags.
+
+While a response is rendered inside record_dependencies(), every tracked
+model instance loaded from the database is tagged (see pagecache.signals).
+Code serving content from other caches, which doesn't load the instances,
+adds the tags explicitly with add_object_dependency() and friends.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_tags = ContextVar("pagecache_dependencies", default=None)
+
+# Every response depends on it, for changes that may affect any page (e.g.
+# the URLs of a subtree changing)
+ALL_PAGES_TAG = "pagecache:all"
+
+
+@contextmanager
+def record_dependencies():
+    tags = set()
+    outer_tags = _tags.get()
+    token = _tags.set(tags)
+    try:
+        yield tags
+    finally:
+        _tags.reset(token)
+        # A recording inside another adds to it too
+        if outer_tags is not None:
+            outer_tags.update(tags)
+
+
+def is_recording():
+    return _tags.get() is not None
+
+
+def add_dependencies(*tags):
+    tags_set = _tags.get()
+    if tags_set is not None:
+        tags_set.update(tags)
+
+
+def model_tag(model):
+    # Instances of subclasses (e.g. BlogPage) are tagged as their base model
+    parents = model._meta.get_parent_list()
+    return (parents[-1] if parents else model)._meta.label_lower
+
+
+def object_tag(model, pk):
+    return "%s:%s" % (model_tag(model), pk)
+
+
+def children_tag(page_id):
+    return "wagtailcore.page.children:%s" % page_id
+
+
+def translations_tag(translation_key):
+    return "wagtailcore.page.translations:%s" % translation_key
+
+
+def add_object_dependency(model, pk):
+    add_dependencies(object_tag(model, pk))
+
+
+def add_model_dependency(model):
+    """
+    For responses that depend on every instance of a model, including new ones.
+    """
+    add_dependencies(model_tag(model))
+
+
+def add_children_dependency(page):
+    """
+    For responses that list a page's children, so they're purged when a child
+    is published, unpublished or deleted.
+    """
+    add_dependencies(children_tag(page.pk))
+
+
+def add_translations_dependency(page):
+    """
+    For responses that link to a page's translations.
+    """
+    add_dependencies(translations_tag(page.translation_key))
@@ -0,0 +1,135 @@
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from pagecache.cache import is_fresh
+from pagecache.prerender import (
+    copy_media_file,
+    get_prerendered_pages,
+    load_manifest,
+    lock_manifest,
+    remove_pages,
+    render_page,
+    save_manifest,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the site's live pages to static files in PRERENDER_ROOT, "
+        "only rendering the pages changed since the last run"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of processes rendering pages (default: one per CPU)",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            dest="render_all",
+            help="Render every page, even those that haven't changed",
+        )
+
+    def handle(self, *args, **options):
+        if settings.PRERENDER_ROOT is None:
+            raise CommandError("PRERENDER_ROOT isn't set")
+
+        started = time.time()
+        manifest = load_manifest()
+        rendered_at = None if options["render_all"] else manifest["rendered_at"]
+
+        pages = get_prerendered_pages()
+        page_paths = defaultdict(list)
+        for path, entry in manifest["pages"].items():
+            page_paths[entry["page_id"]].append(path)
+        page_ids = [
+            page.pk
+            for page in pages
+            if self.needs_rendering(page, page_paths, rendered_at)
+        ]
+        entries = [
+            entry
+            for entry in self.render_pages(page_ids, options["workers"])
+            if entry is not None
+        ]
+
+        # Read again, as the pagecache signals may have changed it meanwhile
+        with lock_manifest():
+            manifest = load_manifest()
+            # Pages no longer live (or no longer shareable) are removed, the
+            # old URLs of the pages rendered again, and the pages whose files
+            # the pagecache signals removed meanwhile
+            live_page_ids = {page.pk for page in pages}
+            rerendered_page_ids = set(page_ids)
+            rendered_paths = {entry["path"] for entry in entries}
+            remove_pages(
+                manifest,
+                [
+                    path
+                    for path, entry in manifest["pages"].items()
+                    if entry["page_id"] not in live_page_ids
+                    or (
+                        entry["page_id"] in rerendered_page_ids
+                        and path not in rendered_paths
+                    )
+                    or (
+                        path not in rendered_paths
+                        and not os.path.isfile(
+                            os.path.join(settings.PRERENDER_ROOT, path)
+                        )
+                    )
+                ],
+            )
+
+            copied = 0
+            for entry in entries:
+                if not is_fresh(entry["tags"], entry["rendered_at"], default=0):
+                    # Changed while it was rendered, and rendered again next time
+                    remove_pages(manifest, [entry["path"]])
+                    continue
+                manifest["pages"][entry["path"]] = entry
+                for name in entry["media"]:
+                    copied += copy_media_file(entry["site_dir"], name)
+
+            manifest["rendered_at"] = started
+            save_manifest(manifest)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Rendered %d of %d pages, copied %d media files"
+                % (len(page_ids), len(pages), copied)
+            )
+        )
+
+    def needs_rendering(self, page, page_paths, rendered_at):
+        if rendered_at is None or page.pk not in page_paths:
+            return True
+        if page.last_published_at and page.last_published_at.timestamp() > rendered_at:
+            return True
+        # Removed since, by the pagecache signals
+        return not all(
+            os.path.isfile(os.path.join(settings.PRERENDER_ROOT, path))
+            for path in page_paths[page.pk]
+        )
+
+    def render_pages(self, page_ids, workers):
+        if workers <= 1 or len(page_ids) <= 1:
+            return map(render_page, page_ids)
+
+        # The workers are forked, so they can't share the database connections
+        connections.close_all()
+        executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("fork")
+        )
+        with executor:
+            return list(executor.map(render_page, page_ids, chunksize=8))
@@ -0,0 +1,85 @@
+import os
+import time
+
+from django.conf import settings
+
+from pagecache.cache import (
+    get_cached_response,
+    is_cacheable_response,
+    store_response,
+)
+from pagecache.dependencies import record_dependencies
+from pagecache.prerender import find_prerendered_file
+from pagecache.views import serve_media
+
+
+class PageCacheMiddleware:
+    """
+    Serves anonymous GET and HEAD requests for Wagtail pages from the page
+    cache, and caches the pages rendered for them, tagged with the objects
+    they were rendered from (see pagecache.dependencies).
+
+    Requests with a session cookie go through the full stack, so editors never
+    get a cached page and cache hits don't need to load the session. It should
+    be the first middleware, so cache hits skip the others too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.is_cacheable_request(request):
+            return self.get_response(request)
+
+        response = get_cached_response(request)
+        if response is not None:
+            return response
+
+        rendered_at = time.time()
+        with record_dependencies() as tags:
+            response = self.get_response(request)
+        if request.method == "GET" and is_cacheable_response(request, response):
+            store_response(request, response, tags, rendered_at)
+        return response
+
+    def is_cacheable_request(self, request):
+        return (
+            settings.PAGE_CACHE is not None
+            and request.method in ("GET", "HEAD")
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+            # prerender_site records the dependencies of each page itself
+            and not getattr(request, "is_prerender", False)
+        )
+
+
+
+class PrerenderedPageMiddleware:
+    """
+    Serves anonymous GET and HEAD requests from the pages pre-rendered by the
+    prerender_site command, and the media files copied next to them, when
+    there's one for the URL. It should come before PageCacheMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if self.is_servable_request(request):
+            path = find_prerendered_file(request.get_host(), request.path)
+            if path is not None:
+                return serve_media(
+                    request,
+                    os.path.relpath(path, settings.PRERENDER_ROOT),
+                    document_root=settings.PRERENDER_ROOT,
+                )
+        return self.get_response(request)
+
+    def is_servable_request(self, request):
+        return (
+            settings.PRERENDER_SERVE
+            and request.method in ("GET", "HEAD")
+            # e.g. the other pages of a gallery
+            and not request.GET
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+            and not getattr(request, "is_prerender", False)
+        )
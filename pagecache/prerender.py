@@ -0,0 +1,318 @@
+"""
+Pre-rendered pages: static HTML files written by the prerender_site command,
+with copies of the media files they link to, which PrerenderedPageMiddleware
+serves before the rest of the stack.
+
+The files are listed in a manifest, with the cache tags of the objects they
+were rendered from (see pagecache.dependencies). The manifest is written with
+an index of the files by tag, split into small shard files, so the pagecache
+signals can delete the files showing changed content without reading the
+whole manifest. The next prerender_site run renders them again. The command
+writes the manifest under an exclusive lock, and the signals remove files
+under a shared one, as they run in different processes.
+"""
+import fcntl
+import functools
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from urllib.parse import unquote, urlsplit
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.core.handlers.base import BaseHandler
+from django.test import RequestFactory
+from django.utils import translation
+from django.utils._os import safe_join
+
+from wagtail.models import Locale, Page, Site
+
+from pagecache.dependencies import record_dependencies
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_LOCK_NAME = "manifest.lock"
+TAG_INDEX_DIR = "tags"
+TAG_INDEX_SHARDS = 256
+
+# The default site is served for any host without a site of its own
+DEFAULT_SITE_DIR = "_default"
+
+
+def get_site_dir(site, host):
+    return DEFAULT_SITE_DIR if site.is_default_site else host
+
+
+def get_output_path(site_dir, path):
+    """
+    Returns the file a page URL is pre-rendered to, or None if the URL can't
+    be mapped to a file in PRERENDER_ROOT.
+    """
+    try:
+        return safe_join(
+            settings.PRERENDER_ROOT, site_dir, path.lstrip("/"), "index.html"
+        )
+    except (SuspiciousFileOperation, ValueError):
+        return None
+
+
+def get_media_path(site_dir, name):
+    """
+    Returns the copy of a media file next to the pages linking to it, or None
+    if the name can't be mapped to a file in PRERENDER_ROOT.
+    """
+    try:
+        return safe_join(
+            settings.PRERENDER_ROOT, site_dir, settings.MEDIA_URL.lstrip("/"), name
+        )
+    except (SuspiciousFileOperation, ValueError):
+        return None
+
+
+def find_prerendered_file(host, path):
+    """
+    Returns the pre-rendered page, or the copied media file, for a requested
+    URL, if there's one.
+    """
+    try:
+        site_dir = safe_join(settings.PRERENDER_ROOT, host)
+    except (SuspiciousFileOperation, ValueError):
+        return None
+    if not os.path.isdir(site_dir):
+        site_dir = DEFAULT_SITE_DIR
+    if path.startswith(settings.MEDIA_URL):
+        output_path = get_media_path(site_dir, path[len(settings.MEDIA_URL) :])
+    else:
+        output_path = get_output_path(site_dir, path)
+    if output_path is not None and os.path.isfile(output_path):
+        return output_path
+    return None
+
+
+def write_file(path, content):
+    # Written to a temporary file first, so the file is never served half written
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "wb") as f:
+        f.write(content)
+    os.chmod(temp_path, 0o644)
+    os.replace(temp_path, path)
+
+
+@contextmanager
+def lock_manifest(shared=False):
+    """
+    Holds the manifest's lock, for reading the manifest, changing it and
+    saving it without losing another process's changes. The shared lock is
+    for removing files while the manifest isn't being saved.
+    """
+    os.makedirs(settings.PRERENDER_ROOT, exist_ok=True)
+    with open(os.path.join(settings.PRERENDER_ROOT, MANIFEST_LOCK_NAME), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def load_manifest():
+    try:
+        with open(os.path.join(settings.PRERENDER_ROOT, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"rendered_at": None, "pages": {}}
+
+
+def get_tag_shard(tag):
+    return hashlib.md5(tag.encode()).digest()[0] % TAG_INDEX_SHARDS
+
+
+def get_tag_index_path(shard):
+    return os.path.join(settings.PRERENDER_ROOT, TAG_INDEX_DIR, "%02x.json" % shard)
+
+
+def load_tag_index(shard):
+    try:
+        with open(get_tag_index_path(shard)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(manifest):
+    """
+    Saves the manifest, and the index of its files by tag.
+    """
+    shards = [defaultdict(list) for shard in range(TAG_INDEX_SHARDS)]
+    for path, entry in manifest["pages"].items():
+        for tag in entry["tags"]:
+            shards[get_tag_shard(tag)][tag].append(path)
+    for shard, paths in enumerate(shards):
+        write_file(get_tag_index_path(shard), json.dumps(paths).encode())
+    write_file(
+        os.path.join(settings.PRERENDER_ROOT, MANIFEST_NAME),
+        json.dumps(manifest).encode(),
+    )
+
+
+def remove_file(path):
+    try:
+        os.remove(os.path.join(settings.PRERENDER_ROOT, path))
+    except FileNotFoundError:
+        pass
+
+
+def remove_pages(manifest, paths):
+    for path in paths:
+        manifest["pages"].pop(path, None)
+        remove_file(path)
+
+
+def remove_prerendered_pages(tags=None):
+    """
+    Deletes the pre-rendered pages rendered from any of the tagged objects, or
+    all of them.
+
+    The files of tagged objects are found in the index shards of the tags, and
+    are left in the manifest until the next prerender_site run.
+    """
+    if settings.PRERENDER_ROOT is None or not os.path.isdir(settings.PRERENDER_ROOT):
+        return
+    if tags is None:
+        with lock_manifest():
+            manifest = load_manifest()
+            if manifest["pages"]:
+                remove_pages(manifest, list(manifest["pages"]))
+                save_manifest(manifest)
+        return
+
+    shards = defaultdict(list)
+    for tag in tags:
+        shards[get_tag_shard(tag)].append(tag)
+    with lock_manifest(shared=True):
+        paths = set()
+        for shard, shard_tags in shards.items():
+            index = load_tag_index(shard)
+            for tag in shard_tags:
+                paths.update(index.get(tag, ()))
+        for path in paths:
+            remove_file(path)
+
+
+def get_prerendered_pages():
+    """
+    Returns the live pages of the types in PRERENDER_PAGE_MODELS, for each site
+    and locale.
+    """
+    page_models = [apps.get_model(label) for label in settings.PRERENDER_PAGE_MODELS]
+    pages = []
+    for site in Site.objects.select_related("root_page"):
+        for locale in Locale.objects.all():
+            root_page = site.root_page.get_translation_or_none(locale)
+            if root_page is None:
+                continue
+            pages.extend(
+                Page.objects.descendant_of(root_page, inclusive=True)
+                .live()
+                .public()
+                .type(*page_models)
+                .order_by("path")
+            )
+    return pages
+
+
+@functools.lru_cache(maxsize=None)
+def get_handler():
+    handler = BaseHandler()
+    handler.load_middleware()
+    return handler
+
+
+def find_media_files(content):
+    """
+    Returns the names of the media files (e.g. image renditions) a page links to.
+    """
+    if urlsplit(settings.MEDIA_URL).netloc:
+        return set()
+    pattern = re.escape(settings.MEDIA_URL) + r"""([^\s"'<>),]+)"""
+    return {unquote(name) for name in re.findall(pattern, content.decode())}
+
+
+def render_page(page_id):
+    """
+    Renders a page through the whole middleware stack, as it would be for an
+    anonymous visitor, and writes it to PRERENDER_ROOT.
+
+    Returns the page's manifest entry, or None if its response can't be
+    shared (see pagecache.cache.is_cacheable_response).
+    """
+    from pagecache.cache import is_cacheable_response
+
+    # Pages made private since they were listed aren't rendered: the files are
+    # served before Wagtail checks view restrictions
+    page = Page.objects.live().public().filter(pk=page_id).first()
+    if page is None:
+        return None
+    page = page.specific
+    # The URL's language prefix is the active language's, which in a worker
+    # process is whichever was active when it was forked
+    with translation.override(page.locale.language_code):
+        url_parts = page.get_url_parts()
+    if url_parts is None:
+        return None
+    site_id, root_url, page_path = url_parts
+    url = urlsplit(root_url)
+    site_dir = get_site_dir(Site.objects.get(pk=site_id), url.netloc)
+    request = RequestFactory().get(
+        page_path, HTTP_HOST=url.netloc, secure=url.scheme == "https"
+    )
+    # Skips the page cache and the pre-rendered page being replaced
+    request.is_prerender = True
+    rendered_at = time.time()
+    with record_dependencies() as tags:
+        response = get_handler().get_response(request)
+    if not is_cacheable_response(request, response):
+        return None
+
+    output_path = get_output_path(site_dir, page_path)
+    write_file(output_path, response.content)
+    return {
+        "path": os.path.relpath(output_path, settings.PRERENDER_ROOT),
+        "page_id": page.pk,
+        "tags": sorted(tags),
+        "rendered_at": rendered_at,
+        "site_dir": site_dir,
+        "media": sorted(find_media_files(response.content)),
+    }
+
+
+def copy_media_file(site_dir, name):
+    """
+    Copies a media file next to the pages linking to it, unless it's there
+    already. Returns whether it was copied.
+    """
+    try:
+        source = default_storage.path(name)
+    except NotImplementedError:
+        # Remote storage, which pages link to directly
+        return False
+    destination = get_media_path(site_dir, name)
+    if destination is None or not os.path.isfile(source):
+        return False
+    if os.path.isfile(destination):
+        source_stat, destination_stat = os.stat(source), os.stat(destination)
+        if (source_stat.st_size, int(source_stat.st_mtime)) == (
+            destination_stat.st_size,
+            int(destination_stat.st_mtime),
+        ):
+            return False
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    shutil.copy2(source, destination)
+    return True
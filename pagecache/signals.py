@@ -0,0 +1,93 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from wagtail.images import get_image_model
+from wagtail.models import Page, PageViewRestriction, Site
+from wagtail.signals import (
+    page_published,
+    page_slug_changed,
+    page_unpublished,
+    post_page_move,
+)
+
+from navigation.models import MainNavigation
+from pagecache.cache import invalidate_page, invalidate_tags, purge_all
+from pagecache.conditional import mark_content_changed
+from pagecache.dependencies import (
+    add_object_dependency,
+    is_recording,
+    model_tag,
+    object_tag,
+)
+
+# The models whose instances are recorded as dependencies when loaded
+TRACKED_MODELS = (Page, Site, MainNavigation, get_image_model())
+
+
+@receiver(post_init)
+def record_loaded_object(sender, instance, **kwargs):
+    if is_recording() and isinstance(instance, TRACKED_MODELS) and instance.pk:
+        add_object_dependency(type(instance), instance.pk)
+
+
+def is_in_main_navigation(page):
+    return MainNavigation.objects.filter(
+        menu_page__translation_key=page.translation_key
+    ).exists()
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+def invalidate_on_publish(sender, instance, **kwargs):
+    mark_content_changed()
+    invalidate_page(instance)
+    if is_in_main_navigation(instance):
+        # The menu is shown from the navigation cache, without loading pages
+        invalidate_tags([model_tag(MainNavigation)])
+
+
+@receiver(post_delete)
+def invalidate_on_delete(sender, instance, **kwargs):
+    if isinstance(instance, PageViewRestriction):
+        invalidate_on_restriction_change(sender, instance)
+    elif isinstance(instance, Page):
+        # Deleting a page sends post_delete for each model it inherits from too
+        if type(instance) is instance.specific_class:
+            invalidate_on_publish(sender, instance)
+    elif isinstance(instance, TRACKED_MODELS):
+        invalidate_on_change(sender, instance)
+
+
+@receiver(post_save, sender=get_image_model())
+@receiver(post_save, sender=MainNavigation)
+@receiver(post_save, sender=Site)
+def invalidate_on_change(sender, instance, **kwargs):
+    mark_content_changed()
+    invalidate_tags(
+        [object_tag(type(instance), instance.pk), model_tag(type(instance))]
+    )
+
+
+@receiver(post_save, sender=PageViewRestriction)
+def invalidate_on_restriction_change(sender, instance, **kwargs):
+    # Pages restricted to some visitors must no longer be served to the others
+    page = Page.objects.filter(pk=instance.page_id).first()
+    if page is None:
+        # Deleted along with its page
+        return
+    mark_content_changed()
+    invalidate_page(page)
+    invalidate_tags(
+        [
+            object_tag(Page, pk)
+            for pk in Page.objects.descendant_of(page).values_list("pk", flat=True)
+        ]
+    )
+
+
+@receiver(post_page_move)
+@receiver(page_slug_changed)
+def purge_all_on_url_change(sender, **kwargs):
+    # The URLs of a whole subtree have changed, and any page may link to them
+    mark_content_changed()
+    purge_all()
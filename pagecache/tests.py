@@ -0,0 +1,395 @@
+import datetime
+import io
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import translation
+
+from wagtail.documents import get_document_model
+from wagtail.images.tests.utils import get_test_image_file
+from wagtail.models import Page, PageViewRestriction, Site
+
+from blog.models import BlogIndexPage, BlogPage
+from custom_media.models import CustomImage
+from navigation.models import MainNavigation
+from pagecache.cache import get_page_cache, invalidate_page, is_fresh
+from pagecache.conditional import mark_tags_changed
+from pagecache.dependencies import object_tag
+from pagecache.prerender import copy_media_file, load_manifest, render_page
+
+
+@override_settings(PAGE_CACHE="pagecache")
+class PageCacheMiddlewareTests(TestCase):
+    def setUp(self):
+        get_page_cache().clear()
+        self.addCleanup(get_page_cache().clear)
+        self.index = BlogIndexPage(title="Blog", slug="blog")
+        Site.objects.get(is_default_site=True).root_page.add_child(instance=self.index)
+        self.post = self.add_post("First post")
+        self.other_post = self.add_post("Second post")
+
+    def add_post(self, title):
+        post = BlogPage(title=title, date=datetime.date(2024, 1, 1), intro="Intro")
+        self.index.add_child(instance=post)
+        return post
+
+    def get(self, page, **kwargs):
+        with translation.override("en"):
+            url = page.url
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def assertCached(self, page):
+        response, queries = self.get(page)
+        self.assertEqual(response.get("X-Page-Cache"), "hit")
+        self.assertEqual(queries, 0)
+
+    def assertNotCached(self, page):
+        response, _ = self.get(page)
+        self.assertIsNone(response.get("X-Page-Cache"))
+
+    def test_anonymous_page_views_are_cached(self):
+        response, _ = self.get(self.post)
+        self.assertIsNone(response.get("X-Page-Cache"))
+        self.assertCached(self.post)
+        self.assertContains(self.get(self.post)[0], "First post")
+
+    def test_publish_purges_page_and_ancestors(self):
+        for page in [self.index, self.post, self.other_post]:
+            self.get(page)
+
+        self.post.title = "Changed post"
+        self.post.save_revision().publish()
+
+        self.assertNotCached(self.post)
+        self.assertNotCached(self.index)
+        self.assertCached(self.other_post)
+
+    def test_menu_change_purges_everything(self):
+        self.get(self.post)
+        MainNavigation.objects.create(name="Blog", menu_page=self.index)
+        self.assertNotCached(self.post)
+
+    def test_restriction_purges_page_and_descendants(self):
+        for page in [self.index, self.post]:
+            self.get(page)
+            self.assertCached(page)
+
+        restriction = PageViewRestriction.objects.create(
+            page=self.index, restriction_type=PageViewRestriction.LOGIN
+        )
+        with translation.override("en"):
+            for page in [self.index, self.post]:
+                response = self.client.get(page.url)
+                self.assertEqual(response.status_code, 302)
+                self.assertIsNone(response.get("X-Page-Cache"))
+
+        restriction.delete()
+        self.assertNotCached(self.post)
+
+    def test_unknown_query_parameters_are_ignored(self):
+        self.get(self.index)
+        self.assertEqual(
+            self.get(self.index, data={"utm_source": "feed"})[0].get("X-Page-Cache"),
+            "hit",
+        )
+        response, _ = self.get(self.index, data={"page": "2"})
+        self.assertIsNone(response.get("X-Page-Cache"))
+
+    def test_changes_during_rendering_are_not_cached(self):
+        # The post changes after rendering started
+        started = time.time() - 60
+        mark_tags_changed([object_tag(Page, self.post.pk)])
+        with mock.patch("pagecache.middleware.time.time", return_value=started):
+            self.get(self.post)
+        self.assertNotCached(self.post)
+        self.assertCached(self.post)
+
+    def test_freshness_is_a_single_read_without_recent_changes(self):
+        mark_tags_changed(["tag"])
+        now = time.time()
+        with mock.patch("pagecache.cache.get_tags_changed") as get_tags_changed:
+            self.assertTrue(is_fresh(["tag", "other"], now + 10))
+            get_tags_changed.assert_not_called()
+            # Changed around the rendering
+            is_fresh(["tag"], now + 1)
+            get_tags_changed.assert_called_once()
+        self.assertTrue(is_fresh(["tag"], now + 1))
+        self.assertFalse(is_fresh(["tag"], now - 1))
+
+    def test_requests_with_session_are_not_cached(self):
+        self.get(self.post)
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = "session"
+        self.assertNotCached(self.post)
+
+    def test_editors_pages_are_not_cached(self):
+        user = get_user_model().objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+        self.client.force_login(user)
+        self.get(self.post)
+        self.client.logout()
+        self.client.cookies.clear()
+        self.assertNotCached(self.post)
+
+    def create_image(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        return CustomImage.objects.create(title="Image", file=get_test_image_file())
+
+    def test_image_change_purges_pages_using_it(self):
+        image = self.create_image()
+        unused_image = CustomImage.objects.create(
+            title="Other image", file=get_test_image_file()
+        )
+        self.post.body = [
+            ("image", {"image": image, "alt_text": "", "decorative": True})
+        ]
+        self.post.save_revision().publish()
+        self.get(self.post)
+
+        # with the body served from the body cache, the image isn't loaded
+        get_page_cache().clear()
+        self.get(self.post)
+        self.assertCached(self.post)
+
+        unused_image.save()
+        self.assertCached(self.post)
+        image.title = "Changed image"
+        image.save()
+        self.assertNotCached(self.post)
+
+
+@override_settings(PAGE_CACHE=None)
+class ConditionalResponseTests(TestCase):
+    def setUp(self):
+        self.index = BlogIndexPage(title="Blog", slug="blog")
+        Site.objects.get(is_default_site=True).root_page.add_child(instance=self.index)
+        self.post = BlogPage(
+            title="First post", date=datetime.date(2024, 1, 1), intro="Intro"
+        )
+        self.index.add_child(instance=self.post)
+        with translation.override("en"):
+            self.url = self.post.url
+
+    def get(self, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, headers=headers)
+        return response, len(queries)
+
+    def test_page_responses_have_validators(self):
+        response, _ = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header("ETag"))
+        self.assertTrue(response.has_header("Last-Modified"))
+        self.assertIn("no-cache", response["Cache-Control"])
+
+    def test_revalidation_skips_rendering(self):
+        response, rendered_queries = self.get()
+        response, queries = self.get(if_none_match=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertLess(queries, rendered_queries)
+
+        response, _ = self.get(if_modified_since=response["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_publish_changes_etag(self):
+        etag = self.get()[0]["ETag"]
+        self.post.title = "Changed post"
+        self.post.save_revision().publish()
+        response, _ = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Changed post")
+
+    def test_unrelated_changes_keep_etag(self):
+        etag = self.get()[0]["ETag"]
+        with translation.override("en"):
+            index_url = self.index.url
+        index_etag = self.client.get(index_url)["ETag"]
+
+        other_post = BlogPage(
+            title="Second post", date=datetime.date(2024, 1, 2), intro="Intro"
+        )
+        self.index.add_child(instance=other_post)
+        other_post.save_revision().publish()
+        self.assertEqual(self.get(if_none_match=etag)[0].status_code, 304)
+        # The index lists its children
+        response = self.client.get(index_url, headers={"if_none_match": index_etag})
+        self.assertContains(response, "Second post")
+
+    def test_menu_change_changes_etag(self):
+        etag = self.get()[0]["ETag"]
+        MainNavigation.objects.create(name="Blog", menu_page=self.index)
+        self.assertEqual(self.get(if_none_match=etag)[0].status_code, 200)
+
+    @override_settings(PAGE_CACHE="pagecache")
+    def test_cached_pages_are_revalidated_without_queries(self):
+        get_page_cache().clear()
+        self.addCleanup(get_page_cache().clear)
+        etag = self.get()[0]["ETag"]
+        response, queries = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(queries, 0)
+
+    def test_document_revalidation_is_a_single_query(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with override_settings(MEDIA_ROOT=media_root):
+            document = get_document_model().objects.create(
+                title="Document", file=ContentFile(b"Content", name="document.txt")
+            )
+            document._set_document_file_metadata()
+            document.save()
+            response = self.client.get(document.url)
+            etag = response["ETag"]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(
+                    document.url, headers={"if_none_match": etag}
+                )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 1)
+
+
+class PrerenderSiteTests(TestCase):
+    def setUp(self):
+        prerender_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, prerender_root)
+        settings_override = override_settings(
+            PRERENDER_ROOT=prerender_root, PRERENDER_SERVE=True, PAGE_CACHE=None
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.index = BlogIndexPage(title="Blog", slug="blog")
+        Site.objects.get(is_default_site=True).root_page.add_child(instance=self.index)
+        self.post = self.add_post("First post")
+        self.other_post = self.add_post("Second post")
+
+    def add_post(self, title):
+        post = BlogPage(title=title, date=datetime.date(2024, 1, 1), intro="Intro")
+        self.index.add_child(instance=post)
+        return post
+
+    def prerender(self):
+        stdout = io.StringIO()
+        call_command("prerender_site", workers=1, stdout=stdout)
+        return stdout.getvalue()
+
+    def get_path(self, page):
+        with translation.override("en"):
+            page_path = page.get_url_parts()[2]
+        return os.path.join(
+            settings.PRERENDER_ROOT, "_default", page_path[1:], "index.html"
+        )
+
+    def test_pages_are_rendered_and_served(self):
+        self.assertIn("Rendered 3 of 3 pages", self.prerender())
+        with open(self.get_path(self.post)) as f:
+            self.assertIn("First post", f.read())
+
+        with translation.override("en"):
+            url = self.post.url
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, "First post")
+
+    def test_media_files_are_copied_and_served(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        os.makedirs(os.path.join(media_root, "images"))
+        with open(os.path.join(media_root, "images", "photo.jpg"), "wb") as f:
+            f.write(b"Photo")
+
+        with override_settings(MEDIA_ROOT=media_root):
+            self.assertTrue(copy_media_file("_default", "images/photo.jpg"))
+            self.assertFalse(copy_media_file("_default", "images/photo.jpg"))
+        with self.assertNumQueries(0):
+            response = self.client.get("/media/images/photo.jpg")
+        self.assertEqual(b"".join(response.streaming_content), b"Photo")
+
+    def test_only_changed_pages_are_rendered_again(self):
+        self.prerender()
+        self.assertIn("Rendered 0 of 3 pages", self.prerender())
+
+        self.post.title = "Changed post"
+        self.post.save_revision().publish()
+        self.assertFalse(os.path.exists(self.get_path(self.post)))
+        self.assertFalse(os.path.exists(self.get_path(self.index)))
+        self.assertTrue(os.path.exists(self.get_path(self.other_post)))
+
+        self.assertIn("Rendered 2 of 3 pages", self.prerender())
+        with open(self.get_path(self.post)) as f:
+            self.assertIn("Changed post", f.read())
+
+    def test_removals_only_read_the_tag_index(self):
+        self.prerender()
+        with mock.patch("pagecache.prerender.load_manifest") as load_manifest:
+            invalidate_page(self.other_post)
+        load_manifest.assert_not_called()
+        self.assertFalse(os.path.exists(self.get_path(self.other_post)))
+        self.assertFalse(os.path.exists(self.get_path(self.index)))
+        self.assertTrue(os.path.exists(self.get_path(self.post)))
+
+        self.assertIn("Rendered 2 of 3 pages", self.prerender())
+        self.assertTrue(os.path.exists(self.get_path(self.other_post)))
+
+    def test_unpublished_pages_are_removed(self):
+        self.prerender()
+        self.other_post.unpublish()
+        self.prerender()
+        self.assertFalse(os.path.exists(self.get_path(self.other_post)))
+        with translation.override("en"):
+            self.assertEqual(self.client.get(self.other_post.url).status_code, 404)
+
+    def test_restricted_pages_are_removed(self):
+        self.prerender()
+        PageViewRestriction.objects.create(
+            page=self.index, restriction_type=PageViewRestriction.LOGIN
+        )
+        self.assertFalse(os.path.exists(self.get_path(self.index)))
+        self.assertFalse(os.path.exists(self.get_path(self.post)))
+        with translation.override("en"):
+            self.assertEqual(self.client.get(self.post.url).status_code, 302)
+
+        self.assertIn("Rendered 0 of 0 pages", self.prerender())
+        self.assertFalse(os.path.exists(self.get_path(self.post)))
+
+    def test_removals_during_a_run_are_kept(self):
+        self.prerender()
+        self.post.title = "Changed post"
+        self.post.save_revision().publish()
+
+        def render_page_and_change_other_post(page_id):
+            # Another process changes a page while the command runs
+            invalidate_page(self.other_post)
+            return render_page(page_id)
+
+        with mock.patch(
+            "pagecache.management.commands.prerender_site.render_page",
+            render_page_and_change_other_post,
+        ):
+            self.prerender()
+        self.assertFalse(os.path.exists(self.get_path(self.other_post)))
+        self.assertNotIn(
+            self.other_post.pk,
+            [entry["page_id"] for entry in load_manifest()["pages"].values()],
+        )
+        self.prerender()
+        self.assertTrue(os.path.exists(self.get_path(self.other_post)))
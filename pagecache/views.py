@@ -0,0 +1,20 @@
+import os
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+from django.views import static
+from django.views.decorators.http import etag
+
+
+def media_etag(request, path, document_root=None, show_indexes=False):
+    # Like the ones web servers give static files: the file's mtime and size
+    try:
+        stat = os.stat(safe_join(document_root, path))
+    except (OSError, SuspiciousFileOperation):
+        return None
+    return '"%x-%x"' % (int(stat.st_mtime), stat.st_size)
+
+
+# Serves media files (e.g. image renditions) with an ETag, as well as the
+# Last-Modified header django.views.static.serve already gives them
+serve_media = etag(media_etag)(static.serve)
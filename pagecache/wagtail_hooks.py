@@ -0,0 +1,76 @@
+import time
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from wagtail import hooks
+from wagtail.models import Site
+
+from pagecache.cache import get_cache_url, is_fresh
+from pagecache.conditional import (
+    get_page_validators,
+    get_response_tags,
+    set_response_tags,
+)
+from pagecache.dependencies import (
+    add_model_dependency,
+    add_object_dependency,
+    record_dependencies,
+)
+
+
+@hooks.register("before_serve_page")
+def remember_served_page(page, request, serve_args, serve_kwargs):
+    # Tells PageCacheMiddleware the response is a page
+    request.pagecache_page = page
+
+
+def set_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+
+
+@hooks.register("on_serve_page")
+def serve_page_conditionally(next_serve_page):
+    """
+    Answers revalidation requests for a page with a 304 before rendering it,
+    and adds the validators to the responses that are rendered.
+    """
+
+    def serve_page(page, request, serve_args, serve_kwargs):
+        if request.method not in ("GET", "HEAD") or getattr(
+            request, "is_preview", False
+        ):
+            return next_serve_page(page, request, serve_args, serve_kwargs)
+
+        # The objects the URL's response was last rendered from
+        url = get_cache_url(request)
+        tags = get_response_tags(url)
+        if tags is not None:
+            etag, last_modified = get_page_validators(page, request, tags)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is not None:
+                set_validators(response, etag, last_modified)
+                return response
+
+        rendered_at = time.time()
+        with record_dependencies() as tags:
+            add_object_dependency(type(page), page.pk)
+            # Pages are cached by host, which a new or changed site may take over
+            add_model_dependency(Site)
+            response = next_serve_page(page, request, serve_args, serve_kwargs)
+            # Template responses are otherwise rendered after this returns
+            if hasattr(response, "render"):
+                response.render()
+        if response.status_code == 200 and not response.has_header("ETag"):
+            # Unless they changed while it was rendered
+            if is_fresh(tags, rendered_at, default=0):
+                set_response_tags(url, tags)
+                set_validators(response, *get_page_validators(page, request, tags))
+            # Revalidate before each use, as the page changes when it's published
+            patch_cache_control(response, no_cache=True)
+        return response
+
+    return serve_page
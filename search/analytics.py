@@ -0,0 +1,123 @@
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections, connection, models, transaction
+from django.utils import timezone
+
+from wagtail.contrib.search_promotions.models import Query, QueryDailyHits
+from wagtail.search.utils import normalise_query_string
+
+logger = logging.getLogger(__name__)
+
+
+class QueryHitBuffer:
+    """
+    Counts search query hits in memory, and adds them to the search promotions
+    Query and QueryDailyHits tables in bulk.
+
+    The counts are flushed every SEARCH_QUERY_LOG_FLUSH_INTERVAL seconds by a
+    background thread, as soon as SEARCH_QUERY_LOG_FLUSH_COUNT hits are
+    waiting, and when the process exits.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hits = Counter()
+        self._pending = 0
+        self._thread = None
+        self._wake = threading.Event()
+
+    def record(self, query_string):
+        query_string = normalise_query_string(query_string)
+        if not query_string:
+            return
+
+        with self._lock:
+            self._hits[query_string, timezone.now().date()] += 1
+            self._pending += 1
+            flush_now = self._pending >= settings.SEARCH_QUERY_LOG_FLUSH_COUNT
+            if settings.SEARCH_QUERY_LOG_FLUSH_INTERVAL and self._thread is None:
+                self._thread = threading.Thread(
+                    target=self.run, name="search-query-log", daemon=True
+                )
+                self._thread.start()
+
+        if flush_now:
+            if self._thread is not None:
+                self._wake.set()
+            else:
+                self.flush()
+
+    def run(self):
+        while True:
+            self._wake.wait(settings.SEARCH_QUERY_LOG_FLUSH_INTERVAL)
+            self._wake.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        with self._lock:
+            hits, self._hits = self._hits, Counter()
+            self._pending = 0
+        if not hits:
+            return
+
+        try:
+            save_hits(hits)
+        except Exception:
+            logger.exception("Could not save %d search query hits", sum(hits.values()))
+            # Keep them for the next flush
+            with self._lock:
+                self._hits.update(hits)
+                self._pending += sum(hits.values())
+
+
+def save_hits(hits):
+    """
+    Adds {(query string, date): hits} counts to the database, with one query
+    for the queries and one for their daily hits.
+    """
+    with transaction.atomic():
+        query_strings = {query_string for query_string, date in hits}
+        Query.objects.bulk_create(
+            [Query(query_string=query_string) for query_string in query_strings],
+            ignore_conflicts=True,
+        )
+        query_ids = dict(
+            Query.objects.filter(query_string__in=query_strings).values_list(
+                "query_string", "pk"
+            )
+        )
+        rows = [
+            (query_ids[query_string], date, count)
+            for (query_string, date), count in hits.items()
+        ]
+
+        if connection.vendor in ("postgresql", "sqlite"):
+            # Add to the existing counts in the same statement, so concurrent
+            # flushes from other processes aren't lost
+            table = connection.ops.quote_name(QueryDailyHits._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    "INSERT INTO %s (query_id, date, hits) VALUES (%%s, %%s, %%s) "
+                    "ON CONFLICT (query_id, date) DO UPDATE "
+                    "SET hits = %s.hits + excluded.hits" % (table, table),
+                    rows,
+                )
+        else:
+            for query_id, date, count in rows:
+                daily_hits, created = QueryDailyHits.objects.get_or_create(
+                    query_id=query_id, date=date
+                )
+                QueryDailyHits.objects.filter(pk=daily_hits.pk).update(
+                    hits=models.F("hits") + count
+                )
+
+
+query_hits = QueryHitBuffer()
+atexit.register(query_hits.flush)
@@ -0,0 +1,171 @@
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, transaction
+from django.utils import timezone
+
+from wagtail.blocks import (
+    CharBlock,
+    ListBlock,
+    RichTextBlock,
+    StreamBlock,
+    StructBlock,
+    TextBlock,
+)
+from wagtail.rich_text import get_text_for_indexing
+from wagtail.search.backends import get_search_backends
+
+from search.models import IndexQueueEntry
+
+logger = logging.getLogger(__name__)
+
+
+def iter_block_text(block, value):
+    """
+    Yields the text of a block's raw (JSON-serialisable) value, one string at a
+    time and without building the block values (so choosers don't load their
+    objects).
+    """
+    if not value:
+        return
+    if isinstance(block, RichTextBlock):
+        yield get_text_for_indexing(value)
+    elif isinstance(block, (CharBlock, TextBlock)):
+        yield value
+    elif isinstance(block, StreamBlock):
+        for child in value:
+            child_block = block.child_blocks.get(child["type"])
+            if child_block is not None:
+                yield from iter_block_text(child_block, child["value"])
+    elif isinstance(block, StructBlock):
+        for name, child_block in block.child_blocks.items():
+            yield from iter_block_text(child_block, value.get(name))
+    elif isinstance(block, ListBlock):
+        for item in value:
+            # list items are stored as {"type": "item", "value": ..., "id": ...}
+            if isinstance(item, dict) and item.get("type") == "item":
+                item = item.get("value")
+            yield from iter_block_text(block.child_block, item)
+
+
+def queue_for_indexing(objects):
+    """
+    Records objects to be indexed by process_index_queue, and has them
+    processed once the current transaction is committed.
+    """
+    now = timezone.now()
+    entries = [
+        IndexQueueEntry(
+            content_type=ContentType.objects.get_for_model(obj),
+            object_id=str(obj.pk),
+            queued_at=now,
+        )
+        for obj in objects
+    ]
+    if not entries:
+        return
+    IndexQueueEntry.objects.bulk_create(
+        entries,
+        update_conflicts=True,
+        unique_fields=["content_type", "object_id"],
+        update_fields=["queued_at"],
+    )
+    transaction.on_commit(index_queue_worker.wake)
+
+
+def process_index_queue(batch_size=None):
+    """
+    Indexes the queued objects, batch_size at a time, and returns how many
+    were indexed.
+
+    Entries are removed once their object is indexed, unless the object was
+    queued again in the meantime. Entries that fail are kept for the next run.
+    """
+    batch_size = batch_size or settings.SEARCH_INDEX_QUEUE_BATCH_SIZE
+    backends = list(get_search_backends(with_auto_update=True))
+    last_id = 0
+    indexed = 0
+    while True:
+        started = timezone.now()
+        entries = list(
+            IndexQueueEntry.objects.filter(pk__gt=last_id).order_by("pk")[:batch_size]
+        )
+        if not entries:
+            return indexed
+        last_id = entries[-1].pk
+
+        object_ids = defaultdict(list)
+        for entry in entries:
+            object_ids[entry.content_type_id].append(entry.object_id)
+
+        done = []
+        for content_type_id, ids in object_ids.items():
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+            try:
+                # Deleted objects are removed from the index on delete
+                objects = list(model.get_indexed_objects().filter(pk__in=ids))
+                if objects:
+                    for backend in backends:
+                        backend.add_bulk(model, objects)
+            except Exception:
+                logger.exception(
+                    "Could not index %d queued %s objects", len(ids), model.__name__
+                )
+            else:
+                done.append(content_type_id)
+                indexed += len(objects)
+
+        IndexQueueEntry.objects.filter(
+            pk__in=[entry.pk for entry in entries],
+            content_type_id__in=done,
+            queued_at__lte=started,
+        ).delete()
+
+
+class IndexQueueWorker:
+    """
+    Drains the index queue on a background thread, woken after each commit
+    that queues objects.
+
+    With SEARCH_INDEX_WORKER set to "inline", the queue is drained in the
+    committing thread instead, and with None it's left to the
+    process_index_queue management command.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pending = False
+
+    def wake(self):
+        if settings.SEARCH_INDEX_WORKER == "inline":
+            process_index_queue()
+        elif settings.SEARCH_INDEX_WORKER == "thread":
+            with self._lock:
+                self._pending = True
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self.run, name="search-index-queue", daemon=True
+                    )
+                    self._thread.start()
+
+    def run(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._pending:
+                        self._thread = None
+                        return
+                    self._pending = False
+                try:
+                    process_index_queue()
+                except Exception:
+                    logger.exception("Could not process the search index queue")
+        finally:
+            connections.close_all()
+
+
+index_queue_worker = IndexQueueWorker()
@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from search.indexing import process_index_queue
+
+
+class Command(BaseCommand):
+    help = "Index the objects queued for search indexing"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.SEARCH_INDEX_QUEUE_BATCH_SIZE,
+            help="Number of queued objects indexed at once",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            help="Keep running, checking the queue every INTERVAL seconds",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            indexed = process_index_queue(options["batch_size"])
+            if indexed or not options["interval"]:
+                self.stdout.write("Indexed %d objects" % indexed)
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from wagtail.models import Page
+from wagtail.search.backends import get_search_backend
+from wagtail.search.index import get_indexed_models
+from wagtail.search.management.commands import update_index
+
+
+def parse_since(value):
+    since = parse_datetime(value)
+    if since is None and parse_date(value) is not None:
+        since = parse_datetime(value + "T00:00")
+    if since is None:
+        raise CommandError("Invalid --since date or time: %s" % value)
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+class Command(update_index.Command):
+    """
+    Wagtail's update_index, with a --since option to reindex only the pages
+    changed since a given time rather than rebuilding the whole index.
+    """
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--since",
+            help="Only reindex the pages saved or published since this date or "
+            "time (e.g. 2024-05-01 or 2024-05-01T12:00), keeping the rest of "
+            "the index",
+        )
+
+    def handle(self, **options):
+        if not options["since"]:
+            return super().handle(**options)
+
+        self.verbosity = options["verbosity"]
+        since = parse_since(options["since"])
+        if options["backend_name"]:
+            backend_names = [options["backend_name"]]
+        else:
+            backend_names = getattr(settings, "WAGTAILSEARCH_BACKENDS", {"default": {}})
+
+        for backend_name in backend_names:
+            self.update_backend_since(backend_name, since, options["chunk_size"])
+
+    def update_backend_since(self, backend_name, since, chunk_size):
+        backend = get_search_backend(backend_name)
+        changed = Q(latest_revision_created_at__gte=since) | Q(
+            last_published_at__gte=since
+        )
+
+        # Only pages record when they were changed. Deleted pages are taken out
+        # of the index when they're deleted.
+        object_count = 0
+        for model in get_indexed_models():
+            if not issubclass(model, Page):
+                continue
+
+            self.write(
+                "{}: {}.{} ".format(
+                    backend_name, model._meta.app_label, model.__name__
+                ).ljust(35),
+                ending="",
+            )
+            for chunk in self.print_iter_progress(
+                self.queryset_chunks(
+                    model.get_indexed_objects().filter(changed).order_by("pk"),
+                    chunk_size,
+                )
+            ):
+                backend.add_bulk(model, chunk)
+                object_count += len(chunk)
+            self.print_newline()
+
+        self.write(
+            "%s: indexed %d objects changed since %s"
+            % (backend_name, object_count, since.isoformat())
+        )
@@ -0,0 +1,28 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+
+class IndexQueueEntry(models.Model):
+    """
+    An object waiting to be (re)indexed by search.indexing.process_index_queue.
+
+    Queueing an object again only updates queued_at, so it's indexed once
+    however many times it was saved in the meantime.
+    """
+
+    content_type = models.ForeignKey(
+        ContentType, on_delete=models.CASCADE, related_name="+"
+    )
+    object_id = models.CharField(max_length=255)
+    queued_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["content_type", "object_id"], name="unique_index_queue_entry"
+            )
+        ]
+        verbose_name_plural = "index queue entries"
+
+    def __str__(self):
+        return "%s %s" % (self.content_type, self.object_id)
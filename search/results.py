@@ -0,0 +1,154 @@
+import hashlib
+import math
+
+from django.conf import settings
+from django.core.cache import caches
+
+from wagtail.models import Page
+
+from pagecache.conditional import get_content_changed
+
+
+def get_search_cache():
+    return caches[settings.SEARCH_CACHE]
+
+
+def normalize_query(query):
+    """
+    Folds queries that only differ in case or whitespace together, so they
+    share cached results.
+    """
+    return " ".join(query.split()).casefold()
+
+
+def search_results_cache_key(query, locale_id, page_number):
+    # Queries are user input, so hash them into a key that's safe for any backend.
+    # Results cached before the last publish (see pagecache.conditional) are left
+    # to expire.
+    query_hash = hashlib.md5(query.encode()).hexdigest()
+    return "search:results:%s:%s:%s:%s" % (
+        query_hash,
+        locale_id,
+        page_number,
+        get_content_changed(),
+    )
+
+
+class SearchResultsPage:
+    """
+    A page of search results, with the navigation attributes of a Django
+    paginator's Page but without a full count of the results.
+
+    count is None when the results weren't counted, and is_count_capped is
+    True when there are more than count results.
+    """
+
+    def __init__(self, object_list, number, has_next, count=None, is_count_capped=False):
+        self.object_list = object_list
+        self.number = number
+        self._has_next = has_next
+        self.count = count
+        self.is_count_capped = is_count_capped
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self.number > 1
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+
+def search_pages(query, locale, page_number=1):
+    """
+    Returns a page of the live pages in a locale matching a query, as specific
+    pages, with the result ids cached.
+    """
+    query = normalize_query(query)
+    key = search_results_cache_key(query, locale.pk, page_number)
+    cache = get_search_cache()
+
+    results = cache.get(key)
+    if results is None:
+        pages, results = run_search(query, locale, page_number)
+        cache.set(
+            key,
+            {**results, "ids": [page.pk for page in pages]},
+            settings.SEARCH_CACHE_TIMEOUT,
+        )
+    else:
+        pages = get_pages(results.pop("ids"))
+
+    # Past the last page, when it's known, it's the last page that's shown
+    number = results.pop("number", page_number)
+    return SearchResultsPage(pages, number, **results)
+
+
+def run_search(query, locale, page_number):
+    live_pages = Page.objects.live().filter(locale=locale)
+    search_results = live_pages.search(query)
+    # The same results with only their ids loaded, for counting
+    search_ids = live_pages.only("pk").search(query)
+    per_page = settings.SEARCH_RESULTS_PER_PAGE
+    count_limit = settings.SEARCH_RESULTS_COUNT_LIMIT
+    offset = (page_number - 1) * per_page
+
+    if count_limit is not None and offset + per_page <= count_limit:
+        # The ids of one result more than the limit both count the results up to
+        # the limit and give the requested page, which is then loaded by id
+        page_ids = [page.pk for page in search_ids[: count_limit + 1]]
+        results = {
+            "has_next": len(page_ids) > offset + per_page,
+            "count": min(len(page_ids), count_limit),
+            "is_count_capped": len(page_ids) > count_limit,
+        }
+        pages = get_pages(page_ids[offset : offset + per_page])
+    else:
+        # One extra result tells whether there is a next page
+        pages = list(search_results[offset : offset + per_page + 1])
+        results = {"has_next": len(pages) > per_page}
+        pages = pages[:per_page]
+        if count_limit is None:
+            results["count"] = search_results.count()
+        elif not pages and page_number > 1:
+            # Past the last page: the count up to the limit may tell which it is
+            results["count"] = len(search_ids[: count_limit + 1])
+            results["is_count_capped"] = results["count"] > count_limit
+            results["count"] = min(results["count"], count_limit)
+        else:
+            results["count"] = count_limit
+            results["is_count_capped"] = True
+
+    last_page_number = math.ceil(results["count"] / per_page)
+    if (
+        not pages
+        and not results.get("is_count_capped")
+        and 0 < last_page_number < page_number
+    ):
+        # The last page is shown instead
+        results["number"] = last_page_number
+        offset = (last_page_number - 1) * per_page
+        pages = list(search_results[offset : offset + per_page])
+
+    # Results from the search are generic pages. Their specific pages, with only
+    # the generic fields loaded, don't need any further queries.
+    return [page.specific_deferred for page in pages], results
+
+
+def get_pages(page_ids):
+    """
+    Returns the live pages with the given ids as specific pages, in order and
+    with one query.
+    """
+    pages = Page.objects.live().filter(pk__in=page_ids).specific(defer=True).in_bulk()
+    return [pages[page_id] for page_id in page_ids if page_id in pages]
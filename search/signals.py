@@ -0,0 +1,64 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from wagtail.models import Page, PageViewRestriction
+from wagtail.search import index
+from wagtail.signals import (
+    page_published,
+    page_slug_changed,
+    page_unpublished,
+    post_page_move,
+)
+
+from blog.models import BlogPage
+from search.indexing import queue_for_indexing
+from search.suggest import suggestion_index
+
+
+@receiver(page_published)
+def update_suggestions_on_publish(sender, instance, **kwargs):
+    suggestion_index.update_page(instance)
+
+
+@receiver(page_unpublished)
+def remove_suggestions_on_unpublish(sender, instance, **kwargs):
+    suggestion_index.remove_page(instance)
+
+
+@receiver(post_delete)
+def remove_suggestions_on_delete(sender, instance, **kwargs):
+    if isinstance(instance, Page):
+        suggestion_index.remove_page(instance)
+
+
+@receiver(post_page_move)
+@receiver(page_slug_changed)
+def reset_suggestions_on_url_change(sender, **kwargs):
+    # The URLs of all the pages below the page have changed too
+    suggestion_index.reset()
+
+
+@receiver(post_save, sender=PageViewRestriction)
+@receiver(post_delete, sender=PageViewRestriction)
+def reset_suggestions_on_restriction_change(sender, **kwargs):
+    # Whether the pages below the page are shown has changed too
+    suggestion_index.reset()
+
+
+# Only published content is indexed: drafts and revisions are saved without
+# changing what visitors can find
+@receiver(page_published, sender=BlogPage)
+@receiver(page_unpublished, sender=BlogPage)
+def queue_post_for_indexing(sender, instance, **kwargs):
+    queue_for_indexing([instance])
+
+
+@receiver(post_delete, sender=BlogPage)
+def remove_post_from_index(sender, instance, **kwargs):
+    index.remove_object(instance)
+
+
+@receiver(post_page_move)
+def queue_moved_posts_for_indexing(sender, instance, **kwargs):
+    # The paths of the pages below the page have changed too
+    queue_for_indexing(BlogPage.objects.descendant_of(instance, inclusive=True))
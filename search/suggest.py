@@ -0,0 +1,419 @@
+import bisect
+import logging
+import re
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+from django.db import connections, transaction
+from django.utils import translation
+
+from wagtail.coreutils import get_supported_content_language_variant
+from wagtail.models import Locale, Page
+
+from blog.models import BlogPage
+
+# Each locale's changes are logged in the shared cache, numbered by its
+# generation, for the other processes to apply to their indexes
+GENERATION_CACHE_KEY = "search:suggest:generation:%s"
+CHANGE_CACHE_KEY = "search:suggest:change:%s:%d"
+CHANGE_TIMEOUT = 60 * 60
+# A process further behind than this rebuilds the locale's index instead
+MAX_CHANGES = 1000
+# When the shared cache can't number the changes, the time of each locale's
+# last change, for the other processes to rebuild their indexes after it
+CHANGED_CACHE_KEY = "search:suggest:changed:%s"
+
+logger = logging.getLogger(__name__)
+
+
+def has_atomic_incr(cache):
+    # The other backends get the value and set it again
+    return isinstance(cache, (RedisCache, BaseMemcachedCache, LocMemCache))
+
+
+def tokenize(text):
+    return {sys.intern(term) for term in re.findall(r"\w+", text.casefold())}
+
+
+class LocaleSuggestions:
+    """
+    A prefix index of the title and intro terms of the live pages in a locale.
+
+    The distinct terms are kept sorted, so the terms starting with a prefix
+    are found with a binary search.
+    """
+
+    def __init__(self):
+        self.terms = []
+        self.postings = {}
+        self.pages = {}
+
+    def add(self, page_id, title, url, text_terms):
+        self.remove(page_id)
+        title_terms = tokenize(title)
+        terms = title_terms | text_terms
+        self.pages[page_id] = (title, url, title_terms, terms)
+        for term in terms:
+            if term not in self.postings:
+                self.postings[term] = set()
+                bisect.insort(self.terms, term)
+            self.postings[term].add(page_id)
+
+    def remove(self, page_id):
+        if page_id not in self.pages:
+            return
+        for term in self.pages.pop(page_id)[3]:
+            self.postings[term].discard(page_id)
+            if not self.postings[term]:
+                del self.postings[term]
+                del self.terms[bisect.bisect_left(self.terms, term)]
+
+    def match_prefix(self, prefix):
+        page_ids = set()
+        for i in range(bisect.bisect_left(self.terms, prefix), len(self.terms)):
+            if not self.terms[i].startswith(prefix):
+                break
+            page_ids.update(self.postings[self.terms[i]])
+        return page_ids
+
+    def suggest(self, query, limit):
+        prefixes = re.findall(r"\w+", query.casefold())
+        if not prefixes:
+            return []
+
+        # Every word of the query has to start a term of the page
+        page_ids = self.match_prefix(prefixes[0])
+        for prefix in prefixes[1:]:
+            if not page_ids:
+                break
+            page_ids &= self.match_prefix(prefix)
+
+        def rank(page_id):
+            # Pages matching in their title first, then by title
+            title, url, title_terms, terms = self.pages[page_id]
+            title_matches = sum(
+                any(term.startswith(prefix) for term in title_terms)
+                for prefix in prefixes
+            )
+            return (-title_matches, title.casefold(), page_id)
+
+        return [
+            {"title": self.pages[page_id][0], "url": self.pages[page_id][1]}
+            for page_id in sorted(page_ids, key=rank)[:limit]
+        ]
+
+
+class SuggestionIndex:
+    """
+    Search suggestions for the live public pages of every locale, held in
+    memory.
+
+    The index is built from the database on first use, and then kept up to
+    date by the publish and unpublish signals, once their transaction is
+    committed. Each change is also logged in the shared cache, and the other
+    processes apply the changes logged since they last checked, at most every
+    SEARCH_SUGGEST_CHECK_INTERVAL seconds.
+
+    A locale whose changes can't all be applied (they were evicted from the
+    cache, or are too many) is rebuilt from the database on a background
+    thread, or with SEARCH_SUGGEST_REBUILD_WORKER set to "inline", in the
+    requesting thread. The old index is served meanwhile.
+
+    The changes are numbered with the shared cache's incr(), so two processes
+    can't log a change under the same number. With a cache whose incr() isn't
+    atomic (e.g. file-based), only the time of each locale's last change is
+    shared, and the other processes rebuild the locale after it instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._locales = None
+        self._generations = {}
+        self._missing = {}
+        self._built_at = {}
+        self._rebuilding = set()
+        self._checked_at = 0
+
+    def get_cache(self):
+        # Read past the in-process tier (see myblog.cache), so a change logged
+        # by one process is seen by the others at once
+        cache = caches[settings.SEARCH_CACHE]
+        return getattr(cache, "shared", cache)
+
+    def suggest(self, query, language_code, limit=None):
+        limit = limit or settings.SEARCH_SUGGEST_LIMIT
+        if len(query.strip()) < settings.SEARCH_SUGGEST_MIN_LENGTH:
+            return []
+
+        if self._locales is None:
+            # There's no index to serve until the first build
+            with self._build_lock:
+                if self._locales is None:
+                    self.build()
+        with self._lock:
+            stale = self.apply_logged_changes()
+            suggestions = self._locales.get(language_code)
+            results = [] if suggestions is None else suggestions.suggest(query, limit)
+        if stale:
+            self.schedule_rebuild(stale)
+        return results
+
+    def apply_logged_changes(self):
+        """
+        Applies the changes other processes logged since the last check, and
+        returns the locales that have to be rebuilt instead.
+        """
+        now = time.monotonic()
+        if now - self._checked_at < settings.SEARCH_SUGGEST_CHECK_INTERVAL:
+            return set()
+        self._checked_at = now
+
+        cache = self.get_cache()
+        language_codes = [language_code for language_code, _ in settings.LANGUAGES]
+        if not has_atomic_incr(cache):
+            changed = cache.get_many(
+                [CHANGED_CACHE_KEY % language_code for language_code in language_codes]
+            )
+            return {
+                language_code
+                for language_code in language_codes
+                if changed.get(CHANGED_CACHE_KEY % language_code, 0)
+                > self._built_at.get(language_code, 0)
+            } - self._rebuilding
+
+        logged = cache.get_many(
+            [GENERATION_CACHE_KEY % language_code for language_code in language_codes]
+        )
+        stale = set()
+        for language_code in language_codes:
+            generation = logged.get(GENERATION_CACHE_KEY % language_code, 0)
+            current = self._generations.get(language_code, 0)
+            if generation == current:
+                continue
+            if generation < current or generation - current > MAX_CHANGES:
+                # The log was lost, or is too long to catch up with
+                stale.add(language_code)
+                continue
+
+            keys = [
+                CHANGE_CACHE_KEY % (language_code, change_generation)
+                for change_generation in range(current + 1, generation + 1)
+            ]
+            changes = cache.get_many(keys)
+            for key in keys:
+                change = changes.get(key)
+                if change is None:
+                    # Logged but not written yet, or written and evicted
+                    if self._missing.get(language_code) == key:
+                        stale.add(language_code)
+                    self._missing[language_code] = key
+                    break
+                if change["action"] == "reset":
+                    stale.add(language_code)
+                    break
+                self.apply_change(change)
+                self._generations[language_code] += 1
+        return stale - self._rebuilding
+
+    def apply_change(self, change):
+        language_code = change["language_code"]
+        self._generations.setdefault(language_code, 0)
+        if self._locales is None:
+            return
+        suggestions = self._locales.setdefault(language_code, LocaleSuggestions())
+        if change["action"] == "remove":
+            suggestions.remove(change["page_id"])
+        else:
+            suggestions.add(
+                change["page_id"],
+                change["title"],
+                change["url"],
+                {sys.intern(term) for term in change["text_terms"]},
+            )
+
+    def schedule_rebuild(self, language_codes):
+        with self._lock:
+            language_codes = set(language_codes) - self._rebuilding
+            self._rebuilding |= language_codes
+        if not language_codes:
+            return
+        if settings.SEARCH_SUGGEST_REBUILD_WORKER == "inline":
+            self.rebuild(language_codes)
+        else:
+            threading.Thread(
+                target=self.rebuild,
+                args=(language_codes,),
+                name="search-suggest-rebuild",
+                daemon=True,
+            ).start()
+
+    def rebuild(self, language_codes):
+        try:
+            with self._build_lock:
+                self.build(language_codes)
+        except Exception:
+            logger.exception("Could not rebuild the search suggestions")
+        finally:
+            with self._lock:
+                self._rebuilding -= set(language_codes)
+            if settings.SEARCH_SUGGEST_REBUILD_WORKER != "inline":
+                connections.close_all()
+
+    def build(self, language_codes=None):
+        """
+        Builds the index of the given languages (by default, all of them) from
+        the database, and replaces the ones in use.
+        """
+        if language_codes is None:
+            language_codes = [language_code for language_code, _ in settings.LANGUAGES]
+        locales = list(Locale.objects.filter(language_code__in=language_codes))
+        # Changes logged from now on are applied after the build
+        built_at = time.time()
+        logged = self.get_cache().get_many(
+            [GENERATION_CACHE_KEY % language_code for language_code in language_codes]
+        )
+        intros = dict(
+            BlogPage.objects.live()
+            .public()
+            .filter(locale__in=locales)
+            .values_list("pk", "intro")
+        )
+        built = {}
+        for locale in locales:
+            suggestions = built[locale.language_code] = LocaleSuggestions()
+            # Page URLs are prefixed with the language they're rendered in
+            with translation.override(locale.language_code):
+                pages = Page.objects.live().public().filter(locale=locale, depth__gt=1)
+                for page in pages:
+                    suggestions.add(
+                        page.pk,
+                        page.title,
+                        page.get_url(),
+                        tokenize(intros.get(page.pk, "")),
+                    )
+
+        with self._lock:
+            if self._locales is None:
+                self._locales = {}
+            for language_code in language_codes:
+                # Empty for the languages without a locale (yet)
+                self._locales[language_code] = built.get(
+                    language_code, LocaleSuggestions()
+                )
+                self._generations[language_code] = logged.get(
+                    GENERATION_CACHE_KEY % language_code, 0
+                )
+                self._missing.pop(language_code, None)
+                self._built_at[language_code] = built_at
+            # Apply the changes logged during the build on next use
+            self._checked_at = 0
+
+    def update_page(self, page):
+        # Their titles and URLs aren't shown to visitors who can't see them
+        if not page.live or page.get_view_restrictions().exists():
+            self.remove_page(page)
+            return
+
+        language_code = page.locale.language_code
+        with translation.override(language_code):
+            url = page.get_url()
+        self.log_change(
+            {
+                "action": "add",
+                "language_code": language_code,
+                "page_id": page.pk,
+                "title": page.title,
+                "url": url,
+                "text_terms": sorted(
+                    tokenize(page.intro if isinstance(page, BlogPage) else "")
+                ),
+            }
+        )
+
+    def remove_page(self, page):
+        self.log_change(
+            {
+                "action": "remove",
+                "language_code": page.locale.language_code,
+                "page_id": page.pk,
+            }
+        )
+
+    def append_to_log(self, change):
+        """
+        Logs a change for the other processes, and returns its generation.
+        """
+        cache = self.get_cache()
+        if not has_atomic_incr(cache):
+            cache.set(CHANGED_CACHE_KEY % change["language_code"], time.time(), None)
+            return None
+
+        key = GENERATION_CACHE_KEY % change["language_code"]
+        cache.add(key, 0, None)
+        try:
+            generation = cache.incr(key)
+        except ValueError:
+            # Evicted meanwhile, which the other processes notice
+            return None
+        cache.set(
+            CHANGE_CACHE_KEY % (change["language_code"], generation),
+            change,
+            CHANGE_TIMEOUT,
+        )
+        return generation
+
+    def log_change(self, change):
+        """
+        Applies a change to this process's index, and logs it for the others,
+        once the current transaction is committed.
+        """
+
+        def apply_and_log():
+            generation = self.append_to_log(change)
+            with self._lock:
+                self.apply_change(change)
+                # Otherwise the changes logged since the last check are applied
+                # on next use, in order, this one again included
+                if generation == self._generations[change["language_code"]] + 1:
+                    self._generations[change["language_code"]] = generation
+
+        transaction.on_commit(apply_and_log)
+
+    def reset(self):
+        """
+        Rebuilds the index of every process from the database, e.g. after the
+        URLs of a subtree changed.
+        """
+
+        def log_reset():
+            for language_code, _ in settings.LANGUAGES:
+                self.append_to_log({"action": "reset", "language_code": language_code})
+            if self._locales is not None:
+                self.schedule_rebuild(list(self._locales))
+
+        transaction.on_commit(log_reset)
+
+
+suggestion_index = SuggestionIndex()
+
+
+def get_suggestions(query, language_code=None):
+    """
+    Returns up to SEARCH_SUGGEST_LIMIT {"title": ..., "url": ...} dicts for the
+    live pages whose title or intro has words starting with each word of the
+    query, in the given (by default, the active) language.
+    """
+    try:
+        language_code = get_supported_content_language_variant(
+            language_code or translation.get_language()
+        )
+    except LookupError:
+        language_code = get_supported_content_language_variant(settings.LANGUAGE_CODE)
+    return suggestion_index.suggest(query, language_code)
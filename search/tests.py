@@ -0,0 +1,379 @@
+import datetime
+import io
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import translation
+
+from wagtail.models import Page, PageViewRestriction, Site
+
+from wagtail.contrib.search_promotions.models import Query
+
+from blog.models import BlogIndexPage, BlogPage
+from myblog.testing import RenderBudgetTestCase
+from search.analytics import QueryHitBuffer, query_hits
+from search.indexing import process_index_queue
+from search.models import IndexQueueEntry
+from search.suggest import SuggestionIndex, suggestion_index
+
+
+@override_settings(
+    SEARCH_RESULTS_PER_PAGE=2,
+    SEARCH_RESULTS_COUNT_LIMIT=3,
+    SEARCH_INDEX_WORKER="inline",
+    SEARCH_QUERY_LOG_FLUSH_INTERVAL=None,
+)
+class SearchViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(query_hits.flush)
+        self.index = BlogIndexPage(title="Blog", slug="blog")
+        Site.objects.get(is_default_site=True).root_page.add_child(instance=self.index)
+
+    def add_posts(self, count, title="Wagtail post"):
+        # Published pages are added to the search index once the transaction is
+        # committed
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(count):
+                self.index.add_child(
+                    instance=BlogPage(
+                        title="%s %d" % (title, i),
+                        slug="%s-%d" % (title.lower().replace(" ", "-"), i),
+                        date=datetime.date(2024, 1, 1),
+                        intro="Intro",
+                        search_description="Description %d" % i,
+                    )
+                ).save_revision().publish()
+
+    def search(self, query, page=1):
+        with translation.override("en"):
+            url = reverse("search")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"query": query, "page": page})
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_results_are_specific_pages(self):
+        self.add_posts(2)
+        self.add_posts(1, title="Other")
+        response, _ = self.search("wagtail")
+        results = list(response.context["search_results"])
+        self.assertEqual(len(results), 2)
+        self.assertTrue(all(isinstance(result, BlogPage) for result in results))
+        self.assertContains(response, "Description 0")
+        self.assertContains(response, "2 results")
+
+    def test_count_is_capped(self):
+        self.add_posts(5)
+        response, _ = self.search("wagtail")
+        search_results = response.context["search_results"]
+        self.assertTrue(search_results.has_next())
+        self.assertContains(response, "More than 3 results")
+
+        # beyond the limit, pages are fetched without counting
+        response, _ = self.search("wagtail", page=3)
+        search_results = response.context["search_results"]
+        self.assertEqual(len(search_results), 1)
+        self.assertFalse(search_results.has_next())
+        self.assertTrue(search_results.has_previous())
+
+    def test_results_are_counted_by_id(self):
+        self.add_posts(5)
+        with CaptureQueriesContext(connection) as queries:
+            response, _ = self.search("wagtail")
+        self.assertContains(response, "More than 3 results")
+        # The results up to the limit are counted without loading their rows
+        counting = [query["sql"] for query in queries if "LIMIT 4" in query["sql"]]
+        self.assertEqual(len(counting), 1)
+        self.assertNotIn('"title"', counting[0])
+
+    def test_cached_results_are_dropped_on_publish(self):
+        self.add_posts(1)
+        self.assertContains(self.search("wagtail")[0], "1 result")
+        self.add_posts(1, title="Wagtail new")
+        self.assertContains(self.search("wagtail")[0], "2 results")
+
+    def test_pages_past_the_last(self):
+        self.add_posts(3)
+        # The last page, known from the count, is shown instead
+        response, _ = self.search("wagtail", page=5)
+        search_results = response.context["search_results"]
+        self.assertEqual(search_results.number, 2)
+        self.assertEqual(
+            [result.title for result in search_results], ["Wagtail post 2"]
+        )
+        self.assertNotContains(response, "No results found")
+
+        # Beyond the count limit, the last page isn't known
+        self.add_posts(2, title="Wagtail other")
+        response, _ = self.search("wagtail", page=9)
+        self.assertContains(response, "No more results")
+        self.assertNotContains(response, "No results found")
+
+    @override_settings(SEARCH_RESULTS_COUNT_LIMIT=None)
+    def test_exact_count(self):
+        self.add_posts(5)
+        response, _ = self.search("wagtail", page=3)
+        self.assertContains(response, "5 results")
+
+    def test_normalised_queries_share_cached_results(self):
+        self.add_posts(2)
+        _, uncached_queries = self.search("wagtail")
+        response, cached_queries = self.search("  WAGTAIL ")
+        results = list(response.context["search_results"])
+        self.assertEqual(
+            [result.title for result in results], ["Wagtail post 0", "Wagtail post 1"]
+        )
+        self.assertTrue(all(isinstance(result, BlogPage) for result in results))
+        self.assertLess(cached_queries, uncached_queries)
+
+
+@override_settings(
+    SEARCH_SUGGEST_CHECK_INTERVAL=0,
+    SEARCH_SUGGEST_REBUILD_WORKER="inline",
+    SEARCH_INDEX_WORKER=None,
+)
+class SearchSuggestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        suggestion_index.build()
+        self.index = BlogIndexPage(title="Blog", slug="blog")
+        Site.objects.get(is_default_site=True).root_page.add_child(instance=self.index)
+        self.post = self.add_post("Caching pages", "How to make Django fast")
+        self.add_post("Django images", "Renditions and formats")
+
+    def add_post(self, title, intro):
+        post = BlogPage(title=title, date=datetime.date(2024, 1, 1), intro=intro)
+        self.index.add_child(instance=post)
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save_revision().publish()
+        return post
+
+    def suggest(self, query):
+        with translation.override("en"):
+            url = reverse("search_suggest")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"query": query})
+        self.assertEqual(response.status_code, 200)
+        titles = [suggestion["title"] for suggestion in response.json()["suggestions"]]
+        return titles, len(queries)
+
+    def test_suggests_by_prefix_without_queries(self):
+        # Pages matching in their title come first
+        self.assertEqual(self.suggest("dja")[0], ["Django images", "Caching pages"])
+        self.assertEqual(self.suggest("django FA"), (["Caching pages"], 0))
+        self.assertEqual(self.suggest("w"), ([], 0))
+
+    def test_suggestion_urls(self):
+        with translation.override("en"):
+            url = reverse("search_suggest")
+            self.assertEqual(
+                self.client.get(url, {"query": "caching"}).json(),
+                {"suggestions": [{"title": "Caching pages", "url": self.post.url}]},
+            )
+
+    def test_updated_on_publish_and_unpublish(self):
+        self.suggest("dja")
+        self.post.title = "Caching Django"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.save_revision().publish()
+        self.assertEqual(self.suggest("caching dja"), (["Caching Django"], 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.unpublish()
+        self.assertEqual(self.suggest("caching"), ([], 0))
+        self.add_post("Django caching", "Intro")
+        self.assertEqual(self.suggest("caching"), (["Django caching"], 0))
+
+    def test_other_processes_apply_changes_without_queries(self):
+        other_process_index = SuggestionIndex()
+        other_process_index.build()
+        self.post.title = "Caching Django"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.save_revision().publish()
+        self.add_post("Django caching", "Intro")
+
+        with self.assertNumQueries(0):
+            suggestions = other_process_index.suggest("caching", "en")
+        self.assertEqual(
+            [suggestion["title"] for suggestion in suggestions],
+            ["Caching Django", "Django caching"],
+        )
+
+    def test_lost_changes_rebuild_in_background(self):
+        other_process_index = SuggestionIndex()
+        other_process_index.build()
+        self.add_post("Django caching", "Intro")
+        other_process_index.suggest("caching", "en")
+        cache.clear()
+        self.add_post("Caching again", "Intro")
+
+        # The old index is served until the rebuild is done
+        with mock.patch.object(other_process_index, "schedule_rebuild") as rebuild:
+            with self.assertNumQueries(0):
+                suggestions = other_process_index.suggest("caching", "en")
+        rebuild.assert_called_once_with({"en"})
+        self.assertEqual(
+            [suggestion["title"] for suggestion in suggestions],
+            ["Caching pages", "Django caching"],
+        )
+
+        other_process_index.schedule_rebuild({"en"})
+        suggestions = other_process_index.suggest("caching", "en")
+        self.assertEqual(
+            [suggestion["title"] for suggestion in suggestions],
+            ["Caching again", "Caching pages", "Django caching"],
+        )
+
+    def test_other_processes_rebuild_without_atomic_incr(self):
+        # e.g. a file-based cache
+        with mock.patch("search.suggest.has_atomic_incr", return_value=False):
+            other_process_index = SuggestionIndex()
+            other_process_index.build()
+            self.assertEqual(len(other_process_index.suggest("caching", "en")), 1)
+            self.add_post("Django caching", "Intro")
+            # The old index is served until the rebuild is done
+            self.assertEqual(len(other_process_index.suggest("caching", "en")), 1)
+            suggestions = other_process_index.suggest("caching", "en")
+        self.assertEqual(
+            [suggestion["title"] for suggestion in suggestions],
+            ["Caching pages", "Django caching"],
+        )
+
+    def test_restricted_pages_are_not_suggested(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            PageViewRestriction.objects.create(
+                page=self.index, restriction_type=PageViewRestriction.LOGIN
+            )
+        self.assertEqual(self.suggest("caching"), ([], 0))
+        self.add_post("Django caching", "Intro")
+        self.assertEqual(self.suggest("caching"), ([], 0))
+
+        other_process_index = SuggestionIndex()
+        other_process_index.build()
+        self.assertEqual(other_process_index.suggest("caching", "en"), [])
+
+
+@override_settings(SEARCH_INDEX_WORKER=None)
+class IndexQueueTests(TestCase):
+    def setUp(self):
+        self.index = BlogIndexPage(title="Blog", slug="blog")
+        Site.objects.get(is_default_site=True).root_page.add_child(instance=self.index)
+
+    def add_post(self):
+        post = BlogPage(
+            title="Post",
+            date=datetime.date(2024, 1, 1),
+            intro="Intro",
+            body=[
+                ("heading", {"size": "h2", "text": "Marmalade"}),
+                ("paragraph", "<p>Made with <b>oranges</b></p>"),
+            ],
+        )
+        self.index.add_child(instance=post)
+        return post
+
+    def search(self, query):
+        return list(Page.objects.live().search(query))
+
+    def test_body_text(self):
+        post = self.add_post()
+        self.assertEqual(post.body_text(), "Marmalade\nMade with oranges")
+
+    def test_published_posts_are_queued(self):
+        post = self.add_post()
+        post.save_revision()
+        self.assertFalse(IndexQueueEntry.objects.exists())
+
+        post.save_revision().publish()
+        self.assertEqual(IndexQueueEntry.objects.count(), 1)
+        self.assertEqual(self.search("oranges"), [])
+
+        self.assertEqual(process_index_queue(), 1)
+        self.assertEqual(self.search("oranges"), [post.page_ptr])
+        self.assertFalse(IndexQueueEntry.objects.exists())
+
+    def test_update_index_since(self):
+        self.add_post()
+        stdout = io.StringIO()
+        call_command("update_index", since="2100-01-01", stdout=stdout)
+        self.assertIn("indexed 0 objects changed since 2100-01-01", stdout.getvalue())
+        self.assertEqual(self.search("oranges"), [])
+
+        post = self.add_post()
+        post.save_revision().publish()
+        call_command("update_index", since="2024-05-01T12:00", stdout=stdout)
+        self.assertEqual(self.search("oranges"), [post.page_ptr])
+
+
+@override_settings(SEARCH_QUERY_LOG_FLUSH_INTERVAL=None, SEARCH_QUERY_LOG_FLUSH_COUNT=3)
+class QueryHitBufferTests(TestCase):
+    def test_hits_are_saved_in_bulk(self):
+        buffer = QueryHitBuffer()
+        with CaptureQueriesContext(connection) as queries:
+            buffer.record("Wagtail")
+            buffer.record("  wagtail ")
+        self.assertEqual(len(queries), 0)
+
+        buffer.record("Django")
+        self.assertEqual(Query.get("wagtail").hits, 2)
+        self.assertEqual(Query.get("django").hits, 1)
+
+        # flushing adds to the saved counts
+        buffer.record("wagtail")
+        buffer.flush()
+        self.assertEqual(Query.get("wagtail").hits, 3)
+
+    def test_search_view_records_hits(self):
+        with translation.override("en"):
+            url = reverse("search")
+        self.client.get(url, {"query": "wagtail"})
+        self.client.get(url, {"query": "wagtail", "page": 2})
+        query_hits.flush()
+        self.assertEqual(Query.get("wagtail").hits, 1)
+
+
+@override_settings(
+    SEARCH_RESULTS_COUNT_LIMIT=20,
+    SEARCH_INDEX_WORKER="inline",
+    SEARCH_QUERY_LOG_FLUSH_INTERVAL=None,
+)
+class SearchRenderBudgetTests(RenderBudgetTestCase):
+    def setUp(self):
+        self.addCleanup(query_hits.flush)
+        self.index = BlogIndexPage(title="Blog", slug="blog")
+        Site.objects.get(is_default_site=True).root_page.add_child(instance=self.index)
+
+    def add_posts(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(self.index.get_children().count(), count):
+                self.index.add_child(
+                    instance=BlogPage(
+                        title="Wagtail post %d" % i,
+                        date=datetime.date(2024, 1, 1),
+                        intro="Intro %d" % i,
+                    )
+                )
+
+    def test_search(self):
+        with translation.override("en"):
+            url = reverse("search")
+        count_limit = settings.SEARCH_RESULTS_COUNT_LIMIT
+        self.assertRenderBudget(
+            url,
+            grow=self.add_posts,
+            sizes=[count_limit + 1, count_limit * 4],
+            queries=9,
+            memory_kb=500,
+            data={"query": "wagtail"},
+            # Wagtail's SQLite search backend loads the index entry of every
+            # match before the results are sliced, so only the queries stay
+            # constant there
+            memory_growth=None if connection.vendor == "sqlite" else self.memory_growth,
+        )
@@ -1,40 +1,31 @@
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.http import JsonResponse
 from django.template.response import TemplateResponse
 
-from wagtail.models import Page
+from wagtail.models import Locale
 
-# To enable logging of search queries for use with the "Promoted search results" module
-# <https://docs.wagtail.org/en/stable/reference/contrib/searchpromotions.html>
-# uncomment the following line and the lines indicated in the search function
-# (after adding wagtail.contrib.search_promotions to INSTALLED_APPS):
-
-# from wagtail.contrib.search_promotions.models import Query
+from search.analytics import query_hits
+from search.results import SearchResultsPage, search_pages
+from search.suggest import get_suggestions
 
 
 def search(request):
     search_query = request.GET.get("query", None)
-    page = request.GET.get("page", 1)
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        page = 1
 
     # Search
     if search_query:
-        search_results = Page.objects.live().search(search_query)
+        search_results = search_pages(search_query, Locale.get_active(), page)
 
-        # To log this query for use with the "Promoted search results" module:
-
-        # query = Query.get(search_query)
-        # query.add_hit()
+        # Log the query for the "Promoted search results" module. Hits are
+        # counted in memory and saved in bulk, see search.analytics.
+        if page == 1:
+            query_hits.record(search_query)
 
     else:
-        search_results = Page.objects.none()
-
-    # Pagination
-    paginator = Paginator(search_results, 10)
-    try:
-        search_results = paginator.page(page)
-    except PageNotAnInteger:
-        search_results = paginator.page(1)
-    except EmptyPage:
-        search_results = paginator.page(paginator.num_pages)
+        search_results = SearchResultsPage([], page, has_next=False)
 
     return TemplateResponse(
         request,
@@ -44,3 +35,9 @@ def search(request):
             "search_results": search_results,
         },
     )
+
+
+def suggest(request):
+    return JsonResponse(
+        {"suggestions": get_suggestions(request.GET.get("query", ""))}
+    )